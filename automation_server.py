@@ -1,18 +1,39 @@
 import logging
 import json
 import os
+import sys
 import threading
 import time
-import psutil
 import subprocess
-import glob
+import asyncio
+import base64
+import bisect
+import heapq
+import io
+import math
+import mmap
+import queue
+import random
+import re
+import shutil
+import socket
+import statistics
+import struct
+import tempfile
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import MappingProxyType, SimpleNamespace
 import ctypes
-from ctypes import wintypes
-import keyboard
-import pyautogui
-from flask import Flask, request, jsonify
+
+# Platform-specific modules (input, hooks, Win32) load on first use, see PlatformFeatures
+BOOT_STARTED = time.perf_counter()
+import psutil
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import pynput
+CORE_IMPORT_MS = round((time.perf_counter() - BOOT_STARTED) * 1000, 1)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,174 +42,1347 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# --- Data Directory ---
+
+def user_data_dir():
+    # Per-user state lives outside the install: a PyInstaller onefile build
+    # runs from a temp folder that is deleted on exit
+    override = os.environ.get('GM_DATA_DIR')
+    if override:
+        return override
+    if os.name == 'nt':
+        base = os.environ.get('APPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Roaming')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'GameManager')
+
+DATA_DIR = user_data_dir()
+# Files and folders source checkouts used to keep next to the script
+LEGACY_DATA_NAMES = ('game_autolaunch_config.json', 'firewall_state.json', 'dns_config.json', 'dns_cache.json',
+                     'game_index.json', 'game_scan_config.json', 'ram_reclaim.json', 'recordings', 'templates', 'macros')
+
+def data_path(name):
+    return os.path.join(DATA_DIR, name)
+
+def migrate_legacy_data(source_dir=os.path.dirname(os.path.abspath(__file__))):
+    # One-time move for source runs; a frozen build never had anything to keep
+    if getattr(sys, 'frozen', False):
+        return
+    for name in LEGACY_DATA_NAMES:
+        source, target = os.path.join(source_dir, name), data_path(name)
+        if os.path.exists(source) and not os.path.exists(target):
+            try:
+                shutil.move(source, target)
+                logger.info(f"Moved {name} to {DATA_DIR}")
+            except OSError as e:
+                logger.error(f"Could not move {name} to {DATA_DIR}: {e}")
+
+try:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    migrate_legacy_data()
+except OSError as e:
+    logger.error(f"Data directory {DATA_DIR} unavailable: {e}")
+
+# --- Metrics ---
+
+# Seconds. Request and loop latencies span sub-millisecond to multi-second.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Playback lateness is microseconds to a few milliseconds
+TIMING_ERROR_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05)
+
+class Histogram:
+    # No lock on the hot path: under the GIL a lost increment needs two
+    # threads observing the same bucket at once, acceptable for monitoring
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class MetricFamily:
+    def __init__(self, name, help_text, kind, label_names=(), buckets=None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self.children = {} # label values tuple -> Histogram/Counter
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            # setdefault is atomic, so racing creators share one child
+            fresh = Histogram(self.buckets) if self.kind == 'histogram' else Counter()
+            child = self.children.setdefault(values, fresh)
+        return child
+
+    def _label_str(self, values, extra=None):
+        pairs = list(zip(self.label_names, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self.children.items()):
+            if self.kind == 'counter':
+                lines.append(f"{self.name}{self._label_str(values)} {child.value}")
+                continue
+            cumulative = 0
+            for bound, n in zip(self.bounds_str(), list(child.counts)):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{self._label_str(values, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(values)} {child.sum}")
+            lines.append(f"{self.name}_count{self._label_str(values)} {child.count}")
+        return lines
+
+    def bounds_str(self):
+        return [repr(float(b)) for b in self.buckets] + ['+Inf']
+
+class MetricsRegistry:
+    def __init__(self):
+        self.families = OrderedDict()
+        self.gauges = OrderedDict() # name -> (help, callable returning value or {labels tuple: value})
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def _family(self, name, help_text, kind, label_names, buckets=None):
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = MetricFamily(name, help_text, kind, label_names, buckets)
+            return family
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._family(name, help_text, 'histogram', label_names, buckets)
+
+    def counter(self, name, help_text, label_names=()):
+        return self._family(name, help_text, 'counter', label_names)
+
+    def gauge(self, name, help_text, fn):
+        # Evaluated at scrape time, so it costs nothing between scrapes
+        with self.lock:
+            self.gauges[name] = (help_text, fn)
+
+    def render(self):
+        with self.lock:
+            families = list(self.families.values())
+            gauges = list(self.gauges.items())
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        for name, (help_text, fn) in gauges:
+            try:
+                value = fn()
+            except Exception as e:
+                logger.debug(f"Gauge {name} failed: {e}")
+                continue
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+request_latency = metrics.histogram('gm_http_request_duration_seconds', 'Flask request handling time',
+                                    ('route', 'method', 'status'))
+loop_duration = metrics.histogram('gm_loop_iteration_seconds', 'Work time per background loop iteration', ('loop',))
+process_scan_duration = metrics.histogram('gm_process_scan_seconds', 'Time to sample the process table')
+playback_error = metrics.histogram('gm_playback_timing_error_seconds', 'Lateness of played macro events',
+                                   buckets=TIMING_ERROR_BUCKETS)
+subprocess_calls = metrics.counter('gm_subprocess_calls_total', 'External command invocations', ('command', 'outcome'))
+subprocess_duration = metrics.histogram('gm_subprocess_duration_seconds', 'External command run time', ('command',))
+metrics.gauge('gm_uptime_seconds', 'Seconds since the server started', lambda: round(time.time() - metrics.started, 3))
+
+def run_command(args, **kwargs):
+    # subprocess.run with per-command count and latency metrics
+    command = os.path.basename((args.split() if isinstance(args, str) else args)[0]).lower()
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = subprocess.run(args, **kwargs)
+        outcome = 'ok' if result.returncode == 0 else 'failed'
+        return result
+    except subprocess.CalledProcessError:
+        outcome = 'failed'
+        raise
+    finally:
+        subprocess_duration.labels(command).observe(time.perf_counter() - started)
+        subprocess_calls.labels(command, outcome).inc()
+
+class SamplingProfiler:
+    # Off by default. When enabled, a thread snapshots every other thread's
+    # stack at a fixed interval and counts collapsed stacks (flamegraph format).
+    def __init__(self, interval=0.01, max_depth=40, max_stacks=5000):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.stacks = {}
+        self.samples = 0
+        self.thread = None
+        self.enabled = False
+        self.lock = threading.Lock()
+
+    def _collapse(self, frame):
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(parts))
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while self.enabled:
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            with self.lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    key = f"{names.get(ident, ident)};{self._collapse(frame)}"
+                    if key in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def start(self, interval=None):
+        with self.lock:
+            if interval:
+                self.interval = interval
+            if self.enabled:
+                return
+            self.enabled = True
+            self.stacks = {}
+            self.samples = 0
+            self.thread = threading.Thread(target=self._run, daemon=True, name='sampling-profiler')
+            self.thread.start()
+
+    def stop(self):
+        self.enabled = False
+
+    def report(self, top=50):
+        with self.lock:
+            stacks = heapq.nlargest(top, self.stacks.items(), key=lambda kv: kv[1])
+            return {'enabled': self.enabled, 'interval_ms': self.interval * 1000, 'samples': self.samples,
+                    'stacks': [{'stack': k, 'count': v} for k, v in stacks]}
+
+profiler = SamplingProfiler()
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_latency(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        # Label by the route pattern, not the raw path, to keep cardinality bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_latency.labels(route, request.method, str(response.status_code)).observe(time.perf_counter() - started)
+    return response
+
+# --- Platform Features ---
+
+class FeatureUnavailable(Exception):
+    def __init__(self, feature, reason):
+        super().__init__(f"{feature} is unavailable: {reason}")
+        self.feature = feature
+        self.reason = reason
+
+def _load_pyautogui():
+    import pyautogui
+    pyautogui.FAILSAFE = True
+    return pyautogui
+
+def _load_keyboard():
+    import keyboard
+    if sys.platform.startswith('linux') and os.geteuid() != 0:
+        # The module imports fine but every hook call fails without root
+        raise PermissionError("keyboard hooks need root on Linux")
+    return keyboard
+
+def _load_pynput():
+    import pynput.keyboard
+    import pynput.mouse
+    return pynput
+
+def _load_numpy():
+    import numpy
+    return numpy
+
+def _load_pillow():
+    from PIL import Image
+    return Image
+
+def _load_win32():
+    if os.name != 'nt':
+        raise OSError("Windows only")
+    from ctypes import wintypes
+    return SimpleNamespace(user32=ctypes.windll.user32, kernel32=ctypes.windll.kernel32, wintypes=wintypes)
+
+class PlatformFeatures:
+    # Each subsystem is imported the first time it is needed and the import
+    # time is recorded. A subsystem that fails to load is remembered as
+    # unavailable and raises FeatureUnavailable from then on.
+    def __init__(self):
+        self.loaders = OrderedDict()
+        self.modules = {}
+        self.status = {} # subsystem -> {'available', 'import_ms', 'error'}
+        self.lock = threading.Lock()
+
+    def register(self, subsystem, loader):
+        self.loaders[subsystem] = loader
+
+    def load(self, subsystem):
+        module = self.modules.get(subsystem)
+        if module is not None:
+            return module
+        with self.lock:
+            if subsystem in self.modules:
+                return self.modules[subsystem]
+            status = self.status.get(subsystem)
+            if status is not None:
+                raise FeatureUnavailable(subsystem, status['error'])
+            started = time.perf_counter()
+            try:
+                module = self.loaders[subsystem]()
+            except Exception as e:
+                # ImportError, missing display, wrong OS, no permission...
+                error = f"{type(e).__name__}: {e}"
+                self.status[subsystem] = {'available': False, 'import_ms': round((time.perf_counter() - started) * 1000, 1),
+                                          'error': error}
+                logger.warning(f"{subsystem} unavailable: {error}")
+                raise FeatureUnavailable(subsystem, error) from e
+            elapsed = round((time.perf_counter() - started) * 1000, 1)
+            self.status[subsystem] = {'available': True, 'import_ms': elapsed, 'error': None}
+            self.modules[subsystem] = module
+        logger.info(f"Loaded {subsystem} in {elapsed} ms")
+        return module
+
+    def available(self, subsystem):
+        try:
+            self.load(subsystem)
+            return True
+        except FeatureUnavailable:
+            return False
+
+    def preload(self):
+        # Warm every subsystem off the request path once the server is up
+        for subsystem in self.loaders:
+            self.available(subsystem)
+
+    def report(self):
+        with self.lock:
+            status = dict(self.status)
+        return {
+            'platform': sys.platform,
+            'core_import_ms': CORE_IMPORT_MS,
+            'subsystems': {name: status.get(name, {'available': None, 'import_ms': None, 'error': 'not loaded yet'})
+                           for name in self.loaders}
+        }
+
+platform_features = PlatformFeatures()
+platform_features.register('pyautogui', _load_pyautogui)
+platform_features.register('keyboard', _load_keyboard)
+platform_features.register('pynput', _load_pynput)
+platform_features.register('win32', _load_win32)
+platform_features.register('numpy', _load_numpy)
+platform_features.register('pillow', _load_pillow)
+
+@app.errorhandler(FeatureUnavailable)
+def feature_unavailable(e):
+    return jsonify({'error': str(e), 'feature': e.feature}), 501
+
+class KeyboardHooks:
+    # Thin wrapper so the keyboard module is only imported when a hook is used
+    def _kb(self):
+        return platform_features.load('keyboard')
+
+    def remap_key(self, src, dst):
+        return self._kb().remap_key(src, dst)
+
+    def unhook_all(self):
+        if 'keyboard' in platform_features.modules:
+            platform_features.modules['keyboard'].unhook_all()
+
+    def is_pressed(self, combo):
+        return self._kb().is_pressed(combo)
+
+keyboard_hooks = KeyboardHooks()
+
+# --- Process Snapshot Service ---
+
+# Union of the attributes every consumer needs, so one sweep serves them all
+PROCESS_ATTRS = ('pid', 'ppid', 'name', 'exe', 'io_counters', 'memory_info', 'create_time')
+ProcessInfo = namedtuple('ProcessInfo', PROCESS_ATTRS)
+
+class ProcessSnapshot:
+    # Immutable view of the process table at one instant. Consumers must not
+    # mutate it; a new snapshot with a higher version replaces it every tick.
+    __slots__ = ('version', 'timestamp', 'processes', 'by_pid')
+
+    def __init__(self, version, timestamp, processes):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'timestamp', timestamp) # time.monotonic()
+        object.__setattr__(self, 'processes', tuple(processes))
+        object.__setattr__(self, 'by_pid', MappingProxyType({p.pid: p for p in self.processes}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ProcessSnapshot is immutable")
+
+    def __len__(self):
+        return len(self.processes)
+
+    def __iter__(self):
+        return iter(self.processes)
+
+    def get(self, pid):
+        return self.by_pid.get(pid)
+
+EMPTY_SNAPSHOT = ProcessSnapshot(0, 0.0, ())
+
+class PsutilProcessProvider:
+    def sample(self):
+        procs = []
+        for proc in psutil.process_iter(PROCESS_ATTRS, ad_value=None):
+            info = proc.info
+            procs.append(ProcessInfo(*(info.get(attr) for attr in PROCESS_ATTRS)))
+        return procs
+
+class FakeProcessProvider:
+    # Synthetic process table for tests and benchmarks on any OS
+    def __init__(self, processes=None):
+        self.lock = threading.Lock()
+        self.processes = []
+        self.set_processes(processes or [])
+
+    def set_processes(self, processes):
+        rows = []
+        for p in processes:
+            if isinstance(p, ProcessInfo):
+                rows.append(p)
+            else:
+                rows.append(ProcessInfo(*(p.get(attr) for attr in PROCESS_ATTRS)))
+        with self.lock:
+            self.processes = rows
+
+    def sample(self):
+        with self.lock:
+            return list(self.processes)
+
+class ProcessSampler:
+    def __init__(self, provider=None, interval=1.0):
+        self.provider = provider or PsutilProcessProvider()
+        self.interval = interval
+        self.snapshot = EMPTY_SNAPSHOT
+        self.subscribers = []
+        self.cond = threading.Condition()
+        self.running = True
+        self.last_sample_duration = 0.0
+
+    def latest(self):
+        return self.snapshot
+
+    def refresh(self):
+        # Take one snapshot now and publish it to every consumer
+        started = time.perf_counter()
+        processes = self.provider.sample()
+        self.last_sample_duration = time.perf_counter() - started
+        process_scan_duration.labels().observe(self.last_sample_duration)
+        with self.cond:
+            snapshot = ProcessSnapshot(self.snapshot.version + 1, time.monotonic(), processes)
+            self.snapshot = snapshot
+            subscribers = list(self.subscribers)
+            self.cond.notify_all()
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Snapshot subscriber error: {e}")
+        return snapshot
+
+    def wait_for_next(self, after_version=None, timeout=None):
+        # Block until a snapshot newer than after_version is published.
+        # Returns None on timeout.
+        with self.cond:
+            if after_version is None:
+                after_version = self.snapshot.version
+            if not self.cond.wait_for(lambda: self.snapshot.version > after_version, timeout):
+                return None
+            return self.snapshot
+
+    def subscribe(self, callback):
+        with self.cond:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.cond:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def run(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Process sampler error: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self.running = False
+
+process_sampler = ProcessSampler()
+metrics.gauge('gm_processes', 'Processes in the latest snapshot', lambda: len(process_sampler.latest().processes))
+
+# --- System Telemetry ---
+
+# (seconds per bucket, buckets kept): 10 min of 1s, 1 h of 10s, 24 h of 60s
+SYSTEM_ROLLUPS = ((1, 600), (10, 360), (60, 1440))
+
+class RollupRing:
+    # Fixed-size ring of min/avg/max buckets for a fixed list of metrics,
+    # one typed array per statistic laid out as [bucket * width + metric]
+    __slots__ = ('resolution', 'capacity', 'width', 'times', 'mins', 'avgs', 'maxs', 'head', 'count')
+
+    def __init__(self, resolution, capacity, width):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.width = width
+        self.times = array('d', bytes(8 * capacity))
+        self.mins = array('d', bytes(8 * capacity * width))
+        self.avgs = array('d', bytes(8 * capacity * width))
+        self.maxs = array('d', bytes(8 * capacity * width))
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp, mins, avgs, maxs):
+        base = self.head * self.width
+        self.times[self.head] = timestamp
+        self.mins[base:base + self.width] = array('d', mins)
+        self.avgs[base:base + self.width] = array('d', avgs)
+        self.maxs[base:base + self.width] = array('d', maxs)
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def window(self, since, columns):
+        # Buckets newer than `since`, oldest first: (times, {col: [[min, avg, max], ...]})
+        times = []
+        out = {c: [] for c in columns}
+        start = (self.head - self.count) % self.capacity
+        for i in range(self.count):
+            idx = (start + i) % self.capacity
+            if self.times[idx] < since:
+                continue
+            times.append(self.times[idx])
+            base = idx * self.width
+            for c in columns:
+                out[c].append([self.mins[base + c], self.avgs[base + c], self.maxs[base + c]])
+        return times, out
+
+class RollupAccumulator:
+    # Folds finer buckets into one coarser bucket
+    __slots__ = ('mins', 'sums', 'maxs', 'weight')
+
+    def __init__(self, width):
+        self.mins = [math.inf] * width
+        self.sums = [0.0] * width
+        self.maxs = [-math.inf] * width
+        self.weight = 0
+
+    def add(self, mins, avgs, maxs, weight=1):
+        for i in range(len(self.sums)):
+            if mins[i] < self.mins[i]:
+                self.mins[i] = mins[i]
+            if maxs[i] > self.maxs[i]:
+                self.maxs[i] = maxs[i]
+            self.sums[i] += avgs[i] * weight
+        self.weight += weight
+
+    def result(self):
+        return self.mins, [v / self.weight for v in self.sums], self.maxs
+
+class SystemSampler:
+    def __init__(self, interval=1.0, rollups=SYSTEM_ROLLUPS):
+        self.interval = interval
+        self.cores = psutil.cpu_count() or 1
+        self.metrics = ['cpu_percent', 'ram_percent', 'ram_available', 'swap_percent',
+                        'disk_read_bps', 'disk_write_bps', 'net_sent_bps', 'net_recv_bps']
+        self.metrics += [f"cpu_core_{i}" for i in range(self.cores)]
+        self.columns = {name: i for i, name in enumerate(self.metrics)}
+        width = len(self.metrics)
+        self.levels = [RollupRing(res, cap, width) for res, cap in rollups]
+        # One pending accumulator per coarser level, keyed by its bucket number
+        self.pending = [None] * len(self.levels)
+        self.latest = None
+        self.last_counters = None
+        self.lock = threading.Lock()
+        self.running = True
+
+    def _counters(self):
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        return (time.monotonic(),
+                (disk.read_bytes, disk.write_bytes) if disk else (0, 0),
+                (net.bytes_sent, net.bytes_recv) if net else (0, 0))
+
+    def sample(self):
+        mem = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        cores = psutil.cpu_percent(interval=None, percpu=True) or [0.0]
+        counters = self._counters()
+        rates = [0.0, 0.0, 0.0, 0.0]
+        if self.last_counters is not None:
+            # Normalize by the real elapsed time, not an assumed 1s tick
+            elapsed = counters[0] - self.last_counters[0]
+            if elapsed > 0:
+                prev = self.last_counters[1] + self.last_counters[2]
+                cur = counters[1] + counters[2]
+                rates = [max(0, c - p) / elapsed for c, p in zip(cur, prev)]
+        self.last_counters = counters
+        values = [sum(cores) / len(cores), mem.percent, mem.available, swap.percent] + rates
+        values += (list(cores) + [0.0] * self.cores)[:self.cores]
+        with self.lock:
+            self.latest = {'timestamp': counters[0], 'ram_total': mem.total,
+                           'cpu_per_core': list(cores)}
+            self.latest.update(zip(self.metrics[:8], values[:8]))
+            self._record(counters[0], values)
+        return self.latest
+
+    def _record(self, now, values):
+        # The finest level stores raw samples; each coarser level is built
+        # from the closed buckets of the level below it
+        self.levels[0].append(now, values, values, values)
+        stats = (now, values, values, values, 1)
+        for i in range(1, len(self.levels)):
+            ring = self.levels[i]
+            bucket = int(stats[0] // ring.resolution)
+            pending = self.pending[i]
+            closed = None
+            if pending is not None and pending[0] != bucket:
+                mins, avgs, maxs = pending[1].result()
+                # Stored at the bucket's end, passed on at its start
+                ring.append((pending[0] + 1) * ring.resolution, mins, avgs, maxs)
+                closed = (pending[0] * ring.resolution, mins, avgs, maxs, pending[1].weight)
+                pending = None
+            if pending is None:
+                pending = self.pending[i] = (bucket, RollupAccumulator(ring.width))
+            pending[1].add(*stats[1:])
+            if closed is None:
+                break
+            stats = closed
+
+    def get_latest(self):
+        with self.lock:
+            return dict(self.latest) if self.latest else None
+
+    def query(self, window=60, resolution=None, metrics=None, points=None):
+        # Pick the finest level at least as coarse as requested whose
+        # retention still covers the window
+        levels = [l for l in self.levels if resolution is None or l.resolution >= resolution]
+        if not levels:
+            levels = [self.levels[-1]]
+        ring = next((l for l in levels if l.resolution * l.capacity >= window), levels[-1])
+        names = [m for m in (metrics or self.metrics) if m in self.columns]
+        with self.lock:
+            if self.latest is None:
+                return {'window': window, 'resolution': ring.resolution, 'series': {}}
+            now = self.latest['timestamp']
+            times, series = ring.window(now - window, [self.columns[m] for m in names])
+        # Report times as seconds relative to the newest sample
+        times = [round(t - now, 3) for t in times]
+        out = {}
+        for name in names:
+            rows = series[self.columns[name]]
+            if points and len(rows) > points:
+                # Merge adjacent buckets to fit; min/max stay exact
+                merged = []
+                n = len(rows)
+                for b in range(points):
+                    lo, hi = b * n // points, (b + 1) * n // points
+                    if hi <= lo:
+                        continue
+                    chunk = rows[lo:hi]
+                    merged.append([times[hi - 1], min(r[0] for r in chunk),
+                                   sum(r[1] for r in chunk) / len(chunk), max(r[2] for r in chunk)])
+                out[name] = merged
+            else:
+                out[name] = [[t] + r for t, r in zip(times, rows)]
+        return {'window': window, 'resolution': ring.resolution, 'series': out}
+
+    def run(self):
+        psutil.cpu_percent(interval=None, percpu=True) # prime the CPU counters
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"System sampler error: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self.running = False
+
+system_sampler = SystemSampler()
+
 # --- Network & Firewall Logic ---
 
+class RateRing:
+    # Fixed-size ring of (timestamp, bytes/s) samples backed by typed arrays
+    __slots__ = ('times', 'rates', 'capacity', 'head', 'count')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.rates = array('d', bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp, rate):
+        self.times[self.head] = timestamp
+        self.rates[self.head] = rate
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def window(self, since):
+        # Samples newer than `since`, oldest first
+        out_t, out_r = [], []
+        start = (self.head - self.count) % self.capacity
+        for i in range(self.count):
+            idx = (start + i) % self.capacity
+            if self.times[idx] >= since:
+                out_t.append(self.times[idx])
+                out_r.append(self.rates[idx])
+        return out_t, out_r
+
+def downsample(times, values, points):
+    # Bucket-average a series down to at most `points` samples
+    n = len(times)
+    if n <= points or points <= 0:
+        return [[t, v] for t, v in zip(times, values)]
+    series = []
+    for b in range(points):
+        lo = b * n // points
+        hi = (b + 1) * n // points
+        if hi <= lo:
+            continue
+        series.append([times[hi - 1], sum(values[lo:hi]) / (hi - lo)])
+    return series
+
 class NetworkMonitor:
-    def __init__(self):
-        self.processes = {} # pid -> {'last_io': io_counters, 'speed': 0, 'name': name, 'exe': exe}
+    def __init__(self, history_size=300, max_tracked=2048):
+        self.processes = {} # pid -> {'last_io': io_counters, 'speed': bytes/s, 'name': name, 'exe': exe, 'history': RateRing}
         self.lock = threading.Lock()
         self.running = True
+        self.history_size = history_size
+        self.max_tracked = max_tracked
+        self.last_timestamp = None
         
     def update_loop(self):
+        version = None
         while self.running:
+            snapshot = process_sampler.wait_for_next(version, timeout=5)
+            if snapshot is None:
+                continue
+            version = snapshot.version
+            started = time.perf_counter()
             try:
-                self._update()
+                self._update(snapshot)
             except Exception as e:
                 logger.error(f"Monitor error: {e}")
-            time.sleep(1)
+            loop_duration.labels('network_monitor').observe(time.perf_counter() - started)
             
-    def _update(self):
+    def _update(self, snapshot):
         with self.lock:
-            current_pids = set()
-            for proc in psutil.process_iter(['pid', 'name', 'exe', 'io_counters']):
-                try:
-                    pid = proc.info['pid']
-                    current_pids.add(pid)
-                    
-                    io = proc.info['io_counters']
-                    if not io: continue
-                    
-                    current_bytes = io.read_bytes + io.write_bytes
+            now = snapshot.timestamp
+            # Normalize by the real elapsed time, not an assumed 1s tick
+            elapsed = now - self.last_timestamp if self.last_timestamp is not None else 0
+            self.last_timestamp = now
+            # Drop exited processes first so their slots are free this tick
+            for pid in [pid for pid in self.processes if snapshot.get(pid) is None]:
+                del self.processes[pid]
+            for proc in snapshot:
+                pid = proc.pid
+                io = proc.io_counters
+                if not io: continue
+                
+                current_bytes = io.read_bytes + io.write_bytes
+                entry = self.processes.get(pid)
+                
+                if entry is not None and entry['create_time'] == proc.create_time:
+                    # Calculate speed
+                    prev_bytes = entry['last_io'].read_bytes + entry['last_io'].write_bytes
+                    speed = (current_bytes - prev_bytes) / elapsed if elapsed > 0 else 0
                     
-                    if pid in self.processes:
-                        # Calculate speed
-                        prev = self.processes[pid]
-                        prev_bytes = prev['last_io'].read_bytes + prev['last_io'].write_bytes
-                        speed = current_bytes - prev_bytes
-                        
-                        self.processes[pid]['speed'] = speed
-                        self.processes[pid]['last_io'] = io
-                    else:
-                        # New process
-                        self.processes[pid] = {
-                            'pid': pid,
-                            'name': proc.info['name'],
-                            'exe': proc.info['exe'],
-                            'last_io': io,
-                            'speed': 0
-                        }
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-            
-            # Cleanup dead processes
-            for pid in list(self.processes.keys()):
-                if pid not in current_pids:
-                    del self.processes[pid]
+                    entry['speed'] = max(0, speed)
+                    entry['last_io'] = io
+                    entry['history'].append(now, entry['speed'])
+                elif entry is not None or len(self.processes) < self.max_tracked:
+                    # New process, or a reused PID replacing its stale entry
+                    self.processes[pid] = {
+                        'pid': pid,
+                        'name': proc.name,
+                        'exe': proc.exe,
+                        'create_time': proc.create_time,
+                        'last_io': io,
+                        'speed': 0,
+                        'history': RateRing(self.history_size)
+                    }
 
     def get_top_consumers(self, limit=10):
         with self.lock:
-            # Sort by speed desc
-            sorted_procs = sorted(self.processes.values(), key=lambda x: x['speed'], reverse=True)
-            return sorted_procs[:limit]
+            return heapq.nlargest(limit, self.processes.values(), key=lambda x: x['speed'])
+
+    def get_history(self, pid, window=60, points=60):
+        with self.lock:
+            entry = self.processes.get(pid)
+            if entry is None or self.last_timestamp is None:
+                return None
+            now = self.last_timestamp
+            times, rates = entry['history'].window(now - window)
+            info = {'pid': pid, 'name': entry['name'], 'exe': entry['exe']}
+        # Report times as seconds relative to the newest sample
+        times = [round(t - now, 3) for t in times]
+        info['window'] = window
+        info['series'] = downsample(times, rates, points)
+        return info
+
+FIREWALL_STATE_PATH = data_path('firewall_state.json')
+FIREWALL_RULE_PREFIX = 'GM_Block_'
+
+def firewall_rule_name(exe_path):
+    # Basename for readability, path hash so two apps with the same exe name don't collide.
+    # Names also become iptables arguments and cgroup dirs, so only safe characters are kept.
+    digest = zlib.crc32(os.path.normcase(exe_path).encode('utf-8'))
+    basename = re.sub(r'[^\w.-]', '_', os.path.basename(exe_path), flags=re.ASCII)
+    return f"{FIREWALL_RULE_PREFIX}{basename}_{digest:08x}"
+
+class FirewallBackend:
+    # Applies a whole batch of rule changes in one invocation.
+    # Rules are identified by name; list_rules() returns {name: exe_path}.
+    name = 'base'
+
+    def list_rules(self):
+        raise NotImplementedError
+
+    def commands(self, adds, removes):
+        # adds: [(rule_name, exe_path)], removes: [rule_name]
+        raise NotImplementedError
+
+    def apply(self, adds, removes):
+        raise NotImplementedError
+
+class NetshBackend(FirewallBackend):
+    # Windows Firewall via one `netsh -f <script>` process per batch
+    name = 'netsh'
+
+    def commands(self, adds, removes):
+        lines = [f'advfirewall firewall delete rule name="{rule}"' for rule in removes]
+        lines += [f'advfirewall firewall add rule name="{rule}" dir=out action=block program="{exe}"' for rule, exe in adds]
+        return lines
+
+    def apply(self, adds, removes):
+        lines = self.commands(adds, removes)
+        if not lines:
+            return
+        fd, script = tempfile.mkstemp(suffix='.netsh', text=True)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            run_command(['netsh', '-f', script], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        finally:
+            os.remove(script)
+
+    def list_rules(self):
+        out = run_command(['netsh', 'advfirewall', 'firewall', 'show', 'rule', 'name=all', 'dir=out', 'verbose'],
+                          capture_output=True, text=True, errors='replace').stdout
+        # Field labels are localized, so match on values: our rule names, then
+        # the first value that looks like a program path
+        rules = {}
+        current = None
+        for line in out.splitlines():
+            if ':' not in line:
+                continue
+            value = line.split(':', 1)[1].strip()
+            if value.startswith(FIREWALL_RULE_PREFIX):
+                current = value
+                rules[current] = None
+            elif current and rules[current] is None and value.lower().endswith('.exe'):
+                rules[current] = value
+        return rules
+
+class IptablesCgroupBackend(FirewallBackend):
+    # Linux: each blocked exe gets a cgroup v2 group and an OUTPUT rule
+    # matching it. Processes are moved into the group by track(), which the
+    # manager runs on every process snapshot, and moved back to the cgroup
+    # they came from when the rule goes. Batches go through a single
+    # iptables-restore --noflush call.
+    name = 'iptables'
+
+    def __init__(self, cgroup_root='/sys/fs/cgroup', group='gm_block', proc_root='/proc'):
+        self.cgroup_root = cgroup_root
+        self.group = group
+        self.proc_root = proc_root
+        self.moved = {} # rule -> {pid: cgroup the process was taken from}
+
+    def _cgroup(self, rule):
+        return os.path.join(self.group, rule)
+
+    def _group_dir(self, rule):
+        return os.path.join(self.cgroup_root, self._cgroup(rule))
+
+    def commands(self, adds, removes):
+        # Rule names are limited to safe characters, see firewall_rule_name
+        lines = ['*filter']
+        for rule in removes:
+            lines.append(f'-D OUTPUT -m cgroup --path {self._cgroup(rule)} -m comment --comment {rule} -j REJECT')
+        for rule, exe in adds:
+            lines.append(f'-A OUTPUT -m cgroup --path {self._cgroup(rule)} -m comment --comment {rule} -j REJECT')
+        lines.append('COMMIT')
+        return lines
+
+    def apply(self, adds, removes):
+        for rule, exe in adds:
+            os.makedirs(self._group_dir(rule), exist_ok=True)
+        run_command(['iptables-restore', '--noflush'], input='\n'.join(self.commands(adds, removes)) + '\n',
+                    text=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for rule in removes:
+            self._release(rule)
+
+    def list_rules(self):
+        out = run_command(['iptables-save', '-t', 'filter'], capture_output=True, text=True).stdout
+        rules = {}
+        for match in re.finditer(rf'--comment "?({FIREWALL_RULE_PREFIX}[\w.-]+)', out):
+            rules[match.group(1)] = None
+        return rules
+
+    def _current_cgroup(self, pid):
+        try:
+            with open(os.path.join(self.proc_root, str(pid), 'cgroup'), encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('0::'):
+                        return line[3:].strip()
+        except OSError:
+            pass
+        return None
+
+    def _move(self, pid, cgroup_dir):
+        try:
+            with open(os.path.join(cgroup_dir, 'cgroup.procs'), 'w') as f:
+                f.write(str(pid))
+            return True
+        except OSError:
+            return False
+
+    def _release(self, rule):
+        # Everything still in the group goes back where it came from; children
+        # born inside the group follow the processes that were moved in
+        path = self._group_dir(rule)
+        moved = self.moved.pop(rule, {})
+        if not os.path.isdir(path):
+            return
+        fallback = next((cgroup for cgroup in moved.values() if cgroup), '/')
+        try:
+            with open(os.path.join(path, 'cgroup.procs'), encoding='utf-8') as f:
+                pids = [int(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            pids = []
+        for pid in pids:
+            original = os.path.join(self.cgroup_root, (moved.get(pid) or fallback).lstrip('/'))
+            if not self._move(pid, original):
+                self._move(pid, self.cgroup_root)
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            logger.warning(f"Could not remove cgroup {path}: {e}")
+
+    def track(self, snapshot, blocked):
+        rules = {os.path.normcase(exe): firewall_rule_name(exe) for exe in blocked}
+        live = set()
+        for proc in snapshot:
+            rule = rules.get(os.path.normcase(proc.exe)) if proc.exe else None
+            if rule is None:
+                continue
+            live.add(proc.pid)
+            moved = self.moved.setdefault(rule, {})
+            if proc.pid in moved:
+                continue
+            original = self._current_cgroup(proc.pid)
+            if original == '/' + self._cgroup(rule):
+                # Already inside, e.g. moved by a previous run
+                continue
+            if self._move(proc.pid, self._group_dir(rule)):
+                moved[proc.pid] = original
+        for moved in self.moved.values():
+            for pid in [pid for pid in moved if pid not in live]:
+                del moved[pid]
+
+class FakeFirewallBackend(FirewallBackend):
+    # In-memory rule table for tests and non-Windows development
+    name = 'fake'
+
+    def __init__(self, rules=None):
+        self.rules = dict(rules or {})
+        self.batches = []
+
+    def commands(self, adds, removes):
+        return [f'delete {rule}' for rule in removes] + [f'add {rule} {exe}' for rule, exe in adds]
+
+    def apply(self, adds, removes):
+        self.batches.append((list(adds), list(removes)))
+        for rule in removes:
+            self.rules.pop(rule, None)
+        for rule, exe in adds:
+            self.rules[rule] = exe
+
+    def list_rules(self):
+        return dict(self.rules)
+
+def make_firewall_backend():
+    choice = os.environ.get('GM_FIREWALL_BACKEND')
+    if choice == 'iptables':
+        return IptablesCgroupBackend()
+    if choice == 'fake' or os.name != 'nt':
+        if choice != 'fake':
+            logger.warning("Firewall rules are simulated on this platform (set GM_FIREWALL_BACKEND=iptables for real rules)")
+        return FakeFirewallBackend()
+    return NetshBackend()
 
 class FirewallManager:
-    def __init__(self):
+    def __init__(self, backend=None, state_path=FIREWALL_STATE_PATH):
+        self.backend = backend or make_firewall_backend()
+        self.state_path = state_path
         self.blocked_apps = set() # Set of exe paths
+        self.temporary = set() # subset of blocked_apps held by the bandwidth guard
         self.whitelist = set()
         self.mode = 'soft' # soft, hard, pro
-        
-    def block_app(self, exe_path):
-        if not exe_path or exe_path in self.whitelist or exe_path in self.blocked_apps:
-            return False
-            
-        rule_name = f"GM_Block_{os.path.basename(exe_path)}"
+        self.lock = threading.Lock()
+        self.batches = deque(maxlen=50)
+        self.load_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return
         try:
-            # netsh advfirewall firewall add rule name="..." dir=out action=block program="..."
-            cmd = f'netsh advfirewall firewall add rule name="{rule_name}" dir=out action=block program="{exe_path}"'
-            subprocess.run(cmd, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            self.blocked_apps.add(exe_path)
-            logger.info(f"Blocked: {exe_path}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to block {exe_path}: {e}")
-            return False
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.blocked_apps = set(data.get('blocked', []))
+            self.temporary = set(data.get('temporary', [])) & self.blocked_apps
+            self.whitelist = set(data.get('whitelist', []))
+            self.mode = data.get('mode', self.mode)
+        except (OSError, ValueError) as e:
+            logger.error(f"Firewall state unreadable: {e}")
+
+    def save_state(self):
+        data = {'blocked': sorted(self.blocked_apps), 'temporary': sorted(self.temporary),
+                'whitelist': sorted(self.whitelist), 'mode': self.mode}
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def apply_batch(self, block=(), unblock=(), dry_run=False, extra_removes=(), temporary=False):
+        # One backend invocation for the whole batch; returns a summary.
+        # temporary=True marks guard-held blocks, and then only unblocks those,
+        # so a user block is never lifted by the guard.
+        with self.lock:
+            if not temporary and not dry_run:
+                # Blocking an app the guard holds makes the block the user's
+                promoted = self.temporary.intersection(block)
+                if promoted:
+                    self.temporary -= promoted
+                    self.save_state()
+            block = [exe for exe in dict.fromkeys(block)
+                     if exe and exe not in self.whitelist and exe not in self.blocked_apps]
+            unblock = [exe for exe in dict.fromkeys(unblock)
+                       if exe in self.blocked_apps and (not temporary or exe in self.temporary)]
+            adds = [(firewall_rule_name(exe), exe) for exe in block]
+            removes = [firewall_rule_name(exe) for exe in unblock] + list(extra_removes)
+            result = {'block': block, 'unblock': unblock, 'removes': removes, 'dry_run': dry_run,
+                      'backend': self.backend.name, 'ok': True}
+            if dry_run:
+                result['commands'] = self.backend.commands(adds, removes)
+                return result
+            if not adds and not removes:
+                return result
+            started = time.perf_counter()
+            try:
+                self.backend.apply(adds, removes)
+                self.blocked_apps.update(block)
+                self.blocked_apps.difference_update(unblock)
+                if temporary:
+                    self.temporary.update(block)
+                self.temporary.difference_update(unblock)
+                self.save_state()
+            except Exception as e:
+                logger.error(f"Firewall batch failed: {e}")
+                result['ok'] = False
+                result['error'] = str(e)
+            result['ms'] = round((time.perf_counter() - started) * 1000, 2)
+            self.batches.append({'time': time.time(), 'adds': len(adds), 'removes': len(removes),
+                                 'ms': result['ms'], 'ok': result['ok']})
+        for exe in block:
+            logger.info(f"Blocked: {exe}")
+        for exe in unblock:
+            logger.info(f"Unblocked: {exe}")
+        return result
+
+    def block_app(self, exe_path):
+        result = self.apply_batch(block=[exe_path])
+        return result['ok'] and bool(result['block'])
 
     def unblock_app(self, exe_path):
-        if exe_path not in self.blocked_apps:
-            return False
-            
-        rule_name = f"GM_Block_{os.path.basename(exe_path)}"
+        result = self.apply_batch(unblock=[exe_path])
+        return result['ok'] and bool(result['unblock'])
+
+    def clear_all_rules(self, dry_run=False):
+        # Our tracked rules plus any GM_Block_ rule left behind, in one batch
         try:
-            cmd = f'netsh advfirewall firewall delete rule name="{rule_name}"'
-            subprocess.run(cmd, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            self.blocked_apps.remove(exe_path)
-            logger.info(f"Unblocked: {exe_path}")
-            return True
+            orphans = [rule for rule in self.backend.list_rules()
+                       if rule not in {firewall_rule_name(exe) for exe in self.blocked_apps}]
         except Exception as e:
-            logger.error(f"Failed to unblock {exe_path}: {e}")
-            return False
+            logger.error(f"Failed to list firewall rules: {e}")
+            orphans = []
+        return self.apply_batch(unblock=list(self.blocked_apps), dry_run=dry_run, extra_removes=orphans)
+
+    def reconcile(self, dry_run=False):
+        # Make the real rule set match the desired (persisted) one
+        actual = self.backend.list_rules()
+        desired = {firewall_rule_name(exe): exe for exe in self.blocked_apps}
+        missing = [(rule, exe) for rule, exe in desired.items() if rule not in actual]
+        orphans = [rule for rule in actual if rule not in desired]
+        result = {'missing': [exe for _, exe in missing], 'orphans': orphans, 'dry_run': dry_run,
+                  'backend': self.backend.name, 'ok': True}
+        if dry_run:
+            result['commands'] = self.backend.commands(missing, orphans)
+            return result
+        if missing or orphans:
+            started = time.perf_counter()
+            try:
+                self.backend.apply(missing, orphans)
+            except Exception as e:
+                logger.error(f"Firewall reconcile failed: {e}")
+                result['ok'] = False
+                result['error'] = str(e)
+            result['ms'] = round((time.perf_counter() - started) * 1000, 2)
+            with self.lock:
+                self.batches.append({'time': time.time(), 'adds': len(missing), 'removes': len(orphans),
+                                     'ms': result['ms'], 'ok': result['ok']})
+            logger.info(f"Firewall reconciled: {len(missing)} restored, {len(orphans)} orphaned rules removed")
+        return result
+
+    def track(self, snapshot):
+        if isinstance(self.backend, IptablesCgroupBackend):
+            with self.lock:
+                blocked = list(self.blocked_apps)
+            self.backend.track(snapshot, blocked)
+
+    def get_rules(self):
+        with self.lock:
+            return {'backend': self.backend.name, 'blocked': sorted(self.blocked_apps),
+                    'temporary': sorted(self.temporary), 'whitelist': sorted(self.whitelist), 'mode': self.mode, 'batches': list(self.batches)}
 
-    def clear_all_rules(self):
-        # Delete all rules starting with GM_Block_
-        # This is tricky with netsh, usually we iterate our tracked list
-        for exe in list(self.blocked_apps):
-            self.unblock_app(exe)
+# --- Window & Priority Backends ---
 
-# --- Win32 API Constants and Types ---
-user32 = ctypes.windll.user32
-kernel32 = ctypes.windll.kernel32
 WM_LBUTTONDOWN = 0x0201
 WM_LBUTTONUP = 0x0202
 MK_LBUTTON = 0x0001
-HIGH_PRIORITY_CLASS = 0x00000080
-NORMAL_PRIORITY_CLASS = 0x00000020
 
-def set_process_priority(pid, priority):
+class Win32WindowBackend:
+    # Top-level window listing and background clicks via user32; raises
+    # FeatureUnavailable anywhere else
+    name = 'win32'
+
+    def require(self):
+        platform_features.load('win32')
+
+    def list_windows(self):
+        api = platform_features.load('win32')
+        user32 = api.user32
+        windows = []
+        def enum_window_proc(hwnd, lParam):
+            length = user32.GetWindowTextLengthW(hwnd)
+            if length > 0:
+                buff = ctypes.create_unicode_buffer(length + 1)
+                user32.GetWindowTextW(hwnd, buff, length + 1)
+                if user32.IsWindowVisible(hwnd):
+                    windows.append({'hwnd': hwnd, 'title': buff.value})
+            return True
+
+        WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, api.wintypes.HWND, api.wintypes.LPARAM)
+        user32.EnumWindows(WNDENUMPROC(enum_window_proc), 0)
+        return windows
+
+    def post_click(self, hwnd, x, y, hold=0.05):
+        user32 = platform_features.load('win32').user32
+        lparam = y << 16 | x
+        user32.PostMessageW(hwnd, WM_LBUTTONDOWN, MK_LBUTTON, lparam)
+        time.sleep(hold)
+        user32.PostMessageW(hwnd, WM_LBUTTONUP, 0, lparam)
+
+class FakeWindowBackend:
+    # Scripted windows and recorded clicks for tests and non-Windows development
+    name = 'fake'
+
+    def __init__(self, windows=None):
+        self.windows = list(windows or [])
+        self.clicks = []
+
+    def require(self):
+        pass
+
+    def list_windows(self):
+        return list(self.windows)
+
+    def post_click(self, hwnd, x, y, hold=0.05):
+        self.clicks.append((hwnd, x, y, time.perf_counter_ns()))
+
+def make_window_backend():
+    if os.environ.get('GM_WINDOW_BACKEND') == 'fake':
+        return FakeWindowBackend()
+    return Win32WindowBackend()
+
+window_backend = make_window_backend()
+
+# Priority classes on Windows, nice values elsewhere
+PRIORITY_LEVELS = {
+    'high': getattr(psutil, 'HIGH_PRIORITY_CLASS', -5),
+    'normal': getattr(psutil, 'NORMAL_PRIORITY_CLASS', 0),
+    'below_normal': getattr(psutil, 'BELOW_NORMAL_PRIORITY_CLASS', 10),
+    'idle': getattr(psutil, 'IDLE_PRIORITY_CLASS', 19),
+}
+
+def set_process_priority(proc, level):
+    # The one place priorities are changed. proc is a pid or psutil.Process,
+    # level a PRIORITY_LEVELS name or a raw value (e.g. one saved earlier).
     try:
-        handle = kernel32.OpenProcess(0x0200 | 0x0400, False, pid) # PROCESS_SET_INFORMATION | PROCESS_QUERY_INFORMATION
-        if not handle:
-            return False
-        kernel32.SetPriorityClass(handle, priority)
-        kernel32.CloseHandle(handle)
+        if isinstance(proc, int):
+            proc = psutil.Process(proc)
+        proc.nice(PRIORITY_LEVELS.get(level, level))
         return True
-    except Exception as e:
-        logger.error(f"Failed to set priority: {e}")
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+        logger.debug(f"Priority unchanged for PID {getattr(proc, 'pid', proc)}: {e}")
         return False
 
-def get_open_windows():
-    windows = []
-    def enum_window_proc(hwnd, lParam):
-        length = user32.GetWindowTextLengthW(hwnd)
-        if length > 0:
-            buff = ctypes.create_unicode_buffer(length + 1)
-            user32.GetWindowTextW(hwnd, buff, length + 1)
-            if user32.IsWindowVisible(hwnd):
-                windows.append({'hwnd': hwnd, 'title': buff.value})
-        return True
-    
-    WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, wintypes.HWND, wintypes.LPARAM)
-    user32.EnumWindows(WNDENUMPROC(enum_window_proc), 0)
-    return windows
-
 # --- Ultra Mode & DNS Logic ---
 
+ULTRA_GAME_NICE = PRIORITY_LEVELS['high']
+ULTRA_BACKGROUND_NICE = PRIORITY_LEVELS['idle']
+ULTRA_BACKGROUND_TARGETS = ['chrome.exe', 'firefox.exe', 'msedge.exe', 'discord.exe', 'spotify.exe', 'steamwebhelper.exe']
+
+def descendants(snapshot, root_pid):
+    # root_pid and every process below it, from the snapshot's ppid links
+    children = {}
+    for proc in snapshot:
+        if proc.ppid is not None:
+            children.setdefault(proc.ppid, []).append(proc.pid)
+    tree, stack = set(), [root_pid]
+    while stack:
+        pid = stack.pop()
+        if pid in tree:
+            continue
+        tree.add(pid)
+        stack.extend(children.get(pid, ()))
+    return tree
+
 class UltraModeManager:
-    def __init__(self):
+    def __init__(self, background_targets=None, background_cores=None):
         self.active = False
         self.game_pid = None
-        self.low_priority_pids = []
+        self.background_targets = [t.lower() for t in (background_targets or ULTRA_BACKGROUND_TARGETS)]
+        self.background_cores = background_cores # count; None = a quarter of the cores
+        self.game_core_set = None
+        self.background_core_set = None
+        self.saved = {} # pid -> {'create_time', 'nice', 'affinity', 'role'}
+        self.lock = threading.Lock()
+
+    def partition_cores(self):
+        # Background work goes to the low cores (core 0 also services most
+        # interrupts), the game gets the rest. Needs at least 2 cores.
+        try:
+            cores = sorted(psutil.Process().cpu_affinity())
+        except (AttributeError, psutil.Error):
+            return None, None
+        if len(cores) < 2:
+            return None, None
+        count = self.background_cores or max(1, len(cores) // 4)
+        count = min(count, len(cores) - 1)
+        return cores[count:], cores[:count]
+
+    def _apply(self, proc, role):
+        # Record the original state before the first change so disable() can restore it exactly
+        if proc.pid in self.saved and self.saved[proc.pid]['create_time'] == proc.create_time:
+            return
+        try:
+            p = psutil.Process(proc.pid)
+            saved = {'create_time': proc.create_time, 'nice': p.nice(), 'affinity': None, 'role': role}
+            if hasattr(p, 'cpu_affinity'):
+                saved['affinity'] = p.cpu_affinity()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+            logger.debug(f"Ultra Mode skip PID {proc.pid}: {e}")
+            return
+        self.saved[proc.pid] = saved
+        # Priority and affinity fail independently: raising priority needs
+        # privileges (e.g. a negative nice on Linux), pinning usually doesn't
+        set_process_priority(p, ULTRA_GAME_NICE if role == 'game' else ULTRA_BACKGROUND_NICE)
+        cores = self.game_core_set if role == 'game' else self.background_core_set
+        if cores and saved['affinity'] is not None:
+            try:
+                p.cpu_affinity(cores)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+                logger.debug(f"Ultra Mode affinity unchanged for PID {proc.pid}: {e}")
+
+    def on_snapshot(self, snapshot):
+        # Also catches game children and background apps started mid-session
+        with self.lock:
+            if not self.active:
+                return
+            if snapshot.get(self.game_pid) is None:
+                return
+            game_tree = descendants(snapshot, self.game_pid)
+            for proc in snapshot:
+                if proc.pid in game_tree:
+                    self._apply(proc, 'game')
+                elif proc.name and proc.name.lower() in self.background_targets:
+                    self._apply(proc, 'background')
 
     def enable(self, game_pid):
         if self.active: return False
         
         try:
-            # Set Game to High Priority
-            set_process_priority(game_pid, HIGH_PRIORITY_CLASS)
-            self.game_pid = game_pid
-            
-            # Set others to Idle
-            targets = ['chrome.exe', 'firefox.exe', 'msedge.exe', 'discord.exe', 'spotify.exe', 'steamwebhelper.exe']
-            
-            for proc in psutil.process_iter(['pid', 'name']):
-                if proc.info['name'].lower() in targets and proc.info['pid'] != game_pid:
-                    try:
-                        p = psutil.Process(proc.info['pid'])
-                        p.nice(psutil.IDLE_PRIORITY_CLASS)
-                        self.low_priority_pids.append(proc.info['pid'])
-                    except:
-                        pass
-                        
-            self.active = True
+            with self.lock:
+                self.game_pid = game_pid
+                self.game_core_set, self.background_core_set = self.partition_cores()
+                self.active = True
+            self.on_snapshot(process_sampler.latest())
+            process_sampler.subscribe(self.on_snapshot)
+            logger.info(f"Ultra Mode: game PID {game_pid} on cores {self.game_core_set}, background on {self.background_core_set}")
             return True
         except Exception as e:
             logger.error(f"Ultra Mode Enable Error: {e}")
@@ -198,338 +1392,3363 @@ class UltraModeManager:
         if not self.active: return False
         
         try:
-            # Restore Game Priority
-            if self.game_pid:
-                set_process_priority(self.game_pid, NORMAL_PRIORITY_CLASS)
-                
-            # Restore others
-            for pid in self.low_priority_pids:
+            process_sampler.unsubscribe(self.on_snapshot)
+            with self.lock:
+                saved, self.saved = self.saved, {}
+                self.active = False
+                self.game_pid = None
+            for pid, state in saved.items():
                 try:
                     p = psutil.Process(pid)
-                    p.nice(psutil.NORMAL_PRIORITY_CLASS)
-                except:
-                    pass
-            
-            self.low_priority_pids = []
-            self.game_pid = None
-            self.active = False
+                    if state['create_time'] is not None and p.create_time() != state['create_time']:
+                        continue # PID was reused, not ours to touch
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+                if state['affinity'] is not None:
+                    try:
+                        p.cpu_affinity(state['affinity'])
+                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                        pass
+                set_process_priority(p, state['nice'])
             return True
         except Exception as e:
             logger.error(f"Ultra Mode Disable Error: {e}")
             return False
 
-class DNSManager:
+    def get_status(self):
+        with self.lock:
+            roles = [s['role'] for s in self.saved.values()]
+            return {
+                'active': self.active,
+                'game_pid': self.game_pid,
+                'game_cores': self.game_core_set,
+                'background_cores': self.background_core_set,
+                'game_processes': roles.count('game'),
+                'background_processes': roles.count('background')
+            }
+
+DNS_CONFIG_PATH = data_path('dns_config.json')
+DNS_DEFAULT_SERVERS = {
+    'Google': '8.8.8.8',
+    'Cloudflare': '1.1.1.1',
+    'OpenDNS': '208.67.222.222',
+    'Quad9': '9.9.9.9'
+}
+DNS_CACHE_PATH = data_path('dns_cache.json')
+DNS_DEFAULT_DOMAINS = ['google.com', 'steampowered.com', 'epicgames.com']
+
+def build_dns_query(domain, query_id):
+    # Minimal RFC 1035 A query with recursion desired
+    header = struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(bytes([len(label)]) + label.encode('idna') for label in domain.strip('.').split('.')) + b'\0'
+    return header + qname + struct.pack('>HH', 1, 1)
+
+class DNSProbeProtocol(asyncio.DatagramProtocol):
+    # One UDP endpoint per resolver; responses are matched by query id
     def __init__(self):
-        self.servers = {
-            'Google': '8.8.8.8',
-            'Cloudflare': '1.1.1.1',
-            'OpenDNS': '208.67.222.222',
-            'Quad9': '9.9.9.9'
-        }
-        
-    def benchmark(self):
+        self.pending = {}
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        query_id, flags = struct.unpack_from('>HH', data)
+        fut = self.pending.pop(query_id, None)
+        if fut is not None and not fut.done() and flags & 0x8000:
+            fut.set_result(time.perf_counter())
+
+    def error_received(self, exc):
+        for fut in self.pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self.pending.clear()
+
+def latency_stats(samples, sent):
+    # samples: successful latencies in ms, in send order
+    if not samples:
+        return {'p50': None, 'p95': None, 'jitter': None, 'loss': 1.0 if sent else None}
+    ordered = sorted(samples)
+    n = len(ordered)
+    jitter = sum(abs(b - a) for a, b in zip(samples, samples[1:])) / (n - 1) if n > 1 else 0.0
+    return {
+        'p50': round(ordered[min(n - 1, int(0.50 * n))], 2),
+        'p95': round(ordered[min(n - 1, int(0.95 * n))], 2),
+        'jitter': round(jitter, 2),
+        'loss': round(1 - n / sent, 3)
+    }
+
+class DNSManager:
+    def __init__(self, config_path=DNS_CONFIG_PATH, cache_path=DNS_CACHE_PATH):
+        self.config_path = config_path
+        self.cache_path = cache_path
+        self.servers = dict(DNS_DEFAULT_SERVERS)
+        self.domains = list(DNS_DEFAULT_DOMAINS)
+        self.samples = 3
+        self.timeout = 1.0
+        self.port = 53
+        self.ttl = 300 # seconds before cached results count as stale
+        self.results = None
+        self.results_at = None # wall clock, so the age survives restarts
+        self.refresh_done = threading.Event()
+        self.refresh_done.set()
+        self.lock = threading.Lock()
+        self.load_config()
+        self.load_cache()
+
+    def load_config(self):
+        if not os.path.exists(self.config_path):
+            return
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                self.configure(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"DNS config error: {e}")
+
+    def save_config(self):
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_config(), f, indent=2)
+
+    def get_config(self):
+        return {'servers': self.servers, 'domains': self.domains, 'samples': self.samples,
+                'timeout': self.timeout, 'ttl': self.ttl}
+
+    def configure(self, servers=None, domains=None, samples=None, timeout=None, ttl=None):
+        if ttl is not None:
+            self.ttl = max(0, float(ttl))
+        if servers is not None:
+            self.servers = {str(name): str(ip) for name, ip in servers.items()}
+        if domains is not None:
+            self.domains = [str(d) for d in domains if d]
+        if samples is not None:
+            self.samples = max(1, int(samples))
+        if timeout is not None:
+            self.timeout = float(timeout)
+
+    async def _probe(self, ip, port, domains, samples, timeout):
+        loop = asyncio.get_running_loop()
+        transport, proto = await loop.create_datagram_endpoint(DNSProbeProtocol, remote_addr=(ip, port))
+        cold, cached = [], []
+        sent = 0
+        try:
+            # First round per domain is the cold lookup, the rest should be cache hits
+            for round_no in range(samples + 1):
+                for domain in domains:
+                    query_id = random.randrange(0x10000)
+                    fut = loop.create_future()
+                    proto.pending[query_id] = fut
+                    sent += 1
+                    started = time.perf_counter()
+                    transport.sendto(build_dns_query(domain, query_id))
+                    try:
+                        done = await asyncio.wait_for(fut, timeout)
+                        (cold if round_no == 0 else cached).append((done - started) * 1000)
+                    except (asyncio.TimeoutError, OSError):
+                        proto.pending.pop(query_id, None)
+        finally:
+            transport.close()
+        return cold, cached, sent
+
+    async def benchmark_async(self, servers=None, domains=None, samples=None, timeout=None, port=None):
+        servers = servers or self.servers
+        domains = domains or self.domains
+        samples = samples or self.samples
+        timeout = timeout or self.timeout
+        port = port or self.port
+        names = list(servers)
+        # All resolvers are probed at once
+        outcomes = await asyncio.gather(
+            *(self._probe(servers[name], port, domains, samples, timeout) for name in names),
+            return_exceptions=True)
+
         results = []
-        for name, ip in self.servers.items():
+        for name, outcome in zip(names, outcomes):
+            ip = servers[name]
+            if isinstance(outcome, BaseException):
+                logger.error(f"DNS probe failed for {name} ({ip}): {outcome}")
+                cold, cached, sent = [], [], 0
+            else:
+                cold, cached, sent = outcome
+            stats = latency_stats(cold + cached, sent)
+            cached_stats = latency_stats(cached, sent - len(domains)) if sent else latency_stats([], 0)
+            results.append({
+                'name': name,
+                'ip': ip,
+                'latency': round(stats['p50']) if stats['p50'] is not None else 999,
+                'p50': stats['p50'],
+                'p95': stats['p95'],
+                'jitter': stats['jitter'],
+                'loss': stats['loss'] if stats['loss'] is not None else 1.0,
+                'cold': round(statistics.median(cold), 2) if cold else None,
+                'cached': cached_stats['p50'],
+                'samples': sent
+            })
+        results.sort(key=lambda x: (x['latency'], x['loss']))
+        return results
+
+    def benchmark(self, **kwargs):
+        return asyncio.run(self.benchmark_async(**kwargs))
+
+    def load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.results = data['results']
+            self.results_at = data['timestamp']
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"DNS cache unreadable: {e}")
+
+    def _save_cache(self):
+        tmp = self.cache_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': self.results_at, 'results': self.results}, f)
+        os.replace(tmp, self.cache_path)
+
+    def refresh(self):
+        try:
+            results = self.benchmark()
+            with self.lock:
+                self.results = results
+                self.results_at = time.time()
+            self._save_cache()
+        except Exception as e:
+            logger.error(f"DNS benchmark refresh error: {e}")
+        finally:
+            self.refresh_done.set()
+
+    def refresh_async(self):
+        # Starts a background refresh unless one is already running
+        with self.lock:
+            if not self.refresh_done.is_set():
+                return False
+            self.refresh_done.clear()
+        threading.Thread(target=self.refresh, daemon=True).start()
+        return True
+
+    def age(self):
+        return time.time() - self.results_at if self.results_at is not None else None
+
+    def get_results(self, force=False, wait=None):
+        # Returns cached results immediately; stale or missing results are
+        # refreshed in the background. Only waits when there is nothing to show
+        # yet or when forced.
+        age = self.age()
+        if force or age is None or age >= self.ttl or self.results is None:
+            self.refresh_async()
+        if force or self.results is None:
+            self.refresh_done.wait(wait)
+        with self.lock:
+            return {
+                'results': self.results or [],
+                'age': self.age(),
+                'ttl': self.ttl,
+                'refreshing': not self.refresh_done.is_set()
+            }
+
+    def set_dns(self, dns_ip):
+        try:
+            cmd_wifi = f'netsh interface ip set dns "Wi-Fi" static {dns_ip}'
+            cmd_eth = f'netsh interface ip set dns "Ethernet" static {dns_ip}'
+            
+            run_command(cmd_wifi, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            run_command(cmd_eth, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            
+            return True
+        except Exception as e:
+            logger.error(f"Set DNS Error: {e}")
+            return False
+
+# Initialize Managers
+network_monitor = NetworkMonitor()
+firewall_manager = FirewallManager()
+ultra_manager = UltraModeManager()
+dns_manager = DNSManager()
+
+# --- Game Library Scanner ---
+
+GAME_INDEX_PATH = data_path('game_index.json')
+GAME_SCAN_CONFIG_PATH = data_path('game_scan_config.json')
+DEFAULT_GAME_ROOTS = [
+    r"C:\Program Files (x86)\Steam\steamapps\common",
+    r"C:\Program Files\Steam\steamapps\common",
+    r"C:\Program Files\Epic Games",
+    r"C:\Program Files (x86)\Epic Games",
+]
+
+VDF_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}])|//[^\n]*|([^\s{}"]+)')
+VDF_ESCAPES = {'n': '\n', 't': '\t', '\\': '\\', '"': '"'}
+
+def parse_vdf(text):
+    # Valve KeyValues text (libraryfolders.vdf, appmanifest_*.acf) -> nested dicts.
+    # Duplicate keys keep the last value.
+    root = {}
+    stack = [root]
+    key = None
+    for match in VDF_TOKEN.finditer(text):
+        quoted, brace, bare = match.groups()
+        if brace == '{':
+            child = {}
+            if key is not None:
+                stack[-1][key] = child
+            stack.append(child)
+            key = None
+        elif brace == '}':
+            if len(stack) > 1:
+                stack.pop()
+            key = None
+        elif quoted is not None or bare is not None:
+            token = bare if quoted is None else (re.sub(r'\\(.)', lambda m: VDF_ESCAPES.get(m.group(1), m.group(1)), quoted) if '\\' in quoted else quoted)
+            if key is None:
+                key = token
+            else:
+                stack[-1][key] = token
+                key = None
+    return root
+
+def default_steam_roots():
+    roots = []
+    try:
+        import winreg
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Valve\Steam") as k:
+            roots.append(os.path.normpath(winreg.QueryValueEx(k, 'SteamPath')[0]))
+    except (ImportError, OSError):
+        pass
+    roots += [r"C:\Program Files (x86)\Steam", r"C:\Program Files\Steam"]
+    return roots
+
+def default_epic_manifest_dirs():
+    program_data = os.environ.get('PROGRAMDATA', r"C:\ProgramData")
+    return [os.path.join(program_data, 'Epic', 'EpicGamesLauncher', 'Data', 'Manifests')]
+
+STEAM_SKIP_APPIDS = {'228980'} # Steamworks Common Redistributables
+
+class ManifestDiscovery:
+    # Reads launcher manifests instead of walking game folders
+    def __init__(self, steam_roots=None, epic_manifest_dirs=None):
+        self.steam_roots = steam_roots if steam_roots is not None else default_steam_roots()
+        self.epic_manifest_dirs = epic_manifest_dirs if epic_manifest_dirs is not None else default_epic_manifest_dirs()
+
+    def _read_vdf(self, path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return parse_vdf(f.read())
+
+    def steam_libraries(self):
+        libraries = []
+        seen = set()
+        for root in self.steam_roots:
+            candidates = [root]
+            vdf_path = os.path.join(root, 'steamapps', 'libraryfolders.vdf')
+            try:
+                folders = self._read_vdf(vdf_path)
+                folders = folders.get('libraryfolders') or folders.get('LibraryFolders') or {}
+                for key, value in folders.items():
+                    if not key.isdigit():
+                        continue
+                    # New format: {"path": ..., "apps": {...}}, old format: plain path string
+                    path = value.get('path') if isinstance(value, dict) else value
+                    if path:
+                        candidates.append(os.path.normpath(path))
+            except OSError:
+                pass
+            for lib in candidates:
+                key = os.path.normcase(os.path.normpath(lib))
+                if key not in seen and os.path.isdir(os.path.join(lib, 'steamapps')):
+                    seen.add(key)
+                    libraries.append(lib)
+        return libraries
+
+    def steam_games(self):
+        games = []
+        for lib in self.steam_libraries():
+            steamapps = os.path.join(lib, 'steamapps')
+            try:
+                entries = [e.path for e in os.scandir(steamapps)
+                           if e.name.startswith('appmanifest_') and e.name.endswith('.acf')]
+            except OSError:
+                continue
+            for path in entries:
+                try:
+                    state = self._read_vdf(path).get('AppState', {})
+                except OSError:
+                    continue
+                appid = state.get('appid')
+                installdir = state.get('installdir')
+                flags = state.get('StateFlags')
+                if not appid or not installdir or appid in STEAM_SKIP_APPIDS:
+                    continue
+                if flags and flags.isdigit() and not int(flags) & 4: # 4 = fully installed
+                    continue
+                games.append({
+                    'name': state.get('name') or installdir,
+                    'appid': appid,
+                    'install_dir': os.path.join(steamapps, 'common', installdir),
+                    'platform': 'Steam',
+                    'launch_uri': f"steam://rungameid/{appid}"
+                })
+        return games
+
+    def epic_games(self):
+        games = []
+        for directory in self.epic_manifest_dirs:
+            try:
+                items = [e.path for e in os.scandir(directory) if e.name.endswith('.item')]
+            except OSError:
+                continue
+            for path in items:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        item = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                location = item.get('InstallLocation')
+                launch = item.get('LaunchExecutable')
+                if not location or item.get('bIsIncompleteInstall'):
+                    continue
+                games.append({
+                    'name': item.get('DisplayName') or item.get('AppName') or os.path.basename(location),
+                    'path': os.path.join(location, launch) if launch else None,
+                    'install_dir': location,
+                    'platform': 'Epic',
+                    'app_name': item.get('AppName')
+                })
+        return games
+
+class GameLibraryScanner:
+    # Each game directory is resolved once and remembered by the mtimes of
+    # the directories that were listed for it; unchanged ones are skipped.
+    def __init__(self, index_path=GAME_INDEX_PATH, config_path=GAME_SCAN_CONFIG_PATH, discovery=None):
+        self.index_path = index_path
+        self.config_path = config_path
+        self.discovery = discovery or ManifestDiscovery()
+        self.roots = list(DEFAULT_GAME_ROOTS)
+        self.max_depth = 0 # subdirectory levels searched for executables
+        self.workers = 8
+        self.index = {} # game dir -> {'dirs': {path: mtime_ns}, 'game': {...} | None}
+        self.lock = threading.Lock()
+        self.last_scan = None
+        self.load_config()
+        self.load_index()
+
+    def load_config(self):
+        if not os.path.exists(self.config_path):
+            return
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.configure(data.get('roots'), data.get('max_depth'), data.get('workers'))
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Scanner config error: {e}")
+
+    def save_config(self):
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_config(), f, indent=2)
+
+    def get_config(self):
+        return {'roots': self.roots, 'max_depth': self.max_depth, 'workers': self.workers}
+
+    def configure(self, roots=None, max_depth=None, workers=None):
+        if roots is not None:
+            self.roots = [str(r) for r in roots if r]
+        if max_depth is not None:
+            self.max_depth = max(0, int(max_depth))
+            with self.lock:
+                self.index = {} # cached results depend on the depth
+        if workers is not None:
+            self.workers = max(1, int(workers))
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Game index unreadable, rescanning: {e}")
+
+    def _save_index(self):
+        tmp = self.index_path + '.tmp'
+        with self.lock:
+            data = json.dumps(self.index)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, self.index_path)
+
+    def _platform(self, root):
+        return 'Steam' if 'steam' in root.lower() else 'Epic'
+
+    def _is_fresh(self, cached):
+        try:
+            return all(os.stat(p).st_mtime_ns == m for p, m in cached['dirs'].items())
+        except OSError:
+            return False
+
+    def _largest_exe(self, path):
+        # scandir entries carry stat info from the listing on Windows, so
+        # picking the biggest exe costs no extra syscalls per file there
+        best, best_size = None, -1
+        dirs = {}
+        stack = [(path, 0)]
+        while stack:
+            current, depth = stack.pop()
+            try:
+                dirs[current] = os.stat(current).st_mtime_ns
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_file() and entry.name.lower().endswith('.exe'):
+                            size = entry.stat().st_size
+                            if size > best_size:
+                                best, best_size = entry.path, size
+                        elif depth < self.max_depth and entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, depth + 1))
+            except OSError as e:
+                logger.debug(f"Skipping {current}: {e}")
+        return best, dirs
+
+    def _resolve(self, path, name, platform):
+        with self.lock:
+            cached = self.index.get(path)
+        if cached is not None and self._is_fresh(cached):
+            return cached['game'], True
+        exe_path, dirs = self._largest_exe(path)
+        game = {'name': name, 'path': exe_path, 'platform': platform, 'source': 'heuristic'} if exe_path else None
+        with self.lock:
+            self.index[path] = {'dirs': dirs, 'game': game}
+        return game, False
+
+    def _game_dirs(self, roots, covered):
+        for root in roots:
+            platform = self._platform(root)
+            try:
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if entry.is_dir() and os.path.normcase(entry.path) not in covered:
+                            yield entry.path, entry.name, platform
+            except OSError:
+                continue
+
+    def _manifest_games(self):
+        # Games known from launcher manifests, plus their install dirs
+        try:
+            steam = self.discovery.steam_games()
+            libraries = self.discovery.steam_libraries()
+        except Exception as e:
+            logger.error(f"Steam manifest discovery error: {e}")
+            steam, libraries = [], []
+        try:
+            epic = self.discovery.epic_games()
+        except Exception as e:
+            logger.error(f"Epic manifest discovery error: {e}")
+            epic = []
+        covered = {os.path.normcase(g['install_dir']) for g in steam + epic}
+        common = [os.path.join(lib, 'steamapps', 'common') for lib in libraries]
+        return steam, epic, covered, common
+
+    def _resolve_steam(self, game):
+        # Steam manifests have no executable; pick it inside the known install dir only
+        found, cached = self._resolve(game['install_dir'], game['name'], 'Steam')
+        if not found:
+            return None, cached
+        result = dict(game)
+        result['path'] = found['path']
+        result['source'] = 'manifest'
+        return result, cached
+
+    def iter_scan(self):
+        started = time.perf_counter()
+        seen = set()
+        cached_hits = 0
+        steam, epic, covered, common = self._manifest_games()
+        for game in epic:
+            if game['path'] and os.path.exists(game['path']):
+                game['source'] = 'manifest'
+                yield game
+            else:
+                covered.discard(os.path.normcase(game['install_dir']))
+
+        roots = list(self.roots)
+        known = {os.path.normcase(r) for r in roots}
+        roots += [c for c in common if os.path.normcase(c) not in known]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for game in steam:
+                seen.add(game['install_dir'])
+                futures.append(pool.submit(self._resolve_steam, game))
+            # Heuristic fallback only for folders no manifest accounts for
+            for path, name, platform in self._game_dirs(roots, covered):
+                seen.add(path)
+                futures.append(pool.submit(self._resolve, path, name, platform))
+            for fut in as_completed(futures):
+                try:
+                    game, cached = fut.result()
+                except Exception as e:
+                    logger.error(f"Scan error: {e}")
+                    continue
+                cached_hits += cached
+                if game:
+                    yield game
+        with self.lock:
+            for path in [p for p in self.index if p not in seen]:
+                del self.index[path]
+        try:
+            self._save_index()
+        except OSError as e:
+            logger.error(f"Failed to save game index: {e}")
+        self.last_scan = {
+            'manifest_games': len(steam) + len(epic),
+            'dirs': len(seen),
+            'cached': cached_hits,
+            'scanned': len(seen) - cached_hits,
+            'ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def scan(self):
+        return list(self.iter_scan())
+
+game_scanner = GameLibraryScanner()
+
+# Auto‑Launcher configuration
+CONFIG_PATH = data_path('game_autolaunch_config.json')
+
+def load_config():
+    if not os.path.exists(CONFIG_PATH):
+        return []
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_config(data):
+    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+# Global state for remapping
+remapping_active = False
+
+# Helper to perform actions
+def perform_action(action, game_pid=None):
+    global remapping_active
+    action_type = action.get('type')
+    if action_type == 'remap_profile':
+        profile = action.get('profile', 'classic')
+        remapping_active = True
+        keyboard_hooks.unhook_all()
+        if profile == 'classic':
+            keyboard_hooks.remap_key('up', 'w')
+            keyboard_hooks.remap_key('down', 's')
+            keyboard_hooks.remap_key('left', 'a')
+            keyboard_hooks.remap_key('right', 'd')
+            keyboard_hooks.remap_key('space', '1')
+            keyboard_hooks.remap_key('tab', 'page down')
+        elif profile == 'numpad':
+            keyboard_hooks.remap_key('8', 'w')
+            keyboard_hooks.remap_key('5', 's')
+            keyboard_hooks.remap_key('4', 'a')
+            keyboard_hooks.remap_key('6', 'd')
+            keyboard_hooks.remap_key('7', 'q')
+            keyboard_hooks.remap_key('9', 'e')
+            keyboard_hooks.remap_key('0', 'space')
+            keyboard_hooks.remap_key('enter', 'f')
+        logger.info(f"Remap profile applied: {profile}")
+    elif action_type == 'ultra_mode':
+        if game_pid:
+            ultra_manager.enable(game_pid)
+            logger.info(f"Ultra mode enabled for PID {game_pid}")
+    elif action_type == 'background_clicker':
+        hwnd = action.get('hwnd')
+        interval = action.get('interval', 1000)
+        if hwnd:
+            threading.Thread(target=background_click_thread, args=(hwnd, interval, True), daemon=True).start()
+            logger.info(f"Background clicker started on HWND {hwnd}")
+    elif action_type == 'set_dns':
+        provider = action.get('provider')
+        if provider:
+            dns_ip = dns_manager.servers.get(provider)
+            if dns_ip:
+                dns_manager.set_dns(dns_ip)
+                logger.info(f"DNS set to {provider} ({dns_ip})")
+    elif action_type == 'clean_ram':
+        # Runs as a job: measuring the result waits for memory to settle
+        try:
+            job_manager.submit('clean_ram', {'game_pid': game_pid})
+            logger.info("RAM clean triggered")
+        except JobQueueFull as e:
+            logger.warning(f"RAM clean skipped: {e}")
+    else:
+        logger.warning(f"Unknown action type: {action_type}")
+
+RECLAIM_TARGETS = ['chrome.exe', 'firefox.exe', 'msedge.exe', 'discord.exe', 'spotify.exe']
+RECLAIM_STATE_PATH = data_path('ram_reclaim.json')
+# Share of a unit's private memory expected back per action. Suspending
+# alone frees nothing, so a suspend is paired with a working set trim; the
+# trimmed pages reach the page file over a few seconds, so count most of
+# them rather than all. Lowering priority frees nothing.
+RECLAIM_YIELD = {'lower_priority': 0.0, 'suspend': 0.8, 'terminate': 1.0}
+
+class WorkingSetTrimmer:
+    # EmptyWorkingSet: the process keeps its memory, but its pages leave RAM
+    # until it touches them again, which a suspended process won't
+    name = 'empty_working_set'
+    PROCESS_SET_QUOTA = 0x0100
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+    def __init__(self):
+        self.kernel32 = ctypes.windll.kernel32
+        self.psapi = ctypes.windll.psapi
+
+    def trim(self, pid):
+        handle = self.kernel32.OpenProcess(self.PROCESS_SET_QUOTA | self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            return bool(self.psapi.EmptyWorkingSet(handle))
+        finally:
+            self.kernel32.CloseHandle(handle)
+
+class FakeTrimmer:
+    name = 'fake'
+
+    def __init__(self):
+        self.trimmed = []
+
+    def trim(self, pid):
+        self.trimmed.append(pid)
+        return True
+
+def make_trimmer():
+    choice = os.environ.get('GM_TRIM_BACKEND')
+    if choice == 'fake':
+        return FakeTrimmer()
+    if os.name == 'nt':
+        return WorkingSetTrimmer()
+    # Without a trim a suspended process keeps its pages, so the planner
+    # only offers termination
+    return None
+
+class RamReclaimPlanner:
+    def __init__(self, targets=None, reserve_ratio=0.2, settle=1.5, trimmer=None, state_path=RECLAIM_STATE_PATH):
+        self.targets = [t.lower() for t in (targets or RECLAIM_TARGETS)]
+        self.reserve_ratio = reserve_ratio # keep this share of RAM available
+        self.settle = settle # seconds to wait before measuring the result
+        self.trimmer = trimmer
+        self.state_path = state_path
+        # Undone by restore_all, and saved so a restart can still undo them
+        self.suspended = {} # pid -> create_time
+        self.lowered = {} # pid -> [create_time, original priority]
+        self.game_pids = set() # games whose launch caused the changes held now
+        self.lock = threading.Lock()
+        self.load_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.suspended = {int(pid): ct for pid, ct in data.get('suspended', {}).items()}
+            self.lowered = {int(pid): entry for pid, entry in data.get('lowered', {}).items()}
+            self.game_pids = set(data.get('game_pids', []))
+        except (OSError, ValueError) as e:
+            logger.error(f"RAM reclaim state unreadable: {e}")
+
+    def save_state(self):
+        with self.lock:
+            data = {'suspended': self.suspended, 'lowered': self.lowered, 'game_pids': sorted(self.game_pids)}
+            tmp = self.state_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.state_path)
+
+    def _private_bytes(self, pid):
+        # PSS where the OS has it, USS otherwise; RSS double-counts shared pages
+        try:
+            full = psutil.Process(pid).memory_full_info()
+            return getattr(full, 'pss', None) or full.uss
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, AttributeError):
+            return None
+
+    def units(self, snapshot):
+        # Group candidate processes into trees: a candidate whose parent is
+        # also a candidate belongs to the parent's unit (e.g. browser helpers)
+        candidates = {p.pid: p for p in snapshot if p.name and p.name.lower() in self.targets}
+        roots = {}
+        for pid, proc in candidates.items():
+            root = pid
+            seen = set()
+            while candidates[root].ppid in candidates and root not in seen:
+                seen.add(root)
+                root = candidates[root].ppid
+            roots.setdefault(root, []).append(proc)
+        units = []
+        for root, procs in roots.items():
+            sizes = [self._private_bytes(p.pid) for p in procs]
+            # Fall back to RSS only if private sizes are unavailable
+            size = sum(sz for sz in sizes if sz is not None)
+            if not any(sz is not None for sz in sizes):
+                size = sum(p.memory_info.rss for p in procs if p.memory_info)
+            units.append({
+                'root': root,
+                'name': candidates[root].name,
+                'pids': [p.pid for p in procs],
+                'create_times': {p.pid: p.create_time for p in procs},
+                'bytes': size
+            })
+        units.sort(key=lambda u: u['bytes'], reverse=True)
+        return units
+
+    def default_target(self):
+        # The shortfall below the reserve; 0 when there is no memory pressure
+        mem = psutil.virtual_memory()
+        return max(0, int(mem.total * self.reserve_ratio) - mem.available)
+
+    def plan(self, target_bytes, snapshot=None, allow_terminate=True):
+        # Fewest units first (largest first), then downgrade each chosen unit
+        # to the gentlest action that still reaches the target
+        units = self.units(snapshot or process_sampler.latest())
+        can_suspend = self.trimmer is not None
+        strongest = 'terminate' if allow_terminate else ('suspend' if can_suspend else None)
+        chosen, expected = [], 0
+        for unit in units:
+            if target_bytes <= 0 or strongest is None or expected >= target_bytes:
+                break
+            chosen.append({'unit': unit, 'action': strongest})
+            expected += unit['bytes'] * RECLAIM_YIELD[strongest]
+        if strongest == 'terminate' and can_suspend:
+            # Downgrade the smallest units first, they matter least to the total
+            for step in reversed(chosen):
+                gain = step['unit']['bytes'] * (RECLAIM_YIELD['terminate'] - RECLAIM_YIELD['suspend'])
+                if expected - gain >= target_bytes:
+                    step['action'] = 'suspend'
+                    expected -= gain
+        # Under pressure the units left over only get a lower priority
+        if target_bytes > 0:
+            chosen += [{'unit': unit, 'action': 'lower_priority'} for unit in units[len(chosen):]]
+        actions = [{'action': step['action'], 'name': step['unit']['name'], 'root': step['unit']['root'],
+                    'pids': step['unit']['pids'], 'bytes': step['unit']['bytes'],
+                    'expected': int(step['unit']['bytes'] * RECLAIM_YIELD[step['action']])}
+                   for step in chosen]
+        return {'target_bytes': target_bytes, 'expected_bytes': int(expected),
+                'reachable': expected >= target_bytes, 'actions': actions, 'units': units}
+
+    def _act(self, action, unit):
+        # Children before the root so the tree doesn't respawn helpers
+        for pid in reversed(unit['pids']):
+            create_time = unit['create_times'].get(pid)
             try:
-                # Ping
-                output = subprocess.check_output(f"ping -n 1 -w 1000 {ip}", shell=True).decode()
-                if "time=" in output:
-                    ms = int(output.split("time=")[1].split("ms")[0])
-                    results.append({'name': name, 'ip': ip, 'latency': ms})
+                proc = psutil.Process(pid)
+                if create_time is not None and proc.create_time() != create_time:
+                    continue
+                if action == 'terminate':
+                    proc.terminate()
+                elif action == 'suspend':
+                    proc.suspend()
+                    with self.lock:
+                        self.suspended[pid] = create_time
+                    self.trimmer.trim(pid)
                 else:
-                    results.append({'name': name, 'ip': ip, 'latency': 999})
-            except:
-                results.append({'name': name, 'ip': ip, 'latency': 999})
-        
-        results.sort(key=lambda x: x['latency'])
-        return results
+                    # Priorities the user picked by hand are left alone
+                    original = proc.nice()
+                    if original == PRIORITY_LEVELS['normal'] and set_process_priority(proc, 'below_normal'):
+                        with self.lock:
+                            self.lowered.setdefault(pid, [create_time, original])
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+
+    def reclaim(self, target_bytes=None, dry_run=False, allow_terminate=True, game_pid=None):
+        target = self.default_target() if target_bytes is None else int(target_bytes)
+        plan = self.plan(target, allow_terminate=allow_terminate)
+        units = {u['root']: u for u in plan.pop('units')}
+        plan['dry_run'] = dry_run
+        # nothing_needed / no_candidates / planned / done, for the UI
+        if target <= 0:
+            plan['status'] = 'nothing_needed'
+        elif not plan['actions']:
+            plan['status'] = 'no_candidates'
+        else:
+            plan['status'] = 'planned' if dry_run else 'done'
+        if plan['status'] != 'done':
+            plan['reclaimed_bytes'] = 0
+            return plan
+        if game_pid is not None:
+            with self.lock:
+                self.game_pids.add(game_pid)
+        before = psutil.virtual_memory().available
+        for step in plan['actions']:
+            self._act(step['action'], units[step['root']])
+            logger.info(f"RAM reclaim: {step['action']} {step['name']} ({len(step['pids'])} processes, ~{step['bytes'] // 1048576} MB)")
+        self.save_state()
+        time.sleep(self.settle)
+        plan['reclaimed_bytes'] = max(0, psutil.virtual_memory().available - before)
+        return plan
+
+    def on_games(self, games):
+        # Changes made for a game launch are undone once those games exit
+        with self.lock:
+            held = set(self.game_pids)
+        if held and not held & {g['pid'] for g in games}:
+            self.restore_all('game exited')
+
+    def restore_all(self, reason):
+        with self.lock:
+            suspended, self.suspended = self.suspended, {}
+            lowered, self.lowered = self.lowered, {}
+            self.game_pids = set()
+        if not suspended and not lowered:
+            return {'resumed': 0, 'restored': 0}
+        resumed = restored = 0
+        for pid, create_time in suspended.items():
+            try:
+                proc = psutil.Process(pid)
+                if create_time is None or proc.create_time() == create_time:
+                    proc.resume()
+                    resumed += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        for pid, (create_time, original) in lowered.items():
+            try:
+                proc = psutil.Process(pid)
+                if create_time is None or proc.create_time() == create_time:
+                    restored += set_process_priority(proc, original)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        self.save_state()
+        logger.info(f"RAM reclaim undone ({reason}): {resumed} resumed, {restored} priorities restored")
+        return {'resumed': resumed, 'restored': restored}
+
+    def get_status(self):
+        with self.lock:
+            return {'suspended': len(self.suspended), 'lowered': len(self.lowered),
+                    'trimmer': self.trimmer.name if self.trimmer else None}
+
+ram_planner = RamReclaimPlanner(trimmer=make_trimmer())
+
+def clean_ram_logic(target_bytes=None, dry_run=False, allow_terminate=True, game_pid=None):
+    report = ram_planner.reclaim(target_bytes, dry_run, allow_terminate, game_pid)
+    # Fields the Booster panel shows
+    report['killed'] = [a['name'] for a in report['actions'] if a['action'] == 'terminate']
+    report['suspended'] = [a['name'] for a in report['actions'] if a['action'] == 'suspend']
+    report['freed_bytes'] = report['reclaimed_bytes']
+    return report
+
+# Monitor thread to watch for game launches
+class GameLaunchDetector:
+    def __init__(self, config_path=CONFIG_PATH, action_handler=None):
+        self.config_path = config_path
+        self.action_handler = action_handler
+        self.index = {} # normcase(exe) -> [(exe_path, actions), ...]
+        self.config_mtime = None
+        self.seen = set() # (pid, create_time) of every live process already inspected
+        self.active = {} # (pid, create_time) -> exe_path of detected games still running
+        self.lock = threading.Lock()
+        self.stats = {
+            'ticks': 0,
+            'launches': 0,
+            'indexed_paths': 0,
+            'last_tick_ms': 0.0,
+            'max_tick_ms': 0.0,
+            'total_tick_ms': 0.0,
+            'last_new_pids': 0,
+            'last_detection_latency_ms': None,
+            'max_detection_latency_ms': None,
+        }
+
+    def set_config(self, config):
+        index = {}
+        for entry in config:
+            exe_path = entry.get('exe_path')
+            if not exe_path:
+                continue
+            index.setdefault(os.path.normcase(exe_path), []).append((exe_path, entry.get('actions', [])))
+        with self.lock:
+            self.index = index
+            self.stats['indexed_paths'] = len(index)
+
+    def invalidate(self):
+        self.config_mtime = None
+
+    def reload_if_changed(self):
+        # Only re-read the config when the file actually changed
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        if mtime == self.config_mtime:
+            return False
+        self.config_mtime = mtime
+        self.set_config(load_config() if mtime else [])
+        return True
+
+    def process(self, snapshot):
+        started = time.perf_counter()
+        handler = self.action_handler or perform_action
+        launches = []
+        with self.lock:
+            index = self.index
+            current = set()
+            new_procs = []
+            for proc in snapshot:
+                key = (proc.pid, proc.create_time)
+                current.add(key)
+                if key not in self.seen:
+                    new_procs.append(proc)
+            # Forget exited processes so reused PIDs fire again
+            self.seen = current
+            for key in [k for k in self.active if k not in current]:
+                logger.info(f"Game exited: {self.active.pop(key)} (PID {key[0]})")
+
+            for proc in new_procs:
+                if not proc.exe or not index:
+                    continue
+                matches = index.get(os.path.normcase(proc.exe))
+                if matches:
+                    launches.append((proc, matches))
+                    self.active[(proc.pid, proc.create_time)] = matches[0][0]
+
+        now = time.time()
+        for proc, matches in launches:
+            for exe_path, actions in matches:
+                logger.info(f"Game launched: {exe_path} (PID {proc.pid})")
+                for act in actions:
+                    handler(act, game_pid=proc.pid)
+            if proc.create_time:
+                self._record_latency(max(0.0, now - proc.create_time) * 1000)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.stats['ticks'] += 1
+            self.stats['launches'] += len(launches)
+            self.stats['last_new_pids'] = len(new_procs)
+            self.stats['last_tick_ms'] = elapsed
+            self.stats['total_tick_ms'] += elapsed
+            self.stats['max_tick_ms'] = max(self.stats['max_tick_ms'], elapsed)
+        return [proc.pid for proc, _ in launches]
+
+    def _record_latency(self, latency_ms):
+        with self.lock:
+            self.stats['last_detection_latency_ms'] = latency_ms
+            prev = self.stats['max_detection_latency_ms']
+            self.stats['max_detection_latency_ms'] = latency_ms if prev is None else max(prev, latency_ms)
+
+    def active_games(self):
+        with self.lock:
+            return [{'pid': pid, 'exe': exe} for (pid, _), exe in self.active.items()]
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['tracked_pids'] = len(self.seen)
+            stats['active_games'] = len(self.active)
+        stats['avg_tick_ms'] = stats['total_tick_ms'] / stats['ticks'] if stats['ticks'] else 0.0
+        return stats
+
+launch_detector = GameLaunchDetector()
+
+# --- Bandwidth Guard ---
+
+# Network rates in bytes/s. A consumer must stay above the enter rate for
+# `sustain` seconds before acting, and below `release_rate` for `min_hold`
+# seconds before a throttle is lifted. A throttle caps the app at
+# `throttle_limit`. Blocks are held until the game exits.
+GUARD_PROFILES = {
+    'soft': {'enforce': False, 'throttle_rate': 512 * 1024, 'throttle_limit': 256 * 1024,
+             'block_rate': 2 * 1024 * 1024, 'release_rate': 128 * 1024, 'sustain': 3, 'min_hold': 30},
+    'hard': {'enforce': True, 'throttle_rate': 256 * 1024, 'throttle_limit': 128 * 1024,
+             'block_rate': 1024 * 1024, 'release_rate': 64 * 1024, 'sustain': 3, 'min_hold': 30},
+    'pro': {'enforce': True, 'throttle_rate': None, 'throttle_limit': None,
+            'block_rate': 16 * 1024, 'release_rate': 0, 'sustain': 1, 'min_hold': 60},
+}
+
+# Never throttled or blocked, whatever the mode
+GUARD_PROTECTED_DIRS = tuple(os.path.normcase(d) for d in (
+    os.environ.get('SystemRoot', r'C:\Windows'),
+    os.path.join(os.environ.get('ProgramFiles', r'C:\Program Files'), 'Windows Defender'),
+))
+GUARD_PROTECTED_NAMES = {'svchost.exe', 'system', 'lsass.exe', 'csrss.exe', 'services.exe', 'wininit.exe',
+                         'winlogon.exe', 'smss.exe', 'dwm.exe', 'explorer.exe', 'msmpeng.exe'}
+
+# Per-process network traffic. sample() returns {pid: bytes} counters that
+# only ever grow, so rates are plain differences between two samples.
+class TcpEStatsSource:
+    # Windows TCP extended statistics (iphlpapi): byte counters per IPv4
+    # connection, summed per owning process. Collection has to be switched
+    # on per connection, which needs administrator rights. UDP and IPv6
+    # traffic are not counted.
+    name = 'tcp_estats'
+    AF_INET = 2
+    TCP_TABLE_OWNER_PID_CONNECTIONS = 4
+    MIB_TCP_STATE_ESTAB = 5
+    TCP_CONNECTION_ESTATS_DATA = 1
+
+    def __init__(self):
+        class TcpRow(ctypes.Structure):
+            _fields_ = [('state', ctypes.c_ulong), ('local_addr', ctypes.c_ulong), ('local_port', ctypes.c_ulong),
+                        ('remote_addr', ctypes.c_ulong), ('remote_port', ctypes.c_ulong)]
+
+        class DataRod(ctypes.Structure):
+            _fields_ = [('bytes_out', ctypes.c_uint64), ('segs_out', ctypes.c_uint64),
+                        ('bytes_in', ctypes.c_uint64), ('segs_in', ctypes.c_uint64),
+                        ('all_segs_out', ctypes.c_uint64), ('all_segs_in', ctypes.c_uint64),
+                        ('soft_errors', ctypes.c_ulong), ('soft_error_reason', ctypes.c_ulong),
+                        ('snd_una', ctypes.c_ulong), ('snd_nxt', ctypes.c_ulong), ('snd_max', ctypes.c_ulong),
+                        ('thru_bytes_acked', ctypes.c_uint64), ('rcv_nxt', ctypes.c_ulong),
+                        ('thru_bytes_received', ctypes.c_uint64)]
+
+        self.TcpRow = TcpRow
+        self.DataRod = DataRod
+        self.iphlpapi = ctypes.windll.iphlpapi
+        self.connections = {} # (row fields, pid) -> bytes already counted
+        self.totals = {} # pid -> bytes
+        self.lock = threading.Lock()
+
+    def _table(self):
+        size = ctypes.c_ulong(0)
+        self.iphlpapi.GetExtendedTcpTable(None, ctypes.byref(size), False, self.AF_INET,
+                                          self.TCP_TABLE_OWNER_PID_CONNECTIONS, 0)
+        buf = ctypes.create_string_buffer(size.value + 4096)
+        size = ctypes.c_ulong(len(buf))
+        if self.iphlpapi.GetExtendedTcpTable(buf, ctypes.byref(size), False, self.AF_INET,
+                                             self.TCP_TABLE_OWNER_PID_CONNECTIONS, 0):
+            return []
+        # MIB_TCPTABLE_OWNER_PID: entry count, then rows of 6 DWORDs (a MIB_TCPROW plus the pid)
+        count = ctypes.c_ulong.from_buffer(buf).value
+        rows = (ctypes.c_ulong * (6 * count)).from_buffer(buf, ctypes.sizeof(ctypes.c_ulong))
+        return [tuple(rows[i * 6:i * 6 + 6]) for i in range(count)]
+
+    def _bytes(self, fields, enable):
+        row = self.TcpRow(*fields)
+        if enable:
+            switch = ctypes.c_ubyte(1)
+            self.iphlpapi.SetPerTcpConnectionEStats(ctypes.byref(row), self.TCP_CONNECTION_ESTATS_DATA,
+                                                    ctypes.byref(switch), 0, 1, 0)
+        rod = self.DataRod()
+        if self.iphlpapi.GetPerTcpConnectionEStats(ctypes.byref(row), self.TCP_CONNECTION_ESTATS_DATA,
+                                                   None, 0, 0, None, 0, 0,
+                                                   ctypes.byref(rod), 0, ctypes.sizeof(rod)):
+            return None
+        return rod.bytes_in + rod.bytes_out
+
+    def sample(self):
+        with self.lock:
+            live = {}
+            for entry in self._table():
+                fields, pid = entry[:5], entry[5]
+                if fields[0] != self.MIB_TCP_STATE_ESTAB or not pid:
+                    continue
+                key = (fields, pid)
+                total = self._bytes(fields, key not in self.connections)
+                if total is None:
+                    continue
+                # Closed connections drop out of the table, so only growth counts
+                seen = self.connections.get(key, 0)
+                self.totals[pid] = self.totals.get(pid, 0) + max(0, total - seen)
+                live[key] = max(total, seen)
+            self.connections = live
+            alive = {pid for _, pid in live}
+            self.totals = {pid: b for pid, b in self.totals.items() if pid in alive}
+            return dict(self.totals)
+
+class FakeTrafficSource:
+    # Settable per-pid byte counters for tests
+    name = 'fake'
+
+    def __init__(self, totals=None):
+        self.totals = dict(totals or {})
+
+    def add(self, pid, nbytes):
+        self.totals[pid] = self.totals.get(pid, 0) + nbytes
+
+    def sample(self):
+        return dict(self.totals)
+
+def make_traffic_source():
+    choice = os.environ.get('GM_TRAFFIC_SOURCE')
+    if choice == 'fake':
+        return FakeTrafficSource()
+    if os.name == 'nt':
+        return TcpEStatsSource()
+    # No per-process network counters here without packet capture, and disk
+    # I/O is no stand-in: the guard stays idle rather than guess
+    return None
+
+class TrafficMeter:
+    # Turns a traffic source's counters into per-process network rates
+    def __init__(self, source):
+        self.source = source
+        self.last = {} # pid -> bytes
+        self.last_time = None
+
+    def rates(self, snapshot, now=None):
+        now = time.monotonic() if now is None else now
+        totals = self.source.sample()
+        elapsed = now - self.last_time if self.last_time is not None else 0
+        consumers = []
+        if elapsed > 0:
+            for pid, total in totals.items():
+                speed = (total - self.last.get(pid, total)) / elapsed
+                proc = snapshot.get(pid)
+                if speed > 0 and proc is not None:
+                    consumers.append({'pid': pid, 'exe': proc.exe, 'name': proc.name, 'speed': speed})
+        self.last, self.last_time = totals, now
+        return consumers
+
+# Throttles cap an app's outbound rate; priorities don't affect bandwidth
+THROTTLE_PREFIX = 'GM_Throttle_'
+
+def throttle_policy_name(exe_path):
+    return THROTTLE_PREFIX + firewall_rule_name(exe_path)[len(FIREWALL_RULE_PREFIX):]
+
+def powershell_quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+class QosThrottler:
+    # Windows QoS policies in the ActiveStore: applied at once, gone after a
+    # reboot, so a crash can't leave a throttle behind for long
+    name = 'qos'
+
+    def _run(self, script):
+        run_command(['powershell', '-NoProfile', '-NonInteractive', '-Command', script], check=True,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def limit(self, exe, bytes_per_sec):
+        name = powershell_quote(throttle_policy_name(exe))
+        self._run(f"Remove-NetQosPolicy -Name {name} -PolicyStore ActiveStore -Confirm:$false -ErrorAction SilentlyContinue; "
+                  f"New-NetQosPolicy -Name {name} -AppPathNameMatchCondition {powershell_quote(exe)} "
+                  f"-ThrottleRateActionBitsPerSecond {int(bytes_per_sec) * 8} -PolicyStore ActiveStore | Out-Null")
+
+    def release(self, exe):
+        self._run(f"Remove-NetQosPolicy -Name {powershell_quote(throttle_policy_name(exe))} "
+                  f"-PolicyStore ActiveStore -Confirm:$false -ErrorAction SilentlyContinue")
+
+    def clear(self):
+        self._run(f"Get-NetQosPolicy -PolicyStore ActiveStore | Where-Object Name -like '{THROTTLE_PREFIX}*' | "
+                  f"Remove-NetQosPolicy -Confirm:$false")
+
+class FakeThrottler:
+    name = 'fake'
+
+    def __init__(self):
+        self.limits = {} # exe -> bytes/s
+
+    def limit(self, exe, bytes_per_sec):
+        self.limits[exe] = bytes_per_sec
+
+    def release(self, exe):
+        self.limits.pop(exe, None)
+
+    def clear(self):
+        self.limits.clear()
+
+def make_throttler():
+    choice = os.environ.get('GM_THROTTLE_BACKEND')
+    if choice == 'fake':
+        return FakeThrottler()
+    if os.name == 'nt':
+        return QosThrottler()
+    return None
+
+class BandwidthGuard:
+    # While a detected game runs, throttles (QoS rate cap) or blocks
+    # (firewall rule) background apps whose network rate crosses the mode's
+    # thresholds, and undoes everything once the game exits. Without a
+    # per-process traffic source it stays idle.
+    def __init__(self, firewall, detector, source=None, throttler=None):
+        self.firewall = firewall
+        self.detector = detector
+        self.meter = TrafficMeter(source) if source is not None else None
+        self.throttler = throttler
+        self.lock = threading.Lock()
+        # exe -> {'over_since', 'under_since', 'action', 'since', 'throttled'}
+        # action: None, 'throttle', 'block', or 'observed_throttle'/'observed_block' when not enforced
+        self.state = {}
+        # Exes blocked by the guard (never user blocks). Blocks left over from
+        # a crash are lifted on the first tick without a running game.
+        self.blocked = set(firewall.temporary)
+        self.decisions = deque(maxlen=200)
+        self.running = True
+        self.game_active = bool(self.blocked)
+
+    def _log(self, action, exe, rate, reason):
+        entry = {'time': time.time(), 'action': action, 'exe': exe, 'rate': rate,
+                 'mode': self.firewall.mode, 'reason': reason}
+        self.decisions.append(entry)
+        logger.info(f"Guard {action}: {exe} at {rate / 1024:.0f} KB/s ({reason}, mode={self.firewall.mode})")
+
+    def _is_protected(self, exe, game_dirs):
+        if not exe or exe in self.firewall.whitelist:
+            return True
+        if os.path.basename(exe).lower() in GUARD_PROTECTED_NAMES:
+            return True
+        folder = os.path.normcase(os.path.dirname(exe))
+        if any(folder == d or folder.startswith(d + os.sep) for d in GUARD_PROTECTED_DIRS):
+            return True
+        # Anything living in a running game's folder counts as part of the game
+        return any(folder == d or folder.startswith(d + os.sep) for d in game_dirs)
+
+    def evaluate(self, now=None, consumers=None, games=None):
+        now = time.monotonic() if now is None else now
+        games = self.detector.active_games() if games is None else games
+        if not games:
+            if self.game_active:
+                self.restore_all('game exited')
+            self.game_active = False
+            return
+        self.game_active = True
+        profile = GUARD_PROFILES.get(self.firewall.mode, GUARD_PROFILES['soft'])
+        if consumers is None:
+            if self.meter is None:
+                return
+            consumers = self.meter.rates(process_sampler.latest(), now)
+        game_pids = {g['pid'] for g in games}
+        game_dirs = {os.path.normcase(os.path.dirname(g['exe'])) for g in games}
+
+        # Sum per executable; rules are per exe as well
+        rates = {}
+        for p in consumers:
+            exe = p['exe']
+            if p['pid'] in game_pids or p['pid'] == os.getpid() or self._is_protected(exe, game_dirs):
+                continue
+            rates[exe] = rates.get(exe, 0) + p['speed']
+
+        to_block, to_throttle, to_release = [], [], []
+        can_throttle = profile['enforce'] and self.throttler is not None
+        with self.lock:
+            for exe in set(rates) | set(self.state):
+                rate = rates.get(exe, 0)
+                st = self.state.setdefault(exe, {'over_since': None, 'under_since': None, 'action': None,
+                                                 'since': None, 'throttled': False})
+                wants_block = rate >= profile['block_rate']
+                wants_throttle = profile['throttle_rate'] is not None and rate >= profile['throttle_rate']
+                if wants_block or wants_throttle:
+                    st['under_since'] = None
+                    if st['over_since'] is None:
+                        st['over_since'] = now
+                elif rate <= profile['release_rate']:
+                    st['over_since'] = None
+                    if st['under_since'] is None:
+                        st['under_since'] = now
+                sustained = st['over_since'] is not None and now - st['over_since'] >= profile['sustain']
+
+                # Each state is logged once when entered
+                if st['action'] not in ('block', 'observed_block') and wants_block and sustained:
+                    if profile['enforce']:
+                        to_block.append(exe)
+                    self._log('block' if profile['enforce'] else 'would-block', exe, rate, f">= {profile['block_rate']} B/s for {profile['sustain']}s")
+                    st['action'] = 'block' if profile['enforce'] else 'observed_block'
+                    st['since'] = now
+                elif st['action'] is None and wants_throttle and sustained:
+                    if can_throttle:
+                        to_throttle.append(exe)
+                    reason = f">= {profile['throttle_rate']} B/s for {profile['sustain']}s"
+                    if profile['enforce'] and not can_throttle:
+                        reason += ', no throttle backend'
+                    self._log('throttle' if can_throttle else 'would-throttle', exe, rate, reason)
+                    st['action'] = 'throttle' if can_throttle else 'observed_throttle'
+                    st['since'] = now
+                elif st['action'] in ('throttle', 'observed_throttle', 'observed_block') and st['under_since'] is not None \
+                        and now - st['under_since'] >= profile['min_hold'] and now - st['since'] >= profile['min_hold']:
+                    if st['throttled']:
+                        to_release.append(exe)
+                        st['throttled'] = False
+                    self._log('release', exe, rate, f"<= {profile['release_rate']} B/s for {profile['min_hold']}s")
+                    st['action'] = None
+                if st['action'] is None and exe not in rates:
+                    del self.state[exe]
+        for exe in to_release:
+            self._release_throttle(exe)
+        for exe in to_throttle:
+            try:
+                self.throttler.limit(exe, profile['throttle_limit'])
+            except Exception as e:
+                logger.error(f"Throttle failed for {exe}: {e}")
+                continue
+            with self.lock:
+                st = self.state.get(exe)
+                if st is not None:
+                    st['throttled'] = True
+            if st is None:
+                # Restored while the policy was being added
+                self._release_throttle(exe)
+        if to_block:
+            result = self.firewall.apply_batch(block=to_block, temporary=True)
+            with self.lock:
+                self.blocked.update(result['block'])
+
+    def _release_throttle(self, exe):
+        try:
+            self.throttler.release(exe)
+        except Exception as e:
+            logger.error(f"Throttle release failed for {exe}: {e}")
+
+    def restore_all(self, reason):
+        with self.lock:
+            states, self.state = self.state, {}
+            blocked, self.blocked = list(self.blocked), set()
+        for exe, st in states.items():
+            if st['throttled']:
+                self._release_throttle(exe)
+                self._log('restore', exe, 0, reason)
+        if blocked:
+            result = self.firewall.apply_batch(unblock=blocked, temporary=True)
+            for exe in result['unblock']:
+                self._log('unblock', exe, 0, reason)
+
+    def run(self):
+        if self.meter is None:
+            logger.info("Bandwidth guard idle: no per-process network traffic source on this platform")
+        if self.throttler is not None:
+            # QoS policies outlive the backend; drop any left by a previous run
+            try:
+                self.throttler.clear()
+            except Exception as e:
+                logger.error(f"Failed to clear old throttles: {e}")
+        version = None
+        while self.running:
+            snapshot = process_sampler.wait_for_next(version, timeout=5)
+            if snapshot is None:
+                continue
+            version = snapshot.version
+            try:
+                self.evaluate()
+            except Exception as e:
+                logger.error(f"Bandwidth guard error: {e}")
+
+    def get_status(self):
+        with self.lock:
+            return {
+                'mode': self.firewall.mode,
+                'game_active': self.game_active,
+                'profile': GUARD_PROFILES.get(self.firewall.mode),
+                'actions': {exe: st['action'] for exe, st in self.state.items() if st['action']},
+                'blocked': sorted(self.blocked),
+                'throttled': sorted(exe for exe, st in self.state.items() if st['throttled']),
+                'rate_source': self.meter.source.name if self.meter else None,
+                'throttler': self.throttler.name if self.throttler else None,
+                'decisions': list(self.decisions)[-50:]
+            }
+
+bandwidth_guard = BandwidthGuard(firewall_manager, launch_detector, make_traffic_source(), make_throttler())
+
+def game_monitor_thread():
+    version = None
+    while True:
+        snapshot = process_sampler.wait_for_next(version, timeout=5)
+        if snapshot is None:
+            continue
+        version = snapshot.version
+        started = time.perf_counter()
+        try:
+            launch_detector.reload_if_changed()
+            launch_detector.process(snapshot)
+            ram_planner.on_games(launch_detector.active_games())
+        except Exception as e:
+            logger.error(f"Auto‑launcher monitor error: {e}")
+        loop_duration.labels('game_monitor').observe(time.perf_counter() - started)
+
+def background_click_thread(hwnd, interval, loop, trigger=None):
+    global playing, playback_end
+    logger.info(f"Background clicking started on HWND: {hwnd}")
+    playback_end = None
+    end = 'finished'
+    try:
+        while playing:
+            if trigger is not None:
+                # Click only while the trigger is on screen, e.g. a button being visible
+                waited = wait_for_trigger(trigger, lambda: playing)
+                if not playing: break
+                if not waited['matched']:
+                    logger.info(f"Background clicker trigger not met after {waited['elapsed']}s: {waited['error'] or 'timed out'}")
+                    end = 'trigger_timeout'
+                    break
+            window_backend.post_click(hwnd, 100, 100)
+            
+            if not loop:
+                break
+            
+            if interval > 0:
+                time.sleep(interval / 1000.0)
+    except Exception as e:
+        logger.error(f"Bg click error: {e}")
+        end = 'error'
+    finally:
+        playback_end = end if playing else 'stopped'
+        playing = False
+
+# --- Macro Format ---
+
+class CompactMacro:
+    # Struct-of-arrays macro: one typed column per field and integer
+    # microsecond timestamps stored as deltas from the previous event.
+    # Key names and buttons live in a string table referenced by index.
+    MAGIC = b'GMMC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBBxxIII')
+
+    EV_MOVE = 0
+    EV_MOUSE_DOWN = 1
+    EV_MOUSE_UP = 2
+    EV_KEY_DOWN = 3
+    EV_KEY_UP = 4
+
+    def __init__(self):
+        self.types = array('B')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.codes = array('i') # string table index, -1 for None
+        self.dts = array('q') # microseconds since previous event
+        self.strings = []
+        self.string_index = {}
+        self.last_us = 0
+        self.readonly = False
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.types)
+
+    def _code(self, label):
+        if label is None:
+            return -1
+        code = self.string_index.get(label)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(label)
+            self.string_index[label] = code
+        return code
+
+    def append(self, ev, x, y, label, t):
+        # t is seconds since the start of the recording
+        if self.readonly:
+            raise ValueError("Macro loaded from a buffer is read-only")
+        us = int(round(t * 1000000))
+        with self.lock:
+            self.types.append(ev)
+            self.xs.append(int(x))
+            self.ys.append(int(y))
+            self.codes.append(self._code(label))
+            self.dts.append(us - self.last_us)
+            self.last_us = us
+
+    def events(self):
+        # Yields (type, x, y, label, seconds) in recording order
+        strings = self.strings
+        us = 0
+        for ev, x, y, code, dt in zip(self.types, self.xs, self.ys, self.codes, self.dts):
+            us += dt
+            yield ev, x, y, (strings[code] if code >= 0 else None), us / 1000000
+
+    @property
+    def duration(self):
+        return sum(self.dts) / 1000000
+
+    @property
+    def nbytes(self):
+        return sum(len(col) * col.itemsize for col in (self.types, self.xs, self.ys, self.codes, self.dts))
+
+    @classmethod
+    def from_json(cls, macro):
+        compact = cls()
+        for action in macro:
+            kind = action.get('type')
+            t = action.get('time', 0)
+            if kind == 'move':
+                compact.append(cls.EV_MOVE, action['x'], action['y'], None, t)
+            elif kind == 'click':
+                ev = cls.EV_MOUSE_DOWN if action.get('pressed') else cls.EV_MOUSE_UP
+                compact.append(ev, action['x'], action['y'], action.get('button'), t)
+            elif kind == 'key_down':
+                compact.append(cls.EV_KEY_DOWN, 0, 0, action.get('key'), t)
+            elif kind == 'key_up':
+                compact.append(cls.EV_KEY_UP, 0, 0, action.get('key'), t)
+            else:
+                raise ValueError(f"Unknown macro event type: {kind}")
+        return compact
+
+    def to_json(self):
+        macro = []
+        for ev, x, y, label, t in self.events():
+            if ev == self.EV_MOVE:
+                macro.append({'type': 'move', 'x': x, 'y': y, 'time': t})
+            elif ev in (self.EV_MOUSE_DOWN, self.EV_MOUSE_UP):
+                macro.append({'type': 'click', 'x': x, 'y': y, 'button': label,
+                              'pressed': ev == self.EV_MOUSE_DOWN, 'time': t})
+            elif ev == self.EV_KEY_DOWN:
+                macro.append({'type': 'key_down', 'key': label, 'time': t})
+            else:
+                macro.append({'type': 'key_up', 'key': label, 'time': t})
+        return macro
+
+    def to_bytes(self):
+        # Layout: header, string lengths (u32), utf-8 string blob, padding to 8,
+        # then the dts/xs/ys/codes/types columns (widest first, so all aligned)
+        encoded = [label.encode('utf-8') for label in self.strings]
+        lengths = array('I', [len(b) for b in encoded])
+        blob = b''.join(encoded)
+        little = sys.byteorder == 'little'
+        parts = [self.HEADER.pack(self.MAGIC, self.VERSION, 1 if little else 0, len(self), len(encoded), len(blob)),
+                 lengths.tobytes(), blob]
+        size = sum(len(part) for part in parts)
+        parts.append(b'\0' * (-size % 8))
+        for col in (self.dts, self.xs, self.ys, self.codes, self.types):
+            parts.append(col.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, buf):
+        # Columns are memoryview casts over `buf` (no copy) when the byte order matches
+        view = memoryview(buf)
+        if len(view) < cls.HEADER.size:
+            raise ValueError("Truncated compact macro buffer")
+        magic, version, little, count, nstrings, blob_len = cls.HEADER.unpack_from(view, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a compact macro buffer")
+        # Check the sizes the header declares before slicing or casting anything
+        columns_at = cls.HEADER.size + 4 * nstrings + blob_len
+        columns_at += -columns_at % 8
+        if len(view) < columns_at + count * sum(array(t).itemsize for t in ('q', 'i', 'i', 'i', 'B')):
+            raise ValueError("Truncated compact macro buffer")
+        offset = cls.HEADER.size
+        lengths = array('I', view[offset:offset + 4 * nstrings].tobytes())
+        if little != (sys.byteorder == 'little'):
+            lengths.byteswap()
+        if sum(lengths) != blob_len:
+            raise ValueError("Corrupt compact macro string table")
+        offset += 4 * nstrings
+
+        compact = cls()
+        pos = offset
+        for n in lengths:
+            compact.strings.append(bytes(view[pos:pos + n]).decode('utf-8'))
+            pos += n
+        compact.string_index = {label: i for i, label in enumerate(compact.strings)}
+        offset += blob_len
+        offset += -offset % 8
+
+        columns = []
+        for typecode in ('q', 'i', 'i', 'i', 'B'):
+            size = array(typecode).itemsize * count
+            chunk = view[offset:offset + size]
+            if little == (sys.byteorder == 'little'):
+                columns.append(chunk.cast(typecode))
+            else:
+                col = array(typecode, chunk.tobytes())
+                col.byteswap()
+                columns.append(col)
+            offset += size
+        compact.dts, compact.xs, compact.ys, compact.codes, compact.types = columns
+        compact.last_us = sum(compact.dts)
+        compact.readonly = True
+        return compact
+
+def load_macro_payload(data):
+    # Accepts the legacy JSON event list or a base64 compact buffer
+    if isinstance(data, CompactMacro):
+        return data
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return CompactMacro.from_bytes(data)
+    if isinstance(data, str):
+        return CompactMacro.from_bytes(base64.b64decode(data))
+    return CompactMacro.from_json(data or [])
+
+# --- Mouse Path Simplification ---
+
+def sync_distance(a, b, p):
+    # Distance from p to where the pointer would be at p's time on segment a->b
+    (xa, ya, ta), (xb, yb, tb), (xp, yp, tp) = a, b, p
+    if tb == ta:
+        return math.hypot(xp - xa, yp - ya)
+    r = (tp - ta) / (tb - ta)
+    return math.hypot(xp - (xa + (xb - xa) * r), yp - (ya + (yb - ya) * r))
+
+def simplify_path(points, tolerance, min_interval=0.0):
+    # Time-aware Ramer-Douglas-Peucker over (x, y, t) points using the
+    # synchronized distance, after capping the rate to one point per
+    # min_interval. Returns the sorted indices of the kept points.
+    n = len(points)
+    if n <= 2:
+        return list(range(n))
+    candidates = [0]
+    for i in range(1, n - 1):
+        if points[i][2] - points[candidates[-1]][2] >= min_interval:
+            candidates.append(i)
+    candidates.append(n - 1)
+
+    # Error is measured against every raw point, but splits only happen at
+    # rate-capped candidates (the one nearest to the worst raw point)
+    keep = {candidates[0], candidates[-1]}
+    stack = [(0, len(candidates) - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        a, b = points[candidates[lo]], points[candidates[hi]]
+        worst, worst_dist = None, tolerance
+        for j in range(candidates[lo] + 1, candidates[hi]):
+            d = sync_distance(a, b, points[j])
+            if d > worst_dist:
+                worst, worst_dist = j, d
+        if worst is None:
+            continue
+        split = bisect.bisect_left(candidates, worst, lo + 1, hi)
+        if split == hi or (split > lo + 1 and worst - candidates[split - 1] < candidates[split] - worst):
+            split -= 1
+        keep.add(candidates[split])
+        stack.append((lo, split))
+        stack.append((split, hi))
+    return sorted(keep)
+
+def max_path_error(points, kept):
+    # Largest synchronized distance of any raw point from the simplified path
+    error = 0.0
+    for k in range(len(kept) - 1):
+        a, b = points[kept[k]], points[kept[k + 1]]
+        for j in range(kept[k] + 1, kept[k + 1]):
+            error = max(error, sync_distance(a, b, points[j]))
+    return error
+
+class MovePathSimplifier:
+    # Sits in front of a CompactMacro while recording. Moves are buffered and
+    # simplified whenever a click/key arrives (or the buffer fills up), so
+    # clicks and keys always land exactly where they were recorded.
+    def __init__(self, macro, tolerance_px=2.0, max_rate_hz=120, max_buffer=4096):
+        self.macro = macro
+        self.tolerance = tolerance_px
+        self.min_interval = 1.0 / max_rate_hz if max_rate_hz else 0.0
+        self.max_buffer = max_buffer
+        self.pending = []
+        self.lock = threading.Lock()
+        self.raw_moves = 0
+        self.kept_moves = 0
+        self.max_error = 0.0
+
+    def append(self, ev, x, y, label, t):
+        with self.lock:
+            if ev == CompactMacro.EV_MOVE:
+                self.raw_moves += 1
+                self.pending.append((x, y, t))
+                if len(self.pending) >= self.max_buffer:
+                    self._flush(keep_tail=True)
+                return
+            self._flush()
+            self.macro.append(ev, x, y, label, t)
+
+    def finish(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self, keep_tail=False):
+        points = self.pending
+        if not points:
+            return
+        kept = simplify_path(points, self.tolerance, self.min_interval)
+        self.max_error = max(self.max_error, max_path_error(points, kept))
+        if keep_tail:
+            # Last point stays buffered as the anchor of the next run
+            kept = kept[:-1]
+            self.pending = [points[-1]]
+        else:
+            self.pending = []
+        for i in kept:
+            x, y, t = points[i]
+            self.macro.append(CompactMacro.EV_MOVE, x, y, None, t)
+        self.kept_moves += len(kept)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'raw_moves': self.raw_moves,
+                'kept_moves': self.kept_moves,
+                'compression_ratio': self.raw_moves / self.kept_moves if self.kept_moves else None,
+                'max_error_px': round(self.max_error, 3),
+                'tolerance_px': self.tolerance
+            }
+
+# --- Streaming Recorder ---
+
+RECORDINGS_DIR = data_path('recordings')
+RECORDING_CHUNK = struct.Struct('<4sII') # magic, payload length, crc32
+RECORDING_CHUNK_MAGIC = b'GMRC'
+
+class StreamingRecorder:
+    # Input callbacks only enqueue; the writer drains the queue into a small
+    # CompactMacro chunk and appends it to disk as a checksummed record each
+    # time it fills, so memory stays flat for any session length.
+    _STOP = object()
+
+    def __init__(self, rec_id=None, options=None, chunk_events=4096, directory=None):
+        self.id = rec_id or uuid.uuid4().hex[:12]
+        self.path = os.path.join(directory or RECORDINGS_DIR, f"{self.id}.gmr")
+        self.options = dict(options or {})
+        self.chunk_events = chunk_events
+        self.queue = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        self.closed = threading.Event()
+        self.chunk = CompactMacro()
+        self.simplifier = None
+        if self.options.get('simplify'):
+            self.simplifier = MovePathSimplifier(self, self.options.get('tolerance_px', 2.0), self.options.get('max_rate_hz', 120))
+        self.file = None
+        self.count = 0
+        self.chunks = 0
+        self.bytes_written = 0
+        self.duration = 0.0
+
+    def __len__(self):
+        return self.count + len(self.chunk)
+
+    def push(self, ev, x, y, label, t):
+        # Called from the pynput listener threads
+        if not self.stop_event.is_set():
+            self.queue.put((ev, x, y, label, t))
+
+    def stop(self):
+        if not self.stop_event.is_set():
+            self.stop_event.set()
+            self.queue.put(self._STOP)
+
+    def append(self, ev, x, y, label, t):
+        # Writer side (also the simplifier's output)
+        self.chunk.append(ev, x, y, label, t)
+        self.duration = t
+        if len(self.chunk) >= self.chunk_events:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if not len(self.chunk):
+            return
+        payload = self.chunk.to_bytes()
+        self.file.write(RECORDING_CHUNK.pack(RECORDING_CHUNK_MAGIC, len(payload), zlib.crc32(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        self.count += len(self.chunk)
+        self.chunks += 1
+        self.bytes_written += RECORDING_CHUNK.size + len(payload)
+        self.chunk = CompactMacro()
+
+    def run(self):
+        # Blocks until stop() is called and every queued event is on disk
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        sink = self.simplifier or self
+        try:
+            with open(self.path, 'wb') as f:
+                self.file = f
+                while True:
+                    item = self.queue.get()
+                    if item is self._STOP:
+                        break
+                    sink.append(*item)
+                if self.simplifier:
+                    self.simplifier.finish()
+                self._write_chunk()
+                os.fsync(f.fileno())
+        finally:
+            self.file = None
+            self.closed.set()
+
+    def info(self):
+        return {
+            'recording_id': self.id,
+            'events': len(self),
+            'chunks': self.chunks,
+            'bytes': self.bytes_written,
+            'duration': self.duration,
+            'simplification': self.simplifier.stats() if self.simplifier else None
+        }
+
+def recording_path(rec_id):
+    if not rec_id or not rec_id.isalnum():
+        raise ValueError(f"Invalid recording id: {rec_id}")
+    return os.path.join(RECORDINGS_DIR, f"{rec_id}.gmr")
+
+def read_recording(path):
+    # Rebuild one CompactMacro from the chunk records. A torn or corrupt
+    # tail (e.g. after a crash) is skipped; everything before it is kept.
+    macro = CompactMacro()
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(RECORDING_CHUNK.size)
+            if len(header) < RECORDING_CHUNK.size:
+                break
+            magic, length, crc = RECORDING_CHUNK.unpack(header)
+            payload = f.read(length)
+            if magic != RECORDING_CHUNK_MAGIC or len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning(f"Recording {path}: dropping corrupt chunk at offset {f.tell()}")
+                break
+            for ev, x, y, label, t in CompactMacro.from_bytes(payload).events():
+                macro.append(ev, x, y, label, t)
+    return macro
+
+# Global state
+recording = False
+playing = False
+playback_end = None # why the last playback ended: finished, stopped, trigger_timeout or error
+active_recorder = None
+start_time = 0
+
+def stop_recording_session():
+    global recording
+    recording = False
+    recorder = active_recorder
+    if recorder:
+        recorder.stop()
+    return recorder
+
+def record_mouse_keyboard(recorder=None):
+    global active_recorder, start_time, recording
+    try:
+        pynput = platform_features.load('pynput')
+    except FeatureUnavailable as e:
+        logger.error(f"Cannot record: {e}")
+        recording = False
+        return None
+    logger.info("Recording started...")
+    if recorder is None:
+        recorder = StreamingRecorder()
+    active_recorder = recorder
+    push = recorder.push
+    start_time = time.perf_counter()
+    
+    def on_move(x, y):
+        if recording:
+            push(CompactMacro.EV_MOVE, x, y, None, time.perf_counter() - start_time)
+
+    def on_click(x, y, button, pressed):
+        if recording:
+            ev = CompactMacro.EV_MOUSE_DOWN if pressed else CompactMacro.EV_MOUSE_UP
+            push(ev, x, y, str(button), time.perf_counter() - start_time)
+
+    mouse_listener = pynput.mouse.Listener(on_move=on_move, on_click=on_click)
+    mouse_listener.start()
+    
+    def on_press(key):
+        if recording:
+            try:
+                k = key.char
+            except:
+                k = str(key)
+            push(CompactMacro.EV_KEY_DOWN, 0, 0, k, time.perf_counter() - start_time)
+
+    def on_release(key):
+        if recording:
+            try:
+                k = key.char
+            except:
+                k = str(key)
+            push(CompactMacro.EV_KEY_UP, 0, 0, k, time.perf_counter() - start_time)
+
+    keyboard_listener = pynput.keyboard.Listener(on_press=on_press, on_release=on_release)
+    keyboard_listener.start()
+
+    try:
+        # This thread is the writer; returns once stop() has been signalled
+        recorder.run()
+    except Exception as e:
+        logger.error(f"Recorder error: {e}")
+    finally:
+        mouse_listener.stop()
+        keyboard_listener.stop()
+    info = recorder.info()
+    logger.info(f"Recording stopped. {info['events']} events in {info['chunks']} chunks -> {recorder.path}")
+
+# How one playback treats moves that are already late
+LateOptions = namedtuple('LateOptions', 'policy threshold_ns')
+
+class PlaybackScheduler:
+    # Absolute-deadline scheduler on perf_counter_ns: coarse sleep until
+    # spin_ns before the deadline, then spin. Tracks the achieved timing error.
+    # The late policy given here is only the default; each playback passes
+    # its own LateOptions.
+    LATE_POLICIES = ('play', 'drop', 'coalesce')
+
+    def __init__(self, spin_ns=2000000, late_policy='coalesce', late_threshold_ns=4000000, max_samples=10000):
+        self.spin_ns = spin_ns
+        self.late_policy = late_policy
+        self.late_threshold_ns = late_threshold_ns
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.reset()
+
+    def late_options(self, late_policy=None, late_threshold_ms=None):
+        # Request values, falling back to this scheduler's defaults
+        policy = self.late_policy if late_policy is None else late_policy
+        if policy not in self.LATE_POLICIES:
+            raise ValueError(f"Unknown late policy: {policy}")
+        threshold_ns = self.late_threshold_ns
+        if late_threshold_ms is not None:
+            threshold_ns = int(float(late_threshold_ms) * 1000000)
+            if threshold_ns < 0:
+                raise ValueError("late_threshold_ms must not be negative")
+        return LateOptions(policy, threshold_ns)
+
+    def reset(self, late=None):
+        with self.lock:
+            self.run_policy = (late or self.late_options()).policy
+            self.errors = array('q', bytes(8 * self.max_samples)) # ns, ring
+            self.count = 0
+            self.max_error = 0
+            self.skipped = 0
+
+    def wait_until(self, deadline_ns, keep_going=lambda: True):
+        # Sleep in short chunks so a stop request is honoured promptly; a
+        # stopped wait returns at once without spinning to the deadline
+        while True:
+            if not keep_going():
+                return time.perf_counter_ns()
+            remaining = deadline_ns - time.perf_counter_ns()
+            if remaining <= self.spin_ns:
+                break
+            time.sleep(min(remaining - self.spin_ns, 50000000) / 1e9)
+        now = time.perf_counter_ns()
+        while now < deadline_ns:
+            now = time.perf_counter_ns()
+        return now
+
+    def should_skip_move(self, deadline_ns, now_ns, next_move_deadline_ns, late=None):
+        # Late moves are only skipped, never clicks or keys.
+        # next_move_deadline_ns is None when the next op is not a move.
+        policy, threshold_ns = late or self.late_options()
+        if policy == 'play' or now_ns - deadline_ns < threshold_ns:
+            return False
+        if policy == 'coalesce':
+            # Only skip when a newer move is already due, so the pointer still ends up in place
+            if next_move_deadline_ns is None or next_move_deadline_ns > now_ns:
+                return False
+        with self.lock:
+            self.skipped += 1
+        return True
+
+    def record(self, deadline_ns, actual_ns):
+        error = actual_ns - deadline_ns
+        playback_error.labels().observe(max(0, error) / 1e9)
+        with self.lock:
+            self.errors[self.count % self.max_samples] = error
+            self.count += 1
+            if error > self.max_error:
+                self.max_error = error
+
+    def stats(self):
+        with self.lock:
+            n = min(self.count, self.max_samples)
+            samples = sorted(self.errors[:n])
+            count, max_error, skipped, policy = self.count, self.max_error, self.skipped, self.run_policy
+
+        def pct(q):
+            if not samples:
+                return None
+            return samples[min(n - 1, int(q * n))] / 1000
+
+        return {
+            'events': count,
+            'skipped': skipped,
+            'late_policy': policy,
+            'p50_us': pct(0.50),
+            'p99_us': pct(0.99),
+            'max_us': max_error / 1000 if count else None
+        }
+
+playback_scheduler = PlaybackScheduler()
+
+# --- Macro Compiler & Input Backends ---
+
+OP_MOVE = CompactMacro.EV_MOVE
+OP_MOUSE_DOWN = CompactMacro.EV_MOUSE_DOWN
+OP_MOUSE_UP = CompactMacro.EV_MOUSE_UP
+OP_KEY_DOWN = CompactMacro.EV_KEY_DOWN
+OP_KEY_UP = CompactMacro.EV_KEY_UP
+
+class CompiledMacro:
+    # Ready-to-run op list: (op code, arg1, arg2, deadline ns from start)
+    __slots__ = ('ops', 'duration_ns', 'source_length')
+
+    def __init__(self, ops, source_length):
+        self.ops = ops
+        self.duration_ns = ops[-1][3] if ops else 0
+        self.source_length = source_length
+
+    def __len__(self):
+        return len(self.ops)
+
+def resolve_button(label):
+    return (label or 'left').replace('Button.', '')
+
+def resolve_key(label):
+    k = (label or '').replace("'", "")
+    if 'Key.' in k:
+        k = k.replace('Key.', '')
+    return k
+
+def parse_interpolate_hz(value):
+    # None/0 means no interpolation; anything else must be a sane rate
+    if value in (None, '', 0):
+        return None
+    hz = float(value)
+    if not 1 <= hz <= 2000:
+        raise ValueError(f"interpolate_hz must be between 1 and 2000, got {value}")
+    return hz
+
+def compile_macro(macro, interpolate_hz=None):
+    # All key/button string handling happens here, once per macro.
+    # interpolate_hz fills gaps between consecutive moves (e.g. of a
+    # simplified path) with linearly interpolated moves at that rate.
+    if isinstance(macro, CompiledMacro):
+        return macro
+    step_ns = int(1e9 / interpolate_hz) if interpolate_hz else 0
+    button_cache = {}
+    key_cache = {}
+    ops = []
+    for ev, x, y, label, t in macro.events():
+        deadline = int(round(t * 1e9))
+        if ev == OP_MOVE:
+            prev = ops[-1] if ops else None
+            if step_ns and prev is not None and prev[0] == OP_MOVE:
+                _, px, py, pt = prev
+                steps = (deadline - pt) // step_ns
+                for k in range(1, steps):
+                    r = k / steps
+                    ops.append((OP_MOVE, round(px + (x - px) * r), round(py + (y - py) * r), pt + k * step_ns))
+            ops.append((OP_MOVE, x, y, deadline))
+        elif ev in (OP_MOUSE_DOWN, OP_MOUSE_UP):
+            button = button_cache.get(label)
+            if button is None:
+                button = button_cache[label] = resolve_button(label)
+            ops.append((ev, button, None, deadline))
+        else:
+            key = key_cache.get(label)
+            if key is None:
+                key = key_cache[label] = resolve_key(label)
+            ops.append((ev, key, None, deadline))
+    return CompiledMacro(ops, len(macro))
+
+class PyAutoGUIInput:
+    # pyautogui is imported on first use; keep the module on the instance so
+    # the playback hot path is a plain attribute lookup
+    name = 'pyautogui'
+
+    def __init__(self):
+        self.gui = None
+
+    def load(self):
+        if self.gui is None:
+            self.gui = platform_features.load('pyautogui')
+        return self.gui
+
+    def move(self, x, y):
+        (self.gui or self.load()).moveTo(x, y, _pause=False)
+
+    def mouse_down(self, button, _=None):
+        (self.gui or self.load()).mouseDown(button=button, _pause=False)
+
+    def mouse_up(self, button, _=None):
+        (self.gui or self.load()).mouseUp(button=button, _pause=False)
+
+    def key_down(self, key, _=None):
+        (self.gui or self.load()).keyDown(key, _pause=False)
+
+    def key_up(self, key, _=None):
+        (self.gui or self.load()).keyUp(key, _pause=False)
+
+    def position(self):
+        return tuple((self.gui or self.load()).position())
+
+    def pixel(self, x, y):
+        return tuple((self.gui or self.load()).pixel(x, y))[:3]
+
+class RecordingInput:
+    # Fake backend that records (op, arg1, arg2, perf_counter_ns) for tests and benchmarks
+    name = 'recording'
+
+    def __init__(self, cursor=(0, 0), color=(0, 0, 0)):
+        self.calls = []
+        self.cursor = cursor
+        self.color = color
+
+    def load(self):
+        return self
+
+    def position(self):
+        return self.cursor
+
+    def pixel(self, x, y):
+        return self.color
+
+    def move(self, x, y):
+        self.calls.append((OP_MOVE, x, y, time.perf_counter_ns()))
+
+    def mouse_down(self, button, _=None):
+        self.calls.append((OP_MOUSE_DOWN, button, None, time.perf_counter_ns()))
+
+    def mouse_up(self, button, _=None):
+        self.calls.append((OP_MOUSE_UP, button, None, time.perf_counter_ns()))
+
+    def key_down(self, key, _=None):
+        self.calls.append((OP_KEY_DOWN, key, None, time.perf_counter_ns()))
+
+    def key_up(self, key, _=None):
+        self.calls.append((OP_KEY_UP, key, None, time.perf_counter_ns()))
+
+def make_input_backend():
+    if os.environ.get('GM_INPUT_BACKEND') == 'fake':
+        return RecordingInput()
+    return PyAutoGUIInput()
+
+input_backend = make_input_backend()
+
+def play_macro_thread(macro, loop=False, interval=0, scheduler=None, backend=None, trigger=None, late=None):
+    global playing, playback_end
+    scheduler = scheduler or playback_scheduler
+    backend = backend or input_backend
+    late = late or scheduler.late_options()
+    compiled = compile_macro(macro)
+    ops = compiled.ops
+    # Indexed by op code
+    dispatch = (backend.move, backend.mouse_down, backend.mouse_up, backend.key_down, backend.key_up)
+    scheduler.reset(late)
+    keep_going = lambda: playing
+    playback_end = None
+    end = 'finished'
+    logger.info("Playback started...")
+    
+    try:
+        while playing:
+            if trigger is not None:
+                # Each pass starts only once the trigger shows up on screen
+                waited = wait_for_trigger(trigger, keep_going)
+                if not playing: break
+                if not waited['matched']:
+                    logger.info(f"Playback trigger not met after {waited['elapsed']}s: {waited['error'] or 'timed out'}")
+                    end = 'trigger_timeout'
+                    break
+            start_ns = time.perf_counter_ns()
+            last = len(ops) - 1
+            
+            for i, (op, a, b, offset) in enumerate(ops):
+                # Deadlines are absolute, so falling behind never accumulates
+                deadline = start_ns + offset
+                now = scheduler.wait_until(deadline, keep_going)
+                if not playing: break
+                
+                if op == OP_MOVE:
+                    nxt = ops[i + 1] if i < last else None
+                    next_move = start_ns + nxt[3] if nxt is not None and nxt[0] == OP_MOVE else None
+                    if scheduler.should_skip_move(deadline, now, next_move, late):
+                        continue
+                scheduler.record(deadline, now)
+                dispatch[op](a, b)
+            
+            if not loop:
+                break
+            
+            if interval > 0:
+                time.sleep(interval / 1000.0)
+                
+    except Exception as e:
+        logger.error(f"Playback error: {e}")
+        end = 'error'
+    finally:
+        playback_end = end if playing else 'stopped'
+        playing = False
+        stats = scheduler.stats()
+        logger.info(f"Playback finished. Timing error p50={stats['p50_us']}us p99={stats['p99_us']}us max={stats['max_us']}us")
+
+# --- Screen Capture & Color Probes ---
+
+class Frame:
+    # One capture: packed RGB rows for the rectangle at (left, top)
+    __slots__ = ('left', 'top', 'width', 'height', 'rgb')
+
+    def __init__(self, left, top, width, height, rgb):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.rgb = rgb
+
+    def array(self, np):
+        # Zero-copy (height, width, 3) view
+        return np.frombuffer(self.rgb, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def pixel(self, x, y):
+        i = ((y - self.top) * self.width + (x - self.left)) * 3
+        return self.rgb[i], self.rgb[i + 1], self.rgb[i + 2]
+
+class PyAutoGUICapture:
+    name = 'pyautogui'
+
+    def grab(self, region=None):
+        # region is (left, top, width, height) in screen pixels
+        gui = platform_features.load('pyautogui')
+        image = gui.screenshot(region=region).convert('RGB')
+        left, top = region[:2] if region else (0, 0)
+        width, height = image.size
+        return Frame(left, top, width, height, image.tobytes())
+
+    def size(self):
+        return tuple(platform_features.load('pyautogui').size())
+
+class FakeCapture:
+    # Synthetic screen for tests and benchmarks. Draw on it with fill(), or
+    # pass painter(capture, n) to change the screen before each grab.
+    name = 'fake'
+
+    def __init__(self, width=1920, height=1080, color=(0, 0, 0), painter=None):
+        self.width = width
+        self.height = height
+        self.screen = bytearray(bytes(color) * (width * height))
+        self.painter = painter
+        self.grabs = 0
+
+    def fill(self, x, y, w, h, color):
+        row = bytes(color) * w
+        for yy in range(y, y + h):
+            i = (yy * self.width + x) * 3
+            self.screen[i:i + len(row)] = row
+
+    def grab(self, region=None):
+        if self.painter is not None:
+            self.painter(self, self.grabs)
+        self.grabs += 1
+        left, top, width, height = region or (0, 0, self.width, self.height)
+        stride = self.width * 3
+        rows = [self.screen[y * stride + left * 3:y * stride + (left + width) * 3] for y in range(top, top + height)]
+        return Frame(left, top, width, height, bytes().join(rows))
+
+    def size(self):
+        return self.width, self.height
+
+def make_capture_source():
+    if os.environ.get('GM_CAPTURE_BACKEND') == 'fake':
+        return FakeCapture()
+    return PyAutoGUICapture()
+
+capture_source = make_capture_source()
+
+def parse_color(value):
+    # '#RRGGBB' or [r, g, b] -> (r, g, b)
+    if isinstance(value, str):
+        value = value.lstrip('#')
+        if len(value) != 6:
+            raise ValueError(f"Bad color: #{value}")
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    r, g, b = value
+    return int(r), int(g), int(b)
+
+def parse_probe_points(items):
+    # [{x, y, color?, tolerance?}] -> [(x, y, rgb or None, tolerance)]
+    if not items:
+        raise ValueError("No points given")
+    points = []
+    for item in items:
+        color = item.get('color')
+        points.append((int(item['x']), int(item['y']), parse_color(color) if color else None,
+                       int(item.get('tolerance', 0))))
+    return points
+
+def probe_points(points, capture=None):
+    # One capture of the points' bounding box, then every point is read from
+    # it; with NumPy the comparison is a single vectorized pass. A point
+    # matches when no channel differs by more than its tolerance.
+    capture = capture or capture_source
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    left, top = min(xs), min(ys)
+    frame = capture.grab((left, top, max(xs) - left + 1, max(ys) - top + 1))
+    try:
+        np = platform_features.load('numpy')
+    except FeatureUnavailable:
+        np = None
+    if np is not None:
+        pixels = frame.array(np)[np.array(ys) - frame.top, np.array(xs) - frame.left]
+        targets = np.array([p[2] or (0, 0, 0) for p in points], dtype=np.int16)
+        distance = np.abs(pixels.astype(np.int16) - targets).max(axis=1)
+        rows = zip(pixels.tolist(), distance.tolist())
+    else:
+        rows = []
+        for x, y, target, _ in points:
+            pixel = frame.pixel(x, y)
+            rows.append((pixel, max(abs(a - b) for a, b in zip(pixel, target or (0, 0, 0)))))
+    results = []
+    for (x, y, target, tolerance), (pixel, dist) in zip(points, rows):
+        results.append({
+            'x': x,
+            'y': y,
+            'color': '#{:02x}{:02x}{:02x}'.format(*pixel),
+            'match': target is not None and dist <= tolerance,
+            'distance': dist if target is not None else None
+        })
+    return results
+
+class ColorWatcher:
+    # Server-side "wait until the screen shows these colors". One polling
+    # thread serves every waiter: each tick captures the union of all their
+    # points once, at no more than max_hz, and wakes the waiters that match.
+    def __init__(self, capture=None, max_hz=30):
+        self.capture = capture
+        self.max_hz = max_hz
+        self.waiters = []
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {'ticks': 0, 'matches': 0, 'timeouts': 0}
+
+    def wait(self, points, mode='all', timeout=None, max_hz=None, keep_going=lambda: True):
+        if mode not in ('all', 'any'):
+            raise ValueError(f"Unknown mode: {mode}")
+        if any(p[2] is None for p in points):
+            raise ValueError("Every watched point needs a color")
+        waiter = {'points': points, 'mode': mode, 'max_hz': min(max_hz or self.max_hz, self.max_hz),
+                  'event': threading.Event(), 'result': None, 'error': None, 'ticks': 0}
+        started = time.monotonic()
+        with self.lock:
+            self.waiters.append(waiter)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name='color-watcher')
+                self.thread.start()
+        try:
+            # Short waits so a stopped macro or a timeout is noticed promptly
+            while not waiter['event'].is_set() and keep_going():
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                if remaining is not None and remaining <= 0:
+                    break
+                waiter['event'].wait(0.1 if remaining is None else min(remaining, 0.1))
+        finally:
+            with self.lock:
+                self.waiters.remove(waiter)
+        matched = waiter['event'].is_set() and waiter['error'] is None
+        with self.lock:
+            self.stats['matches' if matched else 'timeouts'] += 1
+        return {'matched': matched, 'error': waiter['error'], 'elapsed': round(time.monotonic() - started, 3),
+                'ticks': waiter['ticks'], 'points': waiter['result']}
+
+    def _run(self):
+        while True:
+            with self.lock:
+                waiters = [w for w in self.waiters if not w['event'].is_set()]
+                if not self.waiters:
+                    self.thread = None
+                    return
+            started = time.monotonic()
+            interval = 1.0 / max([w['max_hz'] for w in waiters] or [self.max_hz])
+            if waiters:
+                self._tick(waiters)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def _tick(self, waiters):
+        points = [p for w in waiters for p in w['points']]
+        try:
+            results = probe_points(points, self.capture)
+        except Exception as e:
+            for w in waiters:
+                w['error'] = str(e)
+                w['event'].set()
+            return
+        self.stats['ticks'] += 1
+        offset = 0
+        for w in waiters:
+            mine = results[offset:offset + len(w['points'])]
+            offset += len(w['points'])
+            w['result'] = mine
+            w['ticks'] += 1
+            check = all if w['mode'] == 'all' else any
+            if check(r['match'] for r in mine):
+                w['event'].set()
+
+color_watcher = ColorWatcher()
+
+# --- Visual Triggers ---
+
+TEMPLATES_DIR = data_path('templates')
+TEMPLATE_HEADER = struct.Struct('<4sII') # magic, width, height; packed RGB follows
+TEMPLATE_MAGIC = b'GMTP'
+LUMA = (0.299, 0.587, 0.114)
+
+def gray_downsample(np, rgb, factor):
+    # (h, w, 3) uint8 -> (h // factor, w // factor) float32 luma, box-averaged.
+    # Halving with pairwise uint16 adds is much cheaper than a float reshape-mean.
+    weights = np.array(LUMA, dtype=np.float32)
+    if factor == 1:
+        return rgb.astype(np.float32) @ weights
+    h, w = rgb.shape[0] // factor * factor, rgb.shape[1] // factor * factor
+    acc = rgb[0:h:2, :w].astype(np.uint16)
+    acc += rgb[1:h:2, :w]
+    acc = acc[:, 0::2] + acc[:, 1::2]
+    f = factor // 2
+    while f > 1:
+        acc = acc[0::2] + acc[1::2]
+        acc = acc[:, 0::2] + acc[:, 1::2]
+        f //= 2
+    return (acc @ weights) / (factor * factor)
+
+def ncc_map(np, image, level, cache=None):
+    # Normalized cross-correlation of a zero-mean template against every
+    # position of `image`: the numerator is one FFT correlation, the local
+    # energy comes from integral images. Returns None if the image is smaller.
+    tz, tnorm = level
+    H, W = image.shape
+    h, w = tz.shape
+    if H < h or W < w:
+        return None
+    img = image.astype(np.float64)
+    spectrum = cache.get((H, W)) if cache is not None else None
+    if spectrum is None:
+        spectrum = np.fft.rfft2(tz[::-1, ::-1], s=(H, W))
+        if cache is not None:
+            cache[(H, W)] = spectrum
+    corr = np.fft.irfft2(np.fft.rfft2(img) * spectrum, s=(H, W))[h - 1:, w - 1:]
+    sums = np.zeros((H + 1, W + 1))
+    sums[1:, 1:] = img.cumsum(0).cumsum(1)
+    squares = np.zeros((H + 1, W + 1))
+    squares[1:, 1:] = (img * img).cumsum(0).cumsum(1)
+    s1 = sums[h:, w:] - sums[:-h, w:] - sums[h:, :-w] + sums[:-h, :-w]
+    s2 = squares[h:, w:] - squares[:-h, w:] - squares[h:, :-w] + squares[:-h, :-w]
+    denom = np.sqrt(np.maximum(s2 - s1 * s1 / (h * w), 0)) * tnorm
+    scores = np.zeros_like(corr)
+    flat = denom > 1e-3
+    scores[flat] = corr[flat] / denom[flat]
+    return scores
+
+class PreparedTemplate:
+    # Zero-mean luma pyramid of a template. Level l is downscaled by 2**l;
+    # the coarsest level keeps at least MIN_SIDE pixels on its short side.
+    MIN_SIDE = 8
+    MAX_LEVELS = 4
+
+    def __init__(self, np, rgb):
+        self.height, self.width = rgb.shape[:2]
+        self.levels = []
+        factor = 1
+        while len(self.levels) < self.MAX_LEVELS and min(self.height, self.width) // factor >= self.MIN_SIDE:
+            gray = gray_downsample(np, rgb, factor).astype(np.float64)
+            tz = gray - gray.mean()
+            norm = float(np.sqrt((tz * tz).sum()))
+            if norm < 1e-3:
+                raise ValueError("Template has no contrast to match on")
+            self.levels.append((tz, norm))
+            factor *= 2
+        if not self.levels:
+            raise ValueError(f"Template must be at least {self.MIN_SIDE}x{self.MIN_SIDE} pixels")
+        self.spectra = {} # image shape -> FFT of the coarsest level, per search size
+
+class TemplateLibrary:
+    # Reference images as packed RGB files plus a JSON index, like the macro
+    # library. Prepared pyramids are kept in a small LRU.
+    def __init__(self, directory=TEMPLATES_DIR, cache_size=16):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.cache_size = cache_size
+        self.prepared_cache = OrderedDict() # template_id -> PreparedTemplate
+        self.lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Template index unreadable, starting empty: {e}")
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _body_path(self, template_id):
+        if not template_id or not template_id.isalnum():
+            raise KeyError(template_id)
+        return os.path.join(self.directory, f"{template_id}.gmt")
+
+    def add(self, rgb, width, height, name=None):
+        if len(rgb) != width * height * 3:
+            raise ValueError(f"Expected {width * height * 3} RGB bytes, got {len(rgb)}")
+        np = platform_features.load('numpy')
+        prepared = PreparedTemplate(np, np.frombuffer(rgb, dtype=np.uint8).reshape(height, width, 3))
+        template_id = uuid.uuid4().hex[:12]
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._body_path(template_id), 'wb') as f:
+            f.write(TEMPLATE_HEADER.pack(TEMPLATE_MAGIC, width, height))
+            f.write(rgb)
+        meta = {'id': template_id, 'name': name or template_id, 'width': width, 'height': height,
+                'levels': len(prepared.levels), 'created': time.time()}
+        with self.lock:
+            self.index[template_id] = meta
+            self._save_index()
+            self._remember(template_id, prepared)
+        return meta
+
+    def add_image(self, data, name=None):
+        # Any format Pillow reads (PNG from the UI, typically)
+        Image = platform_features.load('pillow')
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        return self.add(image.tobytes(), image.size[0], image.size[1], name)
+
+    def list(self):
+        with self.lock:
+            entries = list(self.index.values())
+        return sorted(entries, key=lambda e: e['created'], reverse=True)
+
+    def get(self, template_id):
+        with self.lock:
+            meta = self.index.get(template_id)
+        if meta is None:
+            raise KeyError(template_id)
+        return dict(meta)
+
+    def _remember(self, template_id, prepared):
+        self.prepared_cache[template_id] = prepared
+        self.prepared_cache.move_to_end(template_id)
+        while len(self.prepared_cache) > self.cache_size:
+            self.prepared_cache.popitem(last=False)
+
+    def prepared(self, template_id):
+        with self.lock:
+            prepared = self.prepared_cache.get(template_id)
+            if prepared is not None:
+                self.prepared_cache.move_to_end(template_id)
+                return prepared
+        self.get(template_id)
+        np = platform_features.load('numpy')
+        with open(self._body_path(template_id), 'rb') as f:
+            body = f.read()
+        magic, width, height = TEMPLATE_HEADER.unpack_from(body)
+        if magic != TEMPLATE_MAGIC:
+            raise ValueError(f"Not a template file: {template_id}")
+        rgb = np.frombuffer(body, dtype=np.uint8, offset=TEMPLATE_HEADER.size).reshape(height, width, 3)
+        prepared = PreparedTemplate(np, rgb)
+        with self.lock:
+            self._remember(template_id, prepared)
+        return prepared
+
+    def delete(self, template_id):
+        with self.lock:
+            if template_id not in self.index:
+                raise KeyError(template_id)
+            self.prepared_cache.pop(template_id, None)
+            del self.index[template_id]
+            self._save_index()
+        try:
+            os.remove(self._body_path(template_id))
+        except FileNotFoundError:
+            pass
+
+class TemplateMatcher:
+    # Coarse-to-fine search: full NCC on the coarsest pyramid level of the
+    # region, then each candidate is refined in a few-pixel window per finer
+    # level. The last hit per (template, region) is tracked: the next check
+    # first captures and searches only a small box around it.
+    def __init__(self, library, capture=None, candidates=3, track_radius=16, max_tracked=64):
+        self.library = library
+        self.capture = capture
+        self.candidates = candidates
+        self.track_radius = track_radius
+        self.max_tracked = max_tracked
+        self.last_hits = OrderedDict() # (template_id, region) -> (x, y), least recently used first
+        self.lock = threading.Lock()
+        self.stats = {'checks': 0, 'tracked_hits': 0, 'full_searches': 0}
+
+    def _capture(self):
+        return self.capture or capture_source
+
+    def _region(self, region):
+        # Clipped to the screen
+        screen_w, screen_h = self._capture().size()
+        if region is None:
+            return 0, 0, screen_w, screen_h
+        left, top, width, height = (int(v) for v in region)
+        left, top = max(0, left), max(0, top)
+        width, height = min(width, screen_w - left), min(height, screen_h - top)
+        if width <= 0 or height <= 0:
+            raise ValueError("Region is off screen")
+        return left, top, width, height
+
+    def _refine(self, np, rgb, prepared, x, y, level):
+        # (x, y) is a full-resolution estimate in rgb coordinates, good to
+        # about 2**(level + 1) pixels. Returns the exact position and score.
+        score = None
+        for lvl in range(level - 1, -1, -1):
+            f = 2 ** lvl
+            tz = prepared.levels[lvl][0]
+            x0 = max(0, x - 2 * f)
+            y0 = max(0, y - 2 * f)
+            x1 = min(rgb.shape[1], x0 + tz.shape[1] * f + 4 * f + f)
+            y1 = min(rgb.shape[0], y0 + tz.shape[0] * f + 4 * f + f)
+            patch = gray_downsample(np, rgb[y0:y1, x0:x1], f)
+            scores = ncc_map(np, patch, prepared.levels[lvl])
+            if scores is None:
+                return x, y, -1.0
+            by, bx = np.unravel_index(int(scores.argmax()), scores.shape)
+            x, y, score = x0 + int(bx) * f, y0 + int(by) * f, float(scores[by, bx])
+        return x, y, score
+
+    def _search(self, np, frame, prepared):
+        rgb = frame.array(np)
+        level = len(prepared.levels) - 1
+        factor = 2 ** level
+        coarse = gray_downsample(np, rgb, factor)
+        scores = ncc_map(np, coarse, prepared.levels[level], prepared.spectra)
+        if scores is None:
+            return None
+        if level == 0:
+            by, bx = np.unravel_index(int(scores.argmax()), scores.shape)
+            return int(bx), int(by), float(scores[by, bx])
+        best = None
+        th, tw = prepared.levels[level][0].shape
+        for _ in range(self.candidates):
+            by, bx = np.unravel_index(int(scores.argmax()), scores.shape)
+            if scores[by, bx] <= 0:
+                break
+            # Suppress this peak before looking for the next one
+            scores[max(0, by - th // 2):by + th // 2 + 1, max(0, bx - tw // 2):bx + tw // 2 + 1] = -1
+            hit = self._refine(np, rgb, prepared, int(bx) * factor, int(by) * factor, level)
+            if best is None or hit[2] > best[2]:
+                best = hit
+        return best
+
+    def find(self, template_id, region=None, threshold=0.9, track=True):
+        np = platform_features.load('numpy')
+        prepared = self.library.prepared(template_id)
+        left, top, width, height = self._region(region)
+        key = (template_id, (left, top, width, height))
+        started = time.perf_counter()
+        hit = None
+        tracked = False
+        last = self.last_hits.get(key) if track else None
+        if last is not None:
+            # Small box around the previous hit, clipped to the region
+            r = self.track_radius
+            bx0 = max(left, last[0] - r)
+            by0 = max(top, last[1] - r)
+            bx1 = min(left + width, last[0] + prepared.width + r)
+            by1 = min(top + height, last[1] + prepared.height + r)
+            frame = self._capture().grab((bx0, by0, bx1 - bx0, by1 - by0))
+            scores = ncc_map(np, gray_downsample(np, frame.array(np), 1), prepared.levels[0])
+            if scores is not None:
+                by, bx = np.unravel_index(int(scores.argmax()), scores.shape)
+                if scores[by, bx] >= threshold:
+                    hit = (frame.left + int(bx), frame.top + int(by), float(scores[by, bx]))
+                    tracked = True
+        if hit is None:
+            frame = self._capture().grab((left, top, width, height))
+            found = self._search(np, frame, prepared)
+            if found is not None:
+                hit = (frame.left + found[0], frame.top + found[1], found[2])
+        with self.lock:
+            self.stats['checks'] += 1
+            self.stats['tracked_hits' if tracked else 'full_searches'] += 1
+            if hit is not None and hit[2] >= threshold:
+                self.last_hits[key] = hit[:2]
+                self.last_hits.move_to_end(key)
+                while len(self.last_hits) > self.max_tracked:
+                    self.last_hits.popitem(last=False)
+            else:
+                self.last_hits.pop(key, None)
+        result = {'found': hit is not None and hit[2] >= threshold, 'score': round(hit[2], 4) if hit else None,
+                  'tracked': tracked, 'width': prepared.width, 'height': prepared.height,
+                  'ms': round((time.perf_counter() - started) * 1000, 2)}
+        if hit is not None:
+            result.update({'x': hit[0], 'y': hit[1],
+                           'center': [hit[0] + prepared.width // 2, hit[1] + prepared.height // 2]})
+        return result
+
+    def forget(self, template_id):
+        with self.lock:
+            for key in [k for k in self.last_hits if k[0] == template_id]:
+                del self.last_hits[key]
+
+    def wait(self, template_id, region=None, threshold=0.9, timeout=None, max_hz=30, present=True,
+             keep_going=lambda: True):
+        # Poll at no more than max_hz until the template appears (or, with
+        # present=False, disappears)
+        interval = 1.0 / max(0.1, min(max_hz or 30, 60))
+        started = time.monotonic()
+        checks = 0
+        result = None
+        while keep_going():
+            tick = time.monotonic()
+            try:
+                result = self.find(template_id, region, threshold)
+            except (KeyError, FeatureUnavailable):
+                raise
+            except Exception as e:
+                return {'matched': False, 'error': str(e), 'elapsed': round(time.monotonic() - started, 3),
+                        'ticks': checks, 'match': result}
+            checks += 1
+            if result['found'] == present:
+                return {'matched': True, 'error': None, 'elapsed': round(time.monotonic() - started, 3),
+                        'ticks': checks, 'match': result}
+            if timeout is not None and time.monotonic() - started >= timeout:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - tick)))
+        return {'matched': False, 'error': None, 'elapsed': round(time.monotonic() - started, 3),
+                'ticks': checks, 'match': result}
+
+template_library = TemplateLibrary()
+template_matcher = TemplateMatcher(template_library)
+
+def parse_region(region):
+    # {left, top, width, height} or [left, top, width, height]; None = whole screen
+    if region is None:
+        return None
+    if isinstance(region, dict):
+        region = [region[k] for k in ('left', 'top', 'width', 'height')]
+    left, top, width, height = (int(v) for v in region)
+    if width <= 0 or height <= 0:
+        raise ValueError("Region must have a positive size")
+    return left, top, width, height
+
+def parse_trigger(spec):
+    # {points: [...]} waits on pixel colors, {template: id} on an image
+    timeout_ms = spec.get('timeout_ms')
+    timeout = timeout_ms / 1000.0 if timeout_ms else None
+    if spec.get('template'):
+        template_library.get(spec['template'])
+        return {'kind': 'image', 'template': spec['template'], 'region': parse_region(spec.get('region')),
+                'threshold': float(spec.get('threshold', 0.9)), 'present': spec.get('present', True) is not False,
+                'timeout': timeout, 'max_hz': spec.get('max_hz')}
+    return {'kind': 'color', 'points': parse_probe_points(spec.get('points')), 'mode': spec.get('mode', 'all'),
+            'timeout': timeout, 'max_hz': spec.get('max_hz')}
+
+def wait_for_trigger(trigger, keep_going=lambda: True):
+    if trigger['kind'] == 'image':
+        return template_matcher.wait(trigger['template'], trigger['region'], trigger['threshold'], trigger['timeout'],
+                                     trigger['max_hz'], trigger['present'], keep_going)
+    return color_watcher.wait(trigger['points'], trigger['mode'], trigger['timeout'], trigger['max_hz'], keep_going)
+
+# --- Macro Library ---
+
+MACROS_DIR = data_path('macros')
+
+class MacroLibrary:
+    # Macro bodies are compact binary files, memory-mapped on load. A small
+    # JSON index holds the metadata so listing never touches the bodies.
+    def __init__(self, directory=MACROS_DIR, cache_size=8):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.cache_size = cache_size
+        self.compiled = OrderedDict() # (macro_id, interpolate_hz) -> CompiledMacro
+        self.lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Macro index unreadable, starting empty: {e}")
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _body_path(self, macro_id):
+        if not macro_id or not macro_id.isalnum():
+            raise KeyError(macro_id)
+        return os.path.join(self.directory, f"{macro_id}.gmm")
+
+    def add(self, macro, name, tags=None):
+        macro_id = uuid.uuid4().hex[:12]
+        body = macro.to_bytes()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._body_path(macro_id), 'wb') as f:
+            f.write(body)
+        meta = {
+            'id': macro_id,
+            'name': name or macro_id,
+            'tags': list(tags or []),
+            'size': len(body),
+            'duration': macro.duration,
+            'events': len(macro),
+            'created': time.time()
+        }
+        with self.lock:
+            self.index[macro_id] = meta
+            self._save_index()
+        return meta
+
+    def list(self, tag=None):
+        with self.lock:
+            entries = list(self.index.values())
+        if tag:
+            entries = [e for e in entries if tag in e['tags']]
+        return sorted(entries, key=lambda e: e['created'], reverse=True)
+
+    def get(self, macro_id):
+        with self.lock:
+            meta = self.index.get(macro_id)
+        if meta is None:
+            raise KeyError(macro_id)
+        return dict(meta)
+
+    def load(self, macro_id):
+        # Zero-copy: the columns are views into the mapping
+        self.get(macro_id)
+        with open(self._body_path(macro_id), 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return CompactMacro.from_bytes(mapping)
+
+    def compiled_macro(self, macro_id, interpolate_hz=None):
+        key = (macro_id, interpolate_hz)
+        with self.lock:
+            compiled = self.compiled.get(key)
+            if compiled is not None:
+                self.compiled.move_to_end(key)
+                return compiled
+        compiled = compile_macro(self.load(macro_id), interpolate_hz=interpolate_hz)
+        with self.lock:
+            self.compiled[key] = compiled
+            while len(self.compiled) > self.cache_size:
+                self.compiled.popitem(last=False)
+        return compiled
+
+    def delete(self, macro_id):
+        with self.lock:
+            if macro_id not in self.index:
+                raise KeyError(macro_id)
+            for key in [k for k in self.compiled if k[0] == macro_id]:
+                del self.compiled[key]
+            del self.index[macro_id]
+            self._save_index()
+        try:
+            os.remove(self._body_path(macro_id))
+        except FileNotFoundError:
+            pass
+
+macro_library = MacroLibrary()
+
+# --- Live Telemetry Stream ---
+
+class StreamClient:
+    # Per-connection mailbox holding at most one pending frame per topic.
+    # A slow reader never queues up stale frames: newer ones are merged in.
+    def __init__(self, topics):
+        self.topics = set(topics)
+        self.pending = {} # topic -> frame
+        self.cond = threading.Condition()
+        self.closed = False
+        self.coalesced = 0
+
+    def offer(self, topic, frame):
+        with self.cond:
+            prev = self.pending.get(topic)
+            if prev is not None:
+                self.coalesced += 1
+                if frame['type'] == 'delta':
+                    merged = dict(prev['data'])
+                    merged.update(frame['data'])
+                    frame = {'type': prev['type'], 'seq': frame['seq'], 'data': merged}
+            self.pending[topic] = frame
+            self.cond.notify()
+
+    def take(self, timeout):
+        with self.cond:
+            if not self.pending and not self.closed:
+                self.cond.wait(timeout)
+            frames = list(self.pending.items())
+            self.pending = {}
+            return frames
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+class TelemetryHub:
+    def __init__(self, tick=0.25):
+        self.tick = tick
+        self.producers = {} # topic -> (fn, period)
+        self.last = {} # topic -> last published payload
+        self.next_due = {}
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.running = True
+        self.stats = {'frames_published': 0, 'frames_skipped': 0}
+
+    def register(self, topic, fn, period):
+        self.producers[topic] = (fn, period)
+
+    def _subscribed_topics(self):
+        topics = set()
+        for client in self.clients:
+            topics |= client.topics
+        return topics
+
+    def connect(self, topics):
+        topics = [t for t in topics if t in self.producers]
+        client = StreamClient(topics)
+        with self.lock:
+            live = self._subscribed_topics()
+            self.clients.add(client)
+            for topic in topics:
+                if topic in live and topic in self.last:
+                    # Topic is already being kept fresh, start from its current state
+                    client.offer(topic, {'type': 'full', 'seq': self.seq, 'data': self.last[topic]})
+                else:
+                    self.last.pop(topic, None)
+                    self.next_due[topic] = 0
+        return client
+
+    def disconnect(self, client):
+        client.close()
+        with self.lock:
+            self.clients.discard(client)
+
+    def publish(self, topic, payload):
+        with self.lock:
+            prev = self.last.get(topic)
+            if prev == payload:
+                self.stats['frames_skipped'] += 1
+                return
+            self.seq += 1
+            if isinstance(payload, dict) and isinstance(prev, dict):
+                delta = {k: v for k, v in payload.items() if prev.get(k) != v}
+                frame = {'type': 'delta', 'seq': self.seq, 'data': delta}
+            else:
+                frame = {'type': 'full', 'seq': self.seq, 'data': payload}
+            self.last[topic] = payload
+            self.stats['frames_published'] += 1
+            targets = [c for c in self.clients if topic in c.topics]
+        for client in targets:
+            client.offer(topic, frame)
+
+    def run(self):
+        while self.running:
+            now = time.monotonic()
+            with self.lock:
+                live = self._subscribed_topics()
+            for topic in live:
+                fn, period = self.producers[topic]
+                if now < self.next_due.get(topic, 0):
+                    continue
+                self.next_due[topic] = now + period
+                try:
+                    self.publish(topic, fn())
+                except Exception as e:
+                    logger.error(f"Telemetry producer error ({topic}): {e}")
+            time.sleep(self.tick)
 
-    def set_dns(self, dns_ip):
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['clients'] = len(self.clients)
+            stats['coalesced'] = sum(c.coalesced for c in self.clients)
+        return stats
+
+    def stream(self, client, heartbeat=15):
+        # Server-Sent Events generator for one client
         try:
-            cmd_wifi = f'netsh interface ip set dns "Wi-Fi" static {dns_ip}'
-            cmd_eth = f'netsh interface ip set dns "Ethernet" static {dns_ip}'
-            
-            subprocess.run(cmd_wifi, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            subprocess.run(cmd_eth, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            return True
-        except Exception as e:
-            logger.error(f"Set DNS Error: {e}")
-            return False
+            yield 'retry: 2000\n\n'
+            while self.running:
+                frames = client.take(heartbeat)
+                if not frames:
+                    yield ': keep-alive\n\n'
+                    continue
+                for topic, frame in frames:
+                    yield f"event: {topic}\ndata: {json.dumps(frame)}\n\n"
+        finally:
+            self.disconnect(client)
 
-# Initialize Managers
-network_monitor = NetworkMonitor()
-firewall_manager = FirewallManager()
-ultra_manager = UltraModeManager()
-dns_manager = DNSManager()
+telemetry_hub = TelemetryHub()
 
-# Auto‑Launcher configuration
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'game_autolaunch_config.json')
+# --- Background Jobs ---
 
-def load_config():
-    if not os.path.exists(CONFIG_PATH):
-        return []
-    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+class JobQueueFull(Exception):
+    pass
 
-def save_config(data):
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+class Job:
+    __slots__ = ('id', 'kind', 'key', 'state', 'progress', 'message', 'result', 'error',
+                 'created', 'started', 'finished', 'done', 'future', 'cancel_requested')
 
-# Global state for remapping
-remapping_active = False
+    def __init__(self, kind, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.state = 'queued' # queued -> running -> done | failed | cancelled
+        self.progress = None # 0..1 when the work can tell
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+        self.future = None
+        self.cancel_requested = threading.Event()
 
-# Helper to perform actions
-def perform_action(action, game_pid=None):
-    global remapping_active
-    action_type = action.get('type')
-    if action_type == 'remap_profile':
-        profile = action.get('profile', 'classic')
-        remapping_active = True
-        keyboard.unhook_all()
-        if profile == 'classic':
-            keyboard.remap_key('up', 'w')
-            keyboard.remap_key('down', 's')
-            keyboard.remap_key('left', 'a')
-            keyboard.remap_key('right', 'd')
-            keyboard.remap_key('space', '1')
-            keyboard.remap_key('tab', 'page down')
-        elif profile == 'numpad':
-            keyboard.remap_key('8', 'w')
-            keyboard.remap_key('5', 's')
-            keyboard.remap_key('4', 'a')
-            keyboard.remap_key('6', 'd')
-            keyboard.remap_key('7', 'q')
-            keyboard.remap_key('9', 'e')
-            keyboard.remap_key('0', 'space')
-            keyboard.remap_key('enter', 'f')
-        logger.info(f"Remap profile applied: {profile}")
-    elif action_type == 'ultra_mode':
-        if game_pid:
-            ultra_manager.enable(game_pid)
-            logger.info(f"Ultra mode enabled for PID {game_pid}")
-    elif action_type == 'background_clicker':
-        hwnd = action.get('hwnd')
-        interval = action.get('interval', 1000)
-        if hwnd:
-            threading.Thread(target=background_click_thread, args=(hwnd, interval, True), daemon=True).start()
-            logger.info(f"Background clicker started on HWND {hwnd}")
-    elif action_type == 'set_dns':
-        provider = action.get('provider')
-        if provider:
-            dns_ip = dns_manager.servers.get(provider)
-            if dns_ip:
-                dns_manager.set_dns(dns_ip)
-                logger.info(f"DNS set to {provider} ({dns_ip})")
-    elif action_type == 'clean_ram':
-        clean_ram_logic()
-        logger.info("RAM clean triggered")
-    else:
-        logger.warning(f"Unknown action type: {action_type}")
+    def cancelled(self):
+        # Work that loops or waits checks this and returns early
+        return self.cancel_requested.is_set()
 
-def clean_ram_logic():
-    targets = ['chrome.exe', 'firefox.exe', 'msedge.exe', 'discord.exe', 'spotify.exe']
-    killed = []
-    freed = 0
-    for proc in psutil.process_iter(['pid', 'name', 'memory_info']):
-        try:
-            if proc.info['name'].lower() in targets:
-                mem = proc.info['memory_info'].rss
-                proc.terminate()
-                killed.append(proc.info['name'])
-                freed += mem
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-    return killed, freed
+    def update(self, progress=None, message=None):
+        # Called from the worker; plain attribute writes, readers tolerate staleness
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            self.message = message
 
-# Monitor thread to watch for game launches
-handled_pids = set()
-def game_monitor_thread():
-    while True:
+    def info(self, with_result=False):
+        info = {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'created': self.created,
+            'elapsed': round((self.finished or time.time()) - (self.started or self.created), 3)
+        }
+        if with_result:
+            info['result'] = self.result
+        return info
+
+class JobManager:
+    # Long operations run on small bounded pools. Submitting work that is
+    # identical to a job still queued or running returns that job instead.
+    # Kinds that mostly wait (e.g. screen watches) get a pool of their own so
+    # they can't starve the rest.
+    def __init__(self, workers=4, max_pending=32, keep_finished=200):
+        self.pools = {} # name -> (ThreadPoolExecutor, max_pending)
+        self.add_pool('default', workers, max_pending)
+        self.keep_finished = keep_finished
+        self.jobs = OrderedDict() # id -> Job, oldest first
+        self.inflight = {} # dedup key -> Job
+        self.kinds = {} # kind -> (fn(job, params) returning the result, pool name)
+        self.lock = threading.Lock()
+
+    def add_pool(self, name, workers, max_pending):
+        self.pools[name] = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'job-{name}'), max_pending)
+
+    def register(self, kind, fn, pool='default'):
+        self.kinds[kind] = (fn, pool)
+
+    def submit(self, kind, params=None):
+        # Returns (job, created); raises KeyError for unknown kinds, JobQueueFull when saturated
+        fn, pool_name = self.kinds[kind]
+        pool, max_pending = self.pools[pool_name]
+        params = params or {}
+        key = (kind, json.dumps(params, sort_keys=True, default=str))
+        with self.lock:
+            job = self.inflight.get(key)
+            if job is not None:
+                return job, False
+            pending = sum(1 for j in self.inflight.values() if self.kinds[j.kind][1] == pool_name)
+            if pending >= max_pending:
+                raise JobQueueFull(f"{pending} {pool_name} jobs already pending")
+            job = Job(kind, key)
+            self.jobs[job.id] = job
+            self.inflight[key] = job
+            self._trim()
+        job.future = pool.submit(self._run, job, fn, params)
+        return job, True
+
+    def _run(self, job, fn, params):
+        if job.cancelled():
+            self._finish(job, 'cancelled')
+            return
+        job.state = 'running'
+        job.started = time.time()
+        state = 'done'
         try:
-            config = load_config()
-            for entry in config:
-                exe_path = entry.get('exe_path')
-                actions = entry.get('actions', [])
-                for proc in psutil.process_iter(['pid', 'exe']):
-                    try:
-                        if proc.info['exe'] and os.path.normcase(proc.info['exe']) == os.path.normcase(exe_path):
-                            pid = proc.info['pid']
-                            if pid not in handled_pids:
-                                handled_pids.add(pid)
-                                logger.info(f"Game launched: {exe_path} (PID {pid})")
-                                for act in actions:
-                                    perform_action(act, game_pid=pid)
-                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                        continue
+            job.result = fn(job, params)
+            job.progress = 1.0
         except Exception as e:
-            logger.error(f"Auto‑launcher monitor error: {e}")
-        time.sleep(2)
+            logger.error(f"Job {job.kind} {job.id} failed: {e}")
+            job.error = str(e)
+            state = 'failed'
+        self._finish(job, 'cancelled' if job.cancelled() and state == 'done' else state)
 
-def background_click_thread(hwnd, interval, loop):
-    global playing
-    logger.info(f"Background clicking started on HWND: {hwnd}")
-    try:
-        while playing:
-            x, y = 100, 100
-            lparam = y << 16 | x
-            
-            user32.PostMessageW(hwnd, WM_LBUTTONDOWN, MK_LBUTTON, lparam)
-            time.sleep(0.05)
-            user32.PostMessageW(hwnd, WM_LBUTTONUP, 0, lparam)
-            
-            if not loop:
-                break
-            
-            if interval > 0:
-                time.sleep(interval / 1000.0)
-    except Exception as e:
-        logger.error(f"Bg click error: {e}")
-    finally:
-        playing = False
+    def _finish(self, job, state):
+        if state == 'cancelled':
+            job.error = 'cancelled'
+        job.state = state
+        job.finished = time.time()
+        with self.lock:
+            if self.inflight.get(job.key) is job:
+                del self.inflight[job.key]
+        job.done.set()
 
-# Global state
-recording = False
-playing = False
-recorded_macro = []
-start_time = 0
+    def cancel(self, job_id):
+        # A queued job never starts; a running one is asked to stop and ends
+        # once its work notices. Returns None for unknown jobs.
+        job = self.get(job_id)
+        if job is None or job.done.is_set():
+            return job
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled')
+        return job
 
-# Disable fail-safe for now (be careful!)
-pyautogui.FAILSAFE = True
+    def _trim(self):
+        # Forget the oldest finished jobs beyond keep_finished
+        finished = [jid for jid, j in self.jobs.items() if j.done.is_set()]
+        for jid in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[jid]
 
-def record_mouse_keyboard():
-    global recording, recorded_macro, start_time
-    logger.info("Recording started...")
-    recorded_macro = []
-    start_time = time.time()
-    
-    def on_move(x, y):
-        if recording:
-            recorded_macro.append({
-                'type': 'move',
-                'x': x,
-                'y': y,
-                'time': time.time() - start_time
-            })
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
 
-    def on_click(x, y, button, pressed):
-        if recording:
-            recorded_macro.append({
-                'type': 'click',
-                'x': x,
-                'y': y,
-                'button': str(button),
-                'pressed': pressed,
-                'time': time.time() - start_time
-            })
+    def list(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [j.info() for j in reversed(jobs)]
 
-    mouse_listener = pynput.mouse.Listener(on_move=on_move, on_click=on_click)
-    mouse_listener.start()
-    
-    def on_press(key):
-        if recording:
-            try:
-                k = key.char
-            except:
-                k = str(key)
-            recorded_macro.append({'type': 'key_down', 'key': k, 'time': time.time() - start_time})
+    def shutdown(self):
+        for pool, _ in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
 
-    def on_release(key):
-        if recording:
-            try:
-                k = key.char
-            except:
-                k = str(key)
-            recorded_macro.append({'type': 'key_up', 'key': k, 'time': time.time() - start_time})
+job_manager = JobManager()
+job_manager.add_pool('waits', workers=4, max_pending=8)
 
-    keyboard_listener = pynput.keyboard.Listener(on_press=on_press, on_release=on_release)
-    keyboard_listener.start()
+# Held sync waits tie up server threads, so only a few may run at once
+sync_wait_slots = threading.BoundedSemaphore(4)
 
-    while recording:
-        time.sleep(0.01)
+def dns_benchmark_job(job, params):
+    job.update(message='Probing DNS servers')
+    dns_manager.refresh_async()
+    dns_manager.refresh_done.wait()
+    return dns_manager.get_results()
 
-    mouse_listener.stop()
-    keyboard_listener.stop()
-    logger.info("Recording stopped.")
+def scan_games_job(job, params):
+    games = []
+    for game in game_scanner.iter_scan():
+        if job.cancelled():
+            break
+        games.append(game)
+        job.update(message=f"{len(games)} games found")
+    games.sort(key=lambda g: g['name'].lower())
+    return games
 
-def play_macro_thread(macro, loop=False, interval=0):
-    global playing
-    logger.info("Playback started...")
-    
+def stop_recording_job(job, params):
+    recorder = stop_recording_session()
+    if recorder is None:
+        return {'status': 'stopped'}
+    job.update(message='Flushing recording')
+    recorder.closed.wait(5)
+    info = recorder.info()
+    info['status'] = 'stopped'
+    return info
+
+def color_wait_job(job, params):
+    points = parse_probe_points(params.get('points'))
+    # A job holds a pool worker while it waits, so it can't wait forever
+    timeout_ms = min(params.get('timeout_ms') or 300000, 300000)
+    if job is not None:
+        job.update(message=f"Watching {len(points)} points")
+    keep_going = (lambda: not job.cancelled()) if job is not None else (lambda: True)
+    return color_watcher.wait(points, params.get('mode', 'all'), timeout_ms / 1000.0, params.get('max_hz'), keep_going)
+
+def image_wait_job(job, params):
+    params = dict(params)
+    params['timeout_ms'] = min(params.get('timeout_ms') or 300000, 300000)
+    trigger = parse_trigger(params)
+    if job is not None:
+        job.update(message=f"Looking for template {trigger['template']}")
+        return wait_for_trigger(trigger, lambda: not job.cancelled())
+    return wait_for_trigger(trigger)
+
+def clean_ram_job(job, params):
+    if job is not None:
+        job.update(message='Reclaiming memory')
+    return clean_ram_logic(params.get('target_bytes'), bool(params.get('dry_run')),
+                           params.get('allow_terminate', True), params.get('game_pid'))
+
+def network_clear_job(job, params):
+    result = firewall_manager.clear_all_rules(dry_run=bool(params.get('dry_run')))
+    if not result['ok']:
+        raise RuntimeError(result.get('error') or 'Failed to clear firewall rules')
+    result['status'] = 'cleared'
+    return result
+
+job_manager.register('dns_benchmark', dns_benchmark_job)
+job_manager.register('scan_games', scan_games_job)
+job_manager.register('stop_recording', stop_recording_job)
+job_manager.register('network_clear', network_clear_job)
+job_manager.register('clean_ram', clean_ram_job)
+job_manager.register('color_wait', color_wait_job, pool='waits')
+job_manager.register('image_wait', image_wait_job, pool='waits')
+
+def submit_job(kind, params=None):
+    # 202 with the job handle, or 503 when the pool is saturated
     try:
-        while playing:
-            start_play_time = time.time()
-            
-            for action in macro:
-                if not playing: break
-                
-                target_time = action['time']
-                current_offset = time.time() - start_play_time
-                if target_time > current_offset:
-                    time.sleep(target_time - current_offset)
-                
-                if action['type'] == 'move':
-                    pyautogui.moveTo(action['x'], action['y'], _pause=False)
-                elif action['type'] == 'click':
-                    if action['pressed']:
-                        button = action['button'].replace('Button.', '')
-                        pyautogui.mouseDown(button=button, _pause=False)
-                    else:
-                        button = action['button'].replace('Button.', '')
-                        pyautogui.mouseUp(button=button, _pause=False)
-                elif action['type'] == 'key_down':
-                    k = action['key'].replace("'", "")
-                    if 'Key.' in k:
-                        k = k.replace('Key.', '')
-                    pyautogui.keyDown(k, _pause=False)
-                elif action['type'] == 'key_up':
-                    k = action['key'].replace("'", "")
-                    if 'Key.' in k:
-                        k = k.replace('Key.', '')
-                    pyautogui.keyUp(k, _pause=False)
-            
-            if not loop:
-                break
-            
-            if interval > 0:
-                time.sleep(interval / 1000.0)
-                
-    except Exception as e:
-        logger.error(f"Playback error: {e}")
+        job, created = job_manager.submit(kind, params)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    info = job.info()
+    info['deduplicated'] = not created
+    return jsonify(info), 202
+
+def run_sync_wait(fn, params):
+    if not sync_wait_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many waits in progress, retry with ?async=1'}), 503
+    try:
+        return jsonify(fn(None, params))
     finally:
-        playing = False
-        logger.info("Playback finished.")
+        sync_wait_slots.release()
+
+def wants_async():
+    return request.args.get('async', 'false').lower() in ('1', 'true')
 
 # --- Routes ---
 
-@app.route('/status', methods=['GET'])
-def get_status():
-    return jsonify({
+def status_payload():
+    return {
         'recording': recording,
         'playing': playing,
-        'macro_length': len(recorded_macro)
-    })
+        'playback_end': playback_end,
+        'macro_length': len(active_recorder) if active_recorder else 0,
+        'playback_timing': playback_scheduler.stats()
+    }
+
+@app.route('/status', methods=['GET'])
+def get_status():
+    return jsonify(status_payload())
 
 @app.route('/start-recording', methods=['POST'])
 def start_rec():
-    global recording, recorded_macro
+    global recording, active_recorder
     if recording:
         return jsonify({'error': 'Already recording'}), 400
     
+    data = request.get_json(silent=True) or {}
+    options = {k: data[k] for k in ('simplify', 'tolerance_px', 'max_rate_hz') if k in data}
+    platform_features.load('pynput') # 501 here rather than a silent failure in the thread
+    
     recording = True
-    recorded_macro = []
-    threading.Thread(target=record_mouse_keyboard).start()
-    return jsonify({'status': 'started'})
+    active_recorder = StreamingRecorder(options=options)
+    threading.Thread(target=record_mouse_keyboard, args=(active_recorder,)).start()
+    return jsonify({'status': 'started', 'recording_id': active_recorder.id, 'options': options})
 
 @app.route('/stop-recording', methods=['POST'])
 def stop_rec():
-    global recording
     if not recording:
         return jsonify({'error': 'Not recording'}), 400
+    if wants_async():
+        return submit_job('stop_recording')
     
-    recording = False
-    time.sleep(0.5)
-    return jsonify({'status': 'stopped', 'macro': recorded_macro})
+    recorder = stop_recording_session()
+    if recorder is None:
+        return jsonify({'status': 'stopped'})
+    recorder.closed.wait(5)
+    info = recorder.info()
+    info['status'] = 'stopped'
+    return jsonify(info)
+
+@app.route('/recordings/<rec_id>', methods=['GET'])
+def get_recording(rec_id):
+    try:
+        macro = read_recording(recording_path(rec_id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'error': 'Recording not found'}), 404
+    if request.args.get('format') == 'binary':
+        return Response(macro.to_bytes(), mimetype='application/octet-stream')
+    return jsonify({'recording_id': rec_id, 'macro': macro.to_json()})
 
 @app.route('/play-macro', methods=['POST'])
 def play_rec():
@@ -537,17 +4756,107 @@ def play_rec():
     if playing:
         return jsonify({'error': 'Already playing'}), 400
     
-    data = request.json
-    macro = data.get('macro', [])
-    loop = data.get('loop', False)
-    interval = data.get('interval', 0)
+    if request.mimetype == 'application/octet-stream':
+        # Compact binary macro in the body, options in the query string
+        data = request.args
+        payload = request.get_data()
+        loop = data.get('loop', 'false').lower() == 'true'
+        interval = data.get('interval', 0, type=int)
+        late_threshold_ms = data.get('late_threshold_ms', type=float)
+        interpolate_hz = data.get('interpolate_hz')
+    else:
+        data = request.json
+        payload = data.get('macro', [])
+        loop = data.get('loop', False)
+        interval = data.get('interval', 0)
+        late_threshold_ms = data.get('late_threshold_ms')
+        interpolate_hz = data.get('interpolate_hz')
+
+    trigger = None
+    if isinstance(data.get('trigger'), dict):
+        try:
+            trigger = parse_trigger(data['trigger'])
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({'error': f'Invalid trigger: {e}'}), 400
+
+    try:
+        macro = load_macro_payload(payload)
+        late = playback_scheduler.late_options(data.get('late_policy'), late_threshold_ms)
+        interpolate_hz = parse_interpolate_hz(interpolate_hz)
+    except (ValueError, KeyError, TypeError, struct.error) as e:
+        return jsonify({'error': f'Invalid macro: {e}'}), 400
     
-    if not macro:
+    if not len(macro):
+        return jsonify({'error': 'No macro provided'}), 400
+
+    # Compiled before claiming the player, so a bad macro can't leave it stuck
+    compiled = compile_macro(macro, interpolate_hz=interpolate_hz)
+    playing = True
+    threading.Thread(target=play_macro_thread, args=(compiled, loop, interval),
+                     kwargs={'trigger': trigger, 'late': late}).start()
+    return jsonify({'status': 'playing', 'trigger': trigger is not None})
+
+# Macro library routes
+@app.route('/macros', methods=['GET'])
+def list_macros():
+    return jsonify(macro_library.list(request.args.get('tag')))
+
+@app.route('/macros', methods=['POST'])
+def save_macro():
+    data = request.json or {}
+    try:
+        if data.get('recording_id'):
+            macro = read_recording(recording_path(data['recording_id']))
+        else:
+            macro = load_macro_payload(data.get('macro'))
+    except FileNotFoundError:
+        return jsonify({'error': 'Recording not found'}), 404
+    except (ValueError, KeyError, TypeError, struct.error) as e:
+        return jsonify({'error': f'Invalid macro: {e}'}), 400
+    if not len(macro):
         return jsonify({'error': 'No macro provided'}), 400
+    meta = macro_library.add(macro, data.get('name'), data.get('tags'))
+    return jsonify(meta)
+
+@app.route('/macros/<macro_id>', methods=['GET'])
+def get_macro(macro_id):
+    try:
+        meta = macro_library.get(macro_id)
+        if request.args.get('events'):
+            meta['macro'] = macro_library.load(macro_id).to_json()
+    except (KeyError, FileNotFoundError):
+        return jsonify({'error': 'Macro not found'}), 404
+    return jsonify(meta)
+
+@app.route('/macros/<macro_id>/play', methods=['POST'])
+def play_macro_by_id(macro_id):
+    global playing
+    if playing:
+        return jsonify({'error': 'Already playing'}), 400
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        compiled = macro_library.compiled_macro(macro_id, parse_interpolate_hz(data.get('interpolate_hz')))
+        late = playback_scheduler.late_options(data.get('late_policy'), data.get('late_threshold_ms'))
+    except (KeyError, FileNotFoundError):
+        return jsonify({'error': 'Macro not found'}), 404
+    except (ValueError, TypeError, struct.error) as e:
+        return jsonify({'error': f'Invalid macro: {e}'}), 400
 
     playing = True
-    threading.Thread(target=play_macro_thread, args=(macro, loop, interval)).start()
-    return jsonify({'status': 'playing'})
+    threading.Thread(target=play_macro_thread, args=(compiled, data.get('loop', False), data.get('interval', 0)),
+                     kwargs={'late': late}).start()
+    return jsonify({'status': 'playing', 'id': macro_id})
+
+@app.route('/macros/<macro_id>', methods=['DELETE'])
+def delete_macro(macro_id):
+    try:
+        macro_library.delete(macro_id)
+    except KeyError:
+        return jsonify({'error': 'Macro not found'}), 404
+    except OSError as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'status': 'deleted', 'id': macro_id})
 
 @app.route('/stop-playback', methods=['POST'])
 def stop_play():
@@ -563,35 +4872,147 @@ def check_color():
     target_hex = data.get('color') # #RRGGBB
     
     if x is None or y is None:
-        x, y = pyautogui.position()
+        x, y = input_backend.position()
         
     try:
-        pixel = pyautogui.pixel(x, y)
-        current_hex = '#{:02x}{:02x}{:02x}'.format(pixel[0], pixel[1], pixel[2])
-        
-        match = False
-        if target_hex:
-            match = current_hex.lower() == target_hex.lower()
-            
+        result = probe_points(parse_probe_points([{'x': x, 'y': y, 'color': target_hex,
+                                                    'tolerance': data.get('tolerance', 0)}]))[0]
         return jsonify({
             'x': x, 
             'y': y, 
-            'color': current_hex, 
-            'match': match
+            'color': result['color'], 
+            'match': result['match']
         })
+    except FeatureUnavailable:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/get-cursor-info', methods=['GET'])
 def get_cursor_info():
-    x, y = pyautogui.position()
-    pixel = pyautogui.pixel(x, y)
-    color = '#{:02x}{:02x}{:02x}'.format(pixel[0], pixel[1], pixel[2])
-    return jsonify({'x': x, 'y': y, 'color': color})
+    x, y = input_backend.position()
+    result = probe_points([(x, y, None, 0)])[0]
+    return jsonify({'x': x, 'y': y, 'color': result['color']})
+
+@app.route('/probe', methods=['POST'])
+def probe():
+    # Many points, one capture
+    data = request.get_json(silent=True) or {}
+    try:
+        points = parse_probe_points(data.get('points'))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid points: {e}'}), 400
+    started = time.perf_counter()
+    results = probe_points(points)
+    return jsonify({'points': results, 'all': all(r['match'] for r in results),
+                    'any': any(r['match'] for r in results),
+                    'ms': round((time.perf_counter() - started) * 1000, 2)})
+
+@app.route('/probe/wait', methods=['POST'])
+def probe_wait():
+    data = request.get_json(silent=True) or {}
+    try:
+        parse_probe_points(data.get('points'))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid points: {e}'}), 400
+    params = {k: data[k] for k in ('points', 'mode', 'timeout_ms', 'max_hz') if k in data}
+    if wants_async():
+        return submit_job('color_wait', params)
+    # Held requests tie up a server thread, so cap how long one can wait
+    params['timeout_ms'] = min(params.get('timeout_ms') or 30000, 30000)
+    try:
+        return run_sync_wait(color_wait_job, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/templates', methods=['GET'])
+def list_templates():
+    return jsonify(template_library.list())
+
+@app.route('/templates', methods=['POST'])
+def add_template():
+    # From the screen ({region}), an encoded image ({image}: base64 PNG etc.)
+    # or raw pixels ({rgb}: base64, width, height)
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    try:
+        if data.get('image'):
+            meta = template_library.add_image(base64.b64decode(data['image']), name)
+        elif data.get('rgb'):
+            meta = template_library.add(base64.b64decode(data['rgb']), int(data['width']), int(data['height']), name)
+        else:
+            region = parse_region(data.get('region'))
+            if region is None:
+                return jsonify({'error': 'Give a region, an image or rgb pixels'}), 400
+            frame = capture_source.grab(region)
+            meta = template_library.add(frame.rgb, frame.width, frame.height, name)
+    except FeatureUnavailable:
+        raise
+    except (ValueError, KeyError, TypeError, OSError) as e:
+        return jsonify({'error': f'Invalid template: {e}'}), 400
+    return jsonify(meta), 201
+
+@app.route('/templates/<template_id>', methods=['GET'])
+def get_template(template_id):
+    try:
+        return jsonify(template_library.get(template_id))
+    except KeyError:
+        return jsonify({'error': 'Unknown template'}), 404
+
+@app.route('/templates/<template_id>', methods=['DELETE'])
+def delete_template(template_id):
+    try:
+        template_library.delete(template_id)
+    except KeyError:
+        return jsonify({'error': 'Unknown template'}), 404
+    template_matcher.forget(template_id)
+    return jsonify({'status': 'deleted'})
+
+@app.route('/templates/<template_id>/find', methods=['POST'])
+def find_template(template_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        region = parse_region(data.get('region'))
+        return jsonify(template_matcher.find(template_id, region, float(data.get('threshold', 0.9)),
+                                             track=data.get('track', True) is not False))
+    except KeyError:
+        return jsonify({'error': 'Unknown template'}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/templates/<template_id>/wait', methods=['POST'])
+def wait_template(template_id):
+    data = request.get_json(silent=True) or {}
+    params = {k: data[k] for k in ('region', 'threshold', 'timeout_ms', 'max_hz', 'present') if k in data}
+    params['template'] = template_id
+    try:
+        parse_trigger(params)
+    except KeyError:
+        return jsonify({'error': 'Unknown template'}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    if wants_async():
+        return submit_job('image_wait', params)
+    # Held requests tie up a server thread, so cap how long one can wait
+    params['timeout_ms'] = min(params.get('timeout_ms') or 30000, 30000)
+    return run_sync_wait(image_wait_job, params)
+
+@app.route('/templates/stats', methods=['GET'])
+def template_stats():
+    with template_matcher.lock:
+        stats = dict(template_matcher.stats)
+    stats['cached'] = len(template_library.prepared_cache)
+    return jsonify(stats)
+
+@app.route('/probe/stats', methods=['GET'])
+def probe_stats():
+    with color_watcher.lock:
+        return jsonify({'waiters': len(color_watcher.waiters), 'max_hz': color_watcher.max_hz,
+                        'capture': capture_source.name, **color_watcher.stats})
 
 @app.route('/windows', methods=['GET'])
 def list_windows():
-    wins = get_open_windows()
+    wins = window_backend.list_windows()
     return jsonify(wins)
 
 @app.route('/start-background-clicker', methods=['POST'])
@@ -606,61 +5027,104 @@ def start_bg_clicker():
     
     if not hwnd:
         return jsonify({'error': 'No window selected'}), 400
+    window_backend.require()
+    trigger = None
+    if isinstance(data.get('trigger'), dict):
+        try:
+            trigger = parse_trigger(data['trigger'])
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({'error': f'Invalid trigger: {e}'}), 400
         
     playing = True
-    threading.Thread(target=background_click_thread, args=(hwnd, interval, True)).start()
-    return jsonify({'status': 'started'})
+    threading.Thread(target=background_click_thread, args=(hwnd, interval, True, trigger)).start()
+    return jsonify({'status': 'started', 'trigger': trigger is not None})
+
+def system_stats_payload():
+    latest = system_sampler.get_latest()
+    if latest is None:
+        # Sampler hasn't ticked yet
+        mem = psutil.virtual_memory()
+        return {
+            'ram_total': mem.total,
+            'ram_available': mem.available,
+            'ram_percent': mem.percent,
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'reclaim': ram_planner.get_status()
+        }
+    return {
+        'ram_total': latest['ram_total'],
+        'ram_available': int(latest['ram_available']),
+        'ram_percent': latest['ram_percent'],
+        'cpu_percent': round(latest['cpu_percent'], 1),
+        'cpu_per_core': latest['cpu_per_core'],
+        'swap_percent': latest['swap_percent'],
+        'disk_read_bps': latest['disk_read_bps'],
+        'disk_write_bps': latest['disk_write_bps'],
+        'net_sent_bps': latest['net_sent_bps'],
+        'net_recv_bps': latest['net_recv_bps'],
+        'reclaim': ram_planner.get_status()
+    }
 
 @app.route('/boost/stats', methods=['GET'])
 def get_system_stats():
-    mem = psutil.virtual_memory()
-    return jsonify({
-        'ram_total': mem.total,
-        'ram_available': mem.available,
-        'ram_percent': mem.percent,
-        'cpu_percent': psutil.cpu_percent(interval=None)
-    })
+    return jsonify(system_stats_payload())
+
+@app.route('/boost/stats/history', methods=['GET'])
+def get_system_history():
+    window = request.args.get('window', 60, type=float)
+    resolution = request.args.get('resolution', type=float)
+    points = request.args.get('points', type=int)
+    metrics = request.args.get('metrics')
+    metrics = [m.strip() for m in metrics.split(',') if m.strip()] if metrics else None
+    if window <= 0:
+        return jsonify({'error': 'window must be positive'}), 400
+    return jsonify(system_sampler.query(window, resolution, metrics, points))
 
 @app.route('/boost/clean-ram', methods=['POST'])
 def clean_ram():
-    killed, freed = clean_ram_logic()
-    return jsonify({'killed': killed, 'freed_bytes': freed})
+    data = request.get_json(silent=True) or {}
+    params = {key: data[key] for key in ('target_bytes', 'allow_terminate') if key in data}
+    if data.get('dry_run'):
+        return jsonify(clean_ram_job(None, dict(params, dry_run=True)))
+    # Acting waits for memory to settle before measuring, so it always runs as a job
+    return submit_job('clean_ram', params)
+
+@app.route('/boost/resume', methods=['POST'])
+def resume_suspended():
+    return jsonify(ram_planner.restore_all('requested'))
 
 @app.route('/scan-games', methods=['GET'])
 def scan_games():
-    paths = [
-        r"C:\Program Files (x86)\Steam\steamapps\common",
-        r"C:\Program Files\Steam\steamapps\common",
-        r"C:\Program Files\Epic Games",
-        r"C:\Program Files (x86)\Epic Games",
-    ]
-    
-    games = []
-    for path in paths:
-        if os.path.exists(path):
-            try:
-                dirs = [d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d))]
-                for d in dirs:
-                    search_path = os.path.join(path, d)
-                    exes = glob.glob(os.path.join(search_path, "*.exe"))
-                    
-                    if exes:
-                        exes.sort(key=lambda x: os.path.getsize(x), reverse=True)
-                        exe_path = exes[0]
-                        
-                        games.append({
-                            'name': d,
-                            'path': exe_path,
-                            'platform': 'Steam' if 'Steam' in path else 'Epic'
-                        })
-            except Exception as e:
-                logger.error(f"Error scanning {path}: {e}")
-                
+    if request.args.get('stream', 'false').lower() in ('1', 'true'):
+        # One JSON object per line as soon as each directory is resolved
+        def generate():
+            for game in game_scanner.iter_scan():
+                yield json.dumps(game) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if wants_async():
+        return submit_job('scan_games')
+    games = game_scanner.scan()
+    games.sort(key=lambda g: g['name'].lower())
     return jsonify(games)
 
-@app.route('/network/usage', methods=['GET'])
-def get_network_usage():
-    top = network_monitor.get_top_consumers(10)
+@app.route('/scan-games/config', methods=['GET'])
+def get_scan_config():
+    config = game_scanner.get_config()
+    config['last_scan'] = game_scanner.last_scan
+    return jsonify(config)
+
+@app.route('/scan-games/config', methods=['POST'])
+def set_scan_config():
+    data = request.json or {}
+    try:
+        game_scanner.configure(data.get('roots'), data.get('max_depth'), data.get('workers'))
+        game_scanner.save_config()
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(game_scanner.get_config())
+
+def network_usage_payload(limit=10):
+    top = network_monitor.get_top_consumers(limit)
     result = []
     for p in top:
         result.append({
@@ -670,7 +5134,23 @@ def get_network_usage():
             'speed': p['speed'],
             'blocked': p['exe'] in firewall_manager.blocked_apps if p['exe'] else False
         })
-    return jsonify(result)
+    return result
+
+@app.route('/network/usage', methods=['GET'])
+def get_network_usage():
+    return jsonify(network_usage_payload())
+
+@app.route('/network/usage/history', methods=['GET'])
+def get_network_history():
+    pid = request.args.get('pid', type=int)
+    window = request.args.get('window', 60, type=float)
+    points = request.args.get('points', 60, type=int)
+    if pid is None:
+        return jsonify({'error': 'pid required'}), 400
+    history = network_monitor.get_history(pid, window, points)
+    if history is None:
+        return jsonify({'error': 'Unknown pid'}), 404
+    return jsonify(history)
 
 @app.route('/network/block', methods=['POST'])
 def block_app():
@@ -690,8 +5170,52 @@ def unblock_app():
 
 @app.route('/network/clear', methods=['POST'])
 def clear_network_rules():
-    firewall_manager.clear_all_rules()
-    return jsonify({'status': 'cleared'})
+    data = request.get_json(silent=True) or {}
+    if wants_async():
+        return submit_job('network_clear', {'dry_run': bool(data.get('dry_run'))})
+    result = firewall_manager.clear_all_rules(dry_run=bool(data.get('dry_run')))
+    result['status'] = 'cleared' if result['ok'] else 'failed'
+    return jsonify(result), 200 if result['ok'] else 500
+
+@app.route('/network/mode', methods=['POST'])
+def set_network_mode():
+    data = request.json or {}
+    mode = data.get('mode')
+    if mode not in GUARD_PROFILES:
+        return jsonify({'error': 'Unknown mode'}), 400
+    firewall_manager.mode = mode
+    firewall_manager.save_state()
+    return jsonify({'status': 'set', 'mode': mode})
+
+@app.route('/network/whitelist', methods=['POST'])
+def set_network_whitelist():
+    data = request.json or {}
+    firewall_manager.whitelist = set(data.get('whitelist', []))
+    firewall_manager.save_state()
+    return jsonify({'whitelist': sorted(firewall_manager.whitelist)})
+
+@app.route('/network/guard', methods=['GET'])
+def get_network_guard():
+    return jsonify(bandwidth_guard.get_status())
+
+@app.route('/network/rules', methods=['GET'])
+def get_network_rules():
+    return jsonify(firewall_manager.get_rules())
+
+@app.route('/network/batch', methods=['POST'])
+def apply_network_batch():
+    data = request.json or {}
+    result = firewall_manager.apply_batch(data.get('block', []), data.get('unblock', []), dry_run=bool(data.get('dry_run')))
+    return jsonify(result), 200 if result['ok'] else 500
+
+@app.route('/network/reconcile', methods=['POST'])
+def reconcile_network_rules():
+    data = request.get_json(silent=True) or {}
+    try:
+        result = firewall_manager.reconcile(dry_run=bool(data.get('dry_run')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify(result), 200 if result['ok'] else 500
 
 @app.route('/ultra/enable', methods=['POST'])
 def enable_ultra_mode():
@@ -710,10 +5234,33 @@ def disable_ultra_mode():
         return jsonify({'status': 'disabled'})
     return jsonify({'status': 'failed'}), 500
 
+@app.route('/ultra/status', methods=['GET'])
+def ultra_mode_status():
+    return jsonify(ultra_manager.get_status())
+
 @app.route('/dns/benchmark', methods=['GET'])
 def benchmark_dns():
-    results = dns_manager.benchmark()
-    return jsonify(results)
+    force = request.args.get('force', 'false').lower() in ('1', 'true')
+    if wants_async():
+        if not force and dns_manager.results is not None and dns_manager.age() < dns_manager.ttl:
+            return jsonify(dns_manager.get_results())
+        return submit_job('dns_benchmark')
+    return jsonify(dns_manager.get_results(force=force, wait=10))
+
+@app.route('/dns/servers', methods=['GET'])
+def get_dns_servers():
+    return jsonify(dns_manager.get_config())
+
+@app.route('/dns/servers', methods=['POST'])
+def set_dns_servers():
+    data = request.json or {}
+    try:
+        dns_manager.configure(data.get('servers'), data.get('domains'), data.get('samples'), data.get('timeout'), data.get('ttl'))
+        dns_manager.save_config()
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+    dns_manager.refresh_async()
+    return jsonify(dns_manager.get_config())
 
 @app.route('/dns/set', methods=['POST'])
 def set_dns_route():
@@ -730,47 +5277,47 @@ def start_remap():
     profile_type = data.get('profile', 'classic')
     
     if remapping_active:
-        keyboard.unhook_all()
+        keyboard_hooks.unhook_all()
     
     remapping_active = True
     
     try:
         if profile_type == 'classic':
-            keyboard.remap_key('up', 'w')
-            keyboard.remap_key('down', 's')
-            keyboard.remap_key('left', 'a')
-            keyboard.remap_key('right', 'd')
-            keyboard.remap_key('space', '1')
-            keyboard.remap_key('tab', 'page down')
+            keyboard_hooks.remap_key('up', 'w')
+            keyboard_hooks.remap_key('down', 's')
+            keyboard_hooks.remap_key('left', 'a')
+            keyboard_hooks.remap_key('right', 'd')
+            keyboard_hooks.remap_key('space', '1')
+            keyboard_hooks.remap_key('tab', 'page down')
         elif profile_type == 'option2':
-            keyboard.remap_key('enter', 'w')
-            keyboard.remap_key('up', 's')
-            keyboard.remap_key('right shift', 'a')
-            keyboard.remap_key('1', 'd')
-            keyboard.remap_key('left', 'z')
-            keyboard.remap_key('down', 'x')
-            keyboard.remap_key('right', 'c')
-            keyboard.remap_key('4', 'e')
-            keyboard.remap_key(',', 'q')
-            keyboard.remap_key('tab', 'page down')
+            keyboard_hooks.remap_key('enter', 'w')
+            keyboard_hooks.remap_key('up', 's')
+            keyboard_hooks.remap_key('right shift', 'a')
+            keyboard_hooks.remap_key('1', 'd')
+            keyboard_hooks.remap_key('left', 'z')
+            keyboard_hooks.remap_key('down', 'x')
+            keyboard_hooks.remap_key('right', 'c')
+            keyboard_hooks.remap_key('4', 'e')
+            keyboard_hooks.remap_key(',', 'q')
+            keyboard_hooks.remap_key('tab', 'page down')
         elif profile_type == 'mirror':
-            keyboard.remap_key('p', 'q')
-            keyboard.remap_key('o', 'w')
-            keyboard.remap_key('i', 'e')
-            keyboard.remap_key('u', 'r')
-            keyboard.remap_key('l', 's')
-            keyboard.remap_key('k', 'd')
-            keyboard.remap_key('j', 'f')
-            keyboard.remap_key('m', 'v')
+            keyboard_hooks.remap_key('p', 'q')
+            keyboard_hooks.remap_key('o', 'w')
+            keyboard_hooks.remap_key('i', 'e')
+            keyboard_hooks.remap_key('u', 'r')
+            keyboard_hooks.remap_key('l', 's')
+            keyboard_hooks.remap_key('k', 'd')
+            keyboard_hooks.remap_key('j', 'f')
+            keyboard_hooks.remap_key('m', 'v')
         elif profile_type == 'numpad':
-            keyboard.remap_key('8', 'w')
-            keyboard.remap_key('5', 's')
-            keyboard.remap_key('4', 'a')
-            keyboard.remap_key('6', 'd')
-            keyboard.remap_key('7', 'q')
-            keyboard.remap_key('9', 'e')
-            keyboard.remap_key('0', 'space')
-            keyboard.remap_key('enter', 'f')
+            keyboard_hooks.remap_key('8', 'w')
+            keyboard_hooks.remap_key('5', 's')
+            keyboard_hooks.remap_key('4', 'a')
+            keyboard_hooks.remap_key('6', 'd')
+            keyboard_hooks.remap_key('7', 'q')
+            keyboard_hooks.remap_key('9', 'e')
+            keyboard_hooks.remap_key('0', 'space')
+            keyboard_hooks.remap_key('enter', 'f')
 
         return jsonify({'status': 'started', 'profile': profile_type})
     except Exception as e:
@@ -781,7 +5328,7 @@ def stop_remap():
     global remapping_active
     remapping_active = False
     try:
-        keyboard.unhook_all()
+        keyboard_hooks.unhook_all()
         return jsonify({'status': 'stopped'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -789,13 +5336,20 @@ def stop_remap():
 # Global Hotkey Listener (Runs in background)
 def global_hotkey_listener():
     global recording
+    if not platform_features.available('keyboard'):
+        logger.warning("Global hotkey disabled: keyboard hooks unavailable")
+        return
     logger.info("Global hotkey listener started (Ctrl+Win+R)")
     
+    hotkey_loop = loop_duration.labels('hotkey_listener')
     while True:
         try:
-            if keyboard.is_pressed('ctrl+windows+r'):
+            started = time.perf_counter()
+            pressed = keyboard_hooks.is_pressed('ctrl+windows+r')
+            hotkey_loop.observe(time.perf_counter() - started)
+            if pressed:
                 if recording:
-                    recording = False
+                    stop_recording_session()
                     logger.info("Hotkey: Stop Recording")
                     time.sleep(1)
                 else:
@@ -817,8 +5371,13 @@ def get_autolaunch_config():
 def save_autolaunch_config():
     data = request.json
     save_config(data)
+    launch_detector.invalidate()
     return jsonify({'status': 'saved'})
 
+@app.route('/autolaunch/stats', methods=['GET'])
+def get_autolaunch_stats():
+    return jsonify(launch_detector.get_stats())
+
 @app.route('/launch-game', methods=['POST'])
 def launch_game():
     data = request.json
@@ -834,11 +5393,125 @@ def launch_game():
         logger.error(f"Launch error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Live telemetry: one long-lived connection instead of per-panel polling
+telemetry_hub.register('network', network_usage_payload, 1.0)
+telemetry_hub.register('boost', system_stats_payload, 2.0)
+telemetry_hub.register('status', status_payload, 0.25)
+
+@app.route('/stream', methods=['GET'])
+def telemetry_stream():
+    topics = [t for t in request.args.get('topics', 'network,boost,status').split(',') if t]
+    client = telemetry_hub.connect(topics)
+    if not client.topics:
+        telemetry_hub.disconnect(client)
+        return jsonify({'error': 'No valid topics'}), 400
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(telemetry_hub.stream(client)), mimetype='text/event-stream', headers=headers)
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify(job_manager.list())
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in job_manager.kinds:
+        return jsonify({'error': f"Unknown job kind: {kind}", 'kinds': sorted(job_manager.kinds)}), 400
+    return submit_job(kind, data.get('params') or {})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    # Optional long-poll so clients don't have to spin
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    if wait > 0:
+        job.done.wait(wait)
+    return jsonify(job.info())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.info())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if not job.done.is_set():
+        return jsonify(job.info()), 202
+    return jsonify(job.info(with_result=True)), 200 if job.state == 'done' else 500
+
+@app.route('/platform', methods=['GET'])
+def get_platform():
+    report = platform_features.report()
+    report['backends'] = {'input': input_backend.name, 'window': window_backend.name, 'capture': capture_source.name,
+                          'firewall': firewall_manager.backend.name}
+    return jsonify(report)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profiler', methods=['GET'])
+def get_profiler():
+    return jsonify(profiler.report(request.args.get('top', 50, type=int)))
+
+@app.route('/metrics/profiler', methods=['POST'])
+def toggle_profiler():
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled'):
+        interval_ms = data.get('interval_ms')
+        profiler.start(interval_ms / 1000.0 if interval_ms else None)
+    else:
+        profiler.stop()
+    return jsonify(profiler.report(0))
+
+@app.route('/stream/stats', methods=['GET'])
+def telemetry_stream_stats():
+    return jsonify(telemetry_hub.get_stats())
+
 if __name__ == '__main__':
     # Start threads
+    try:
+        firewall_manager.reconcile()
+    except Exception as e:
+        logger.error(f"Firewall reconcile at startup failed: {e}")
+    # Apps a previous run suspended or deprioritized and never restored
+    ram_planner.restore_all('left over from the last run')
+    process_sampler.subscribe(firewall_manager.track)
+    threading.Thread(target=process_sampler.run, daemon=True).start()
+    threading.Thread(target=system_sampler.run, daemon=True).start()
     threading.Thread(target=network_monitor.update_loop, daemon=True).start()
     threading.Thread(target=game_monitor_thread, daemon=True).start()
     threading.Thread(target=global_hotkey_listener, daemon=True).start()
+    threading.Thread(target=telemetry_hub.run, daemon=True).start()
+    threading.Thread(target=bandwidth_guard.run, daemon=True).start()
+    if dns_manager.results is None or dns_manager.age() >= dns_manager.ttl:
+        dns_manager.refresh_async()
+    if os.environ.get('GM_PROFILER', '').lower() in ('1', 'true'):
+        profiler.start()
     
-    logger.info("Automation Server running on port 5000")
-    app.run(port=5000, debug=False)
+    # Optional subsystems load in the background so the first request doesn't pay for them
+    threading.Thread(target=platform_features.preload, daemon=True).start()
+    logger.info(f"Automation Server running on port 5000 (core imports {CORE_IMPORT_MS} ms, "
+                f"ready in {(time.perf_counter() - BOOT_STARTED) * 1000:.0f} ms)")
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    try:
+        if serve is None:
+            logger.warning("waitress not installed, falling back to the Flask development server")
+            app.run(port=5000, debug=False, threaded=True)
+        else:
+            # Enough threads that SSE clients and long polls don't starve short requests
+            serve(app, host='127.0.0.1', port=5000, threads=int(os.environ.get('GM_SERVER_THREADS', 16)),
+                  channel_timeout=120)
+    finally:
+        ram_planner.restore_all('backend shutdown')
@@ -0,0 +1,279 @@
+"""Benchmarks for the automation backend's hot paths.
+
+Runs headless against synthetic fixtures: a fake process table, a generated
+Steam/Epic library, a recording input backend and synthetic screen frames.
+Results are written as JSON and compared with a stored baseline; the exit code is 1 on a regression and
+2 when there is no baseline to compare with.
+
+    python scripts/benchmark_backend.py --save-baseline
+    python scripts/benchmark_backend.py --baseline scripts/benchmark_baseline.json
+    python scripts/benchmark_backend.py --quick --library-size 1000
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import automation_server as server  # noqa: E402
+
+DEFAULT_BASELINE = BASE_DIR / "scripts" / "benchmark_baseline.json"
+
+IoCounters = namedtuple('IoCounters', 'read_bytes write_bytes')
+MemoryInfo = namedtuple('MemoryInfo', 'rss vms')
+
+# Timing metrics below this difference (ms) are noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+
+class SyntheticProcesses:
+    # A process table that churns a little every tick, like a real desktop
+    def __init__(self, count, churn=0.01, game_every=250):
+        self.count = count
+        self.churn = churn
+        self.game_every = game_every
+        self.next_pid = 1000
+        self.tick = 0
+        self.rows = [self._spawn() for _ in range(count)]
+
+    def _spawn(self):
+        pid = self.next_pid
+        self.next_pid += 1
+        if pid % self.game_every == 0:
+            name = f"game{pid % 7}.exe"
+            exe = f"C:\\Games\\Game{pid % 7}\\{name}"
+        else:
+            name = f"proc{pid % 97}.exe"
+            exe = f"C:\\Program Files\\App{pid % 97}\\{name}"
+        return server.ProcessInfo(pid, 4, name, exe, IoCounters(0, 0), MemoryInfo(50 << 20, 100 << 20), float(pid))
+
+    def advance(self):
+        # New I/O totals for everyone, and a few processes replaced
+        self.tick += 1
+        replaced = max(1, int(self.count * self.churn))
+        rows = self.rows[replaced:] + [self._spawn() for _ in range(replaced)]
+        step = self.tick * 4096
+        self.rows = [p._replace(io_counters=IoCounters(step * (p.pid % 13), step * (p.pid % 5))) for p in rows]
+        return server.ProcessSnapshot(self.tick, time.monotonic(), self.rows)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def bench_network_update(count, repeat):
+    procs = SyntheticProcesses(count)
+    monitor = server.NetworkMonitor()
+    monitor._update(procs.advance())
+    median, worst = timed(lambda: monitor._update(procs.advance()), repeat)
+    return {f"network_update_{count}_ms": median, f"network_update_{count}_max_ms": worst}
+
+
+def bench_game_monitor(count, repeat, tmp):
+    procs = SyntheticProcesses(count)
+    detector = server.GameLaunchDetector(config_path=os.path.join(tmp, 'autolaunch.json'),
+                                         action_handler=lambda action, **kw: None)
+    detector.set_config([{'exe_path': f"C:\\Games\\Game{i}\\game{i}.exe", 'actions': []} for i in range(7)]
+                        + [{'exe_path': f"D:\\Library\\Title{i}\\title{i}.exe", 'actions': []} for i in range(200)])
+    detector.process(procs.advance())
+    median, worst = timed(lambda: detector.process(procs.advance()), repeat)
+    return {f"game_monitor_{count}_ms": median, f"game_monitor_{count}_max_ms": worst}
+
+
+def build_library(root, steam_games, epic_games, plain_games, files_per_game=6):
+    steam = os.path.join(root, 'Steam')
+    steamapps = os.path.join(steam, 'steamapps')
+    os.makedirs(os.path.join(steamapps, 'common'))
+    with open(os.path.join(steamapps, 'libraryfolders.vdf'), 'w', encoding='utf-8') as f:
+        f.write('"libraryfolders"\n{\n\t"0"\n\t{\n\t\t"path"\t\t"%s"\n\t}\n}\n' % steam.replace('\\', '\\\\'))
+    for i in range(steam_games):
+        appid = 100000 + i
+        with open(os.path.join(steamapps, f'appmanifest_{appid}.acf'), 'w', encoding='utf-8') as f:
+            f.write('"AppState"\n{\n\t"appid"\t\t"%d"\n\t"name"\t\t"Steam Game %d"\n'
+                    '\t"installdir"\t\t"SteamGame%d"\n\t"StateFlags"\t\t"4"\n}\n' % (appid, i, i))
+        _game_dir(os.path.join(steamapps, 'common', f'SteamGame{i}'), files_per_game)
+
+    manifests = os.path.join(root, 'EpicManifests')
+    os.makedirs(manifests)
+    for i in range(epic_games):
+        location = os.path.join(root, 'Epic Games', f'EpicGame{i}')
+        _game_dir(location, files_per_game)
+        with open(os.path.join(manifests, f'{i:08X}.item'), 'w', encoding='utf-8') as f:
+            json.dump({'DisplayName': f'Epic Game {i}', 'AppName': f'epic{i}',
+                       'InstallLocation': location, 'LaunchExecutable': 'game0.exe'}, f)
+
+    plain = os.path.join(root, 'Games')
+    os.makedirs(plain)
+    for i in range(plain_games):
+        _game_dir(os.path.join(plain, f'Game{i}'), files_per_game)
+    return [steam], [manifests], [plain]
+
+
+def _game_dir(path, files):
+    os.makedirs(os.path.join(path, 'data'), exist_ok=True)
+    for j in range(files):
+        name = f'game{j}.exe' if j < 2 else f'asset{j}.pak'
+        with open(os.path.join(path, name), 'wb') as f:
+            f.write(b'\0' * (1024 * (j + 1)))
+
+
+def bench_scan(size, tmp):
+    steam_roots, epic_dirs, roots = build_library(os.path.join(tmp, 'library'), size, size // 2, size)
+    scanner = server.GameLibraryScanner(index_path=os.path.join(tmp, 'game_index.json'),
+                                        config_path=os.path.join(tmp, 'game_scan_config.json'),
+                                        discovery=server.ManifestDiscovery(steam_roots, epic_dirs))
+    scanner.configure(roots=roots, max_depth=1)
+    cold, _ = timed(scanner.scan, 1)
+    games = len(scanner.scan())
+    warm, _ = timed(scanner.scan, 3)
+    return {f"scan_{size}_cold_ms": cold, f"scan_{size}_warm_ms": warm, f"scan_{size}_games": games}
+
+
+def bench_playback(events, rate_hz):
+    macro = server.CompactMacro()
+    step = 1.0 / rate_hz
+    for i in range(events):
+        macro.append(server.CompactMacro.EV_MOVE, i % 1920, i % 1080, None, i * step)
+    scheduler = server.PlaybackScheduler()
+    backend = server.RecordingInput()
+    server.playing = True
+    server.play_macro_thread(macro, scheduler=scheduler, backend=backend)
+    stats = scheduler.stats()
+    return {
+        'playback_error_p50_ms': (stats['p50_us'] or 0) / 1000,
+        'playback_error_p99_ms': (stats['p99_us'] or 0) / 1000,
+        'playback_dispatched': len(backend.calls),
+        'playback_skipped': stats['skipped'],
+    }
+
+
+def bench_template_match(repeat, tmp):
+    # A 1080p synthetic desktop with a button drawn somewhere; needs NumPy
+    try:
+        np = server.platform_features.load('numpy')
+    except server.FeatureUnavailable:
+        return {}
+    rng = np.random.default_rng(1)
+    tiles = rng.integers(0, 255, (108, 192, 3), dtype=np.uint8)
+    screen = np.kron(tiles, np.ones((10, 10, 1), dtype=np.uint8))
+    button = rng.integers(0, 255, (12, 30, 3), dtype=np.uint8).repeat(4, 0).repeat(4, 1)
+    x, y = 1203, 611
+    screen[y:y + button.shape[0], x:x + button.shape[1]] = button
+    capture = server.FakeCapture(1920, 1080)
+    capture.screen = bytearray(screen.tobytes())
+    library = server.TemplateLibrary(os.path.join(tmp, 'templates'))
+    meta = library.add(button.tobytes(), button.shape[1], button.shape[0], 'button')
+    matcher = server.TemplateMatcher(library, capture=capture)
+    hit = matcher.find(meta['id'], track=False)
+    full, _ = timed(lambda: matcher.find(meta['id'], track=False), repeat)
+    matcher.find(meta['id'])
+    tracked, _ = timed(lambda: matcher.find(meta['id']), repeat)
+    roi, _ = timed(lambda: matcher.find(meta['id'], region=(x - 150, y - 150, 400, 400), track=False), repeat)
+    return {
+        'template_match_1080p_ms': full,
+        'template_match_roi_ms': roi,
+        'template_match_tracked_ms': tracked,
+        'template_match_found': bool(hit['found'] and hit['x'] == x and hit['y'] == y),
+    }
+
+
+def run(quick=False, library_size=None):
+    repeat = 5 if quick else 20
+    if library_size is None:
+        library_size = 50 if quick else 300
+    results = {}
+    tmp = tempfile.mkdtemp(prefix='gm_bench_')
+    try:
+        for count in (500, 5000):
+            results.update(bench_network_update(count, repeat))
+            results.update(bench_game_monitor(count, repeat, tmp))
+        results.update(bench_scan(library_size, tmp))
+        results.update(bench_playback(200 if quick else 1000, 500))
+        results.update(bench_template_match(repeat, tmp))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in results.items()}
+
+
+def compare(results, baseline, threshold):
+    # Only timings are compared (lower is better); counts are informational
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if not name.endswith('_ms') or current is None or base <= 0:
+            continue
+        if current > base * (1 + threshold) and current - base > NOISE_FLOOR_MS:
+            regressions.append({'metric': name, 'baseline': base, 'current': current,
+                                'change': round(current / base - 1, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='smaller fixtures and fewer repeats')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown ratio (0.25 = 25%%)')
+    parser.add_argument('--library-size', type=int,
+                        help='games per store in the generated library (default 300, 50 with --quick)')
+    args = parser.parse_args()
+    # Synthetic launches and scans would otherwise log every event
+    server.logger.setLevel(logging.WARNING)
+
+    results = run(args.quick, args.library_size)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'library_size': args.library_size,
+        'results': results,
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != args.quick or baseline.get('library_size') != args.library_size:
+            print("Warning: baseline was recorded with different --quick/--library-size settings")
+        missing = sorted(set(baseline.get('results', {})) - set(results))
+        if missing:
+            print(f"Warning: not measured in this run: {', '.join(missing)}")
+        report['regressions'] = compare(results, baseline.get('results', {}), args.threshold)
+    else:
+        print(f"No baseline at {args.baseline}; record one with --save-baseline", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    width = max(len(k) for k in results)
+    for name, value in results.items():
+        print(f"{name:<{width}}  {value}")
+    for reg in report.get('regressions', []):
+        print(f"REGRESSION {reg['metric']}: {reg['baseline']} -> {reg['current']} (+{reg['change']:.0%})")
+    if 'regressions' not in report and not args.save_baseline:
+        return 2
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,13 @@
-import { useState, useEffect, useRef } from 'react'
+import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { MousePointer2, Play, Square, Circle, Save, Upload, RefreshCw, Crosshair, AlertTriangle, Layers } from 'lucide-react'
-import { checkBackendStatus, startRecording, stopRecording, playMacro, stopPlayback, getCursorInfo, getWindows, startBackgroundClicker } from '../services/automation'
+import { checkBackendStatus, startRecording, stopRecording, playMacro, stopPlayback, getCursorInfo, getWindows, startBackgroundClicker, subscribeTelemetry } from '../services/automation'
+
+// How long playback waits for the trigger color before giving up
+const TRIGGER_TIMEOUT_MS = 30000
 
 export function AutoClicker() {
-    const [status, setStatus] = useState(null) // { recording, playing, macro_length }
+    const [status, setStatus] = useState(null) // { recording, playing, playback_end, macro_length }
     const [connected, setConnected] = useState(false)
     const [macro, setMacro] = useState([])
     const [loop, setLoop] = useState(false)
@@ -18,10 +21,8 @@ export function AutoClicker() {
     const [windows, setWindows] = useState([])
     const [selectedWindow, setSelectedWindow] = useState(null)
 
-    const statusInterval = useRef(null)
-
     useEffect(() => {
-        // Poll backend status
+        // Initial status, then live updates pushed by the backend
         const poll = async () => {
             const s = await checkBackendStatus()
             if (s) {
@@ -33,8 +34,7 @@ export function AutoClicker() {
         }
 
         poll()
-        statusInterval.current = setInterval(poll, 1000)
-        return () => clearInterval(statusInterval.current)
+        return subscribeTelemetry(['status'], (topic, data) => setStatus(data), setConnected)
     }, [])
 
     useEffect(() => {
@@ -67,7 +67,10 @@ export function AutoClicker() {
             }
             await startBackgroundClicker(selectedWindow, interval)
         } else {
-            await playMacro(macro, loop, interval)
+            const trigger = triggerColor
+                ? { points: [{ x: triggerPos.x, y: triggerPos.y, color: triggerColor, tolerance: 8 }], timeout_ms: TRIGGER_TIMEOUT_MS }
+                : null
+            await playMacro(macro, loop, interval, trigger)
         }
     }
 
@@ -298,8 +301,15 @@ export function AutoClicker() {
                                         {pickingColor ? 'Wait 3s...' : 'Pick Color'}
                                     </button>
                                 </div>
+                                {triggerColor && !status?.playing && status?.playback_end === 'trigger_timeout' && (
+                                    <div className="mb-4 p-3 rounded-lg bg-yellow-500/10 border border-yellow-500/20 text-yellow-500 text-sm flex items-center gap-2">
+                                        <AlertTriangle size={16} />
+                                        Trigger color did not appear within {TRIGGER_TIMEOUT_MS / 1000}s, playback stopped.
+                                    </div>
+                                )}
                                 <p className="text-xs text-text-muted">
                                     Click "Pick Color", then move your mouse to the target area. The color will be captured after 3 seconds.
+                                    Playback waits up to {TRIGGER_TIMEOUT_MS / 1000}s for it to appear.
                                 </p>
                             </section>
                         )}
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { Zap, Cpu, HardDrive, Trash2, AlertTriangle, CheckCircle, Activity } from 'lucide-react'
+import { subscribeTelemetry, runAsync } from '../services/automation'
 
 const API_URL = 'http://localhost:5000'
 
@@ -12,8 +13,7 @@ export function Booster() {
 
     useEffect(() => {
         fetchStats()
-        const interval = setInterval(fetchStats, 2000)
-        return () => clearInterval(interval)
+        return subscribeTelemetry(['boost'], (topic, data) => setStats(data), setConnected)
     }, [])
 
     const fetchStats = async () => {
@@ -34,8 +34,8 @@ export function Booster() {
     const handleBoost = async () => {
         setLoading(true)
         try {
-            const res = await fetch(`${API_URL}/boost/clean-ram`, { method: 'POST' })
-            const data = await res.json()
+            // Runs as a job on the backend while memory settles
+            const data = await runAsync('/boost/clean-ram', { method: 'POST' })
             setResult(data)
             setTimeout(() => setResult(null), 5000)
         } catch (e) {
@@ -45,6 +45,18 @@ export function Booster() {
         }
     }
 
+    const handleResume = async () => {
+        try {
+            await fetch(`${API_URL}/boost/resume`, { method: 'POST' })
+            setResult(null)
+            fetchStats()
+        } catch (e) {
+            alert("Failed to resume apps")
+        }
+    }
+
+    const held = stats?.reclaim ? stats.reclaim.suspended + stats.reclaim.lowered : 0
+
     return (
         <div className="flex h-screen bg-bg-dark text-text-main">
             <div className="flex-1 flex flex-col max-w-4xl mx-auto w-full p-6">
@@ -113,15 +125,34 @@ export function Booster() {
                         )}
                     </button>
 
+                    {held > 0 && (
+                        <button
+                            onClick={handleResume}
+                            disabled={!connected}
+                            className="mt-4 px-4 py-2 rounded-lg text-sm bg-white/10 hover:bg-white/20 text-white mx-auto block"
+                        >
+                            Resume background apps ({held})
+                        </button>
+                    )}
+
                     {result && (
                         <div className="mt-6 p-4 rounded-xl bg-green-500/10 border border-green-500/20 text-green-500 animate-fade-in">
                             <div className="flex items-center justify-center gap-2 font-bold mb-2">
                                 <CheckCircle size={20} /> Optimization Complete
                             </div>
                             <p className="text-sm">
-                                Freed {(result.freed_bytes / 1024 / 1024).toFixed(1)} MB of RAM.
+                                {result.status === 'no_candidates'
+                                    ? 'Nothing to free: no background apps from the list are running.'
+                                    : result.status === 'nothing_needed'
+                                        ? 'Nothing to free: enough RAM is already available.'
+                                        : `Freed ${(result.freed_bytes / 1024 / 1024).toFixed(1)} MB of RAM.`}
                             </p>
-                            {result.killed.length > 0 && (
+                            {result.suspended?.length > 0 && (
+                                <p className="text-xs mt-1 opacity-80">
+                                    Suspended: {result.suspended.join(', ')}
+                                </p>
+                            )}
+                            {result.killed?.length > 0 && (
                                 <p className="text-xs mt-1 opacity-80">
                                     Closed: {result.killed.join(', ')}
                                 </p>
@@ -167,9 +198,8 @@ function DNSOptimizer() {
     const runBenchmark = async () => {
         setLoading(true)
         try {
-            const res = await fetch(`${API_URL}/dns/benchmark`)
-            const data = await res.json()
-            setResults(data)
+            const data = await runAsync('/dns/benchmark')
+            setResults(data.results)
         } catch (e) {
             console.error(e)
         } finally {
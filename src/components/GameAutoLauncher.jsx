@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { Play, Plus, Save, Trash2, Settings, Zap, MousePointer2, Network, Cpu, Keyboard } from 'lucide-react'
+import { runAsync } from '../services/automation'
 
 export function GameAutoLauncher() {
     const [config, setConfig] = useState([])
@@ -39,8 +40,7 @@ export function GameAutoLauncher() {
     const scanGames = async () => {
         setLoading(true)
         try {
-            const res = await fetch('http://localhost:5000/scan-games')
-            const data = await res.json()
+            const data = await runAsync('/scan-games')
             setScannedGames(data)
         } catch (e) {
             console.error("Failed to scan games", e)
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { Wifi, Shield, Activity, Ban, CheckCircle, AlertTriangle, Trash2 } from 'lucide-react'
+import { subscribeTelemetry, runAsync } from '../services/automation'
 
 const API_URL = 'http://localhost:5000'
 
@@ -10,9 +11,12 @@ export function NetworkPanel() {
     const [mode, setMode] = useState('soft') // soft, hard, pro
 
     useEffect(() => {
+        fetch(`${API_URL}/network/rules`)
+            .then(res => res.json())
+            .then(data => data.mode && setMode(data.mode))
+            .catch(() => {})
         fetchUsage()
-        const interval = setInterval(fetchUsage, 1000)
-        return () => clearInterval(interval)
+        return subscribeTelemetry(['network'], (topic, data) => setProcesses(data), setConnected)
     }, [])
 
     const fetchUsage = async () => {
@@ -30,6 +34,19 @@ export function NetworkPanel() {
         }
     }
 
+    const changeMode = async (newMode) => {
+        setMode(newMode)
+        try {
+            await fetch(`${API_URL}/network/mode`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ mode: newMode })
+            })
+        } catch (e) {
+            console.error(e)
+        }
+    }
+
     const toggleBlock = async (exe, isBlocked) => {
         const endpoint = isBlocked ? '/network/unblock' : '/network/block'
         try {
@@ -46,7 +63,7 @@ export function NetworkPanel() {
 
     const clearRules = async () => {
         try {
-            await fetch(`${API_URL}/network/clear`, { method: 'POST' })
+            await runAsync('/network/clear', { method: 'POST' })
             fetchUsage()
         } catch (e) {
             console.error("Failed to clear rules", e)
@@ -92,21 +109,21 @@ export function NetworkPanel() {
                         </h3>
                         <div className="space-y-3">
                             <button
-                                onClick={() => setMode('soft')}
+                                onClick={() => changeMode('soft')}
                                 className={`w-full p-3 rounded-xl text-left transition-all border ${mode === 'soft' ? 'bg-green-500/20 border-green-500 text-white' : 'bg-white/5 border-transparent text-text-muted hover:bg-white/10'}`}
                             >
                                 <div className="font-bold">Soft Mode</div>
                                 <div className="text-xs opacity-70">Monitor only. Manual blocking.</div>
                             </button>
                             <button
-                                onClick={() => setMode('hard')}
+                                onClick={() => changeMode('hard')}
                                 className={`w-full p-3 rounded-xl text-left transition-all border ${mode === 'hard' ? 'bg-yellow-500/20 border-yellow-500 text-white' : 'bg-white/5 border-transparent text-text-muted hover:bg-white/10'}`}
                             >
                                 <div className="font-bold">Hard Mode</div>
                                 <div className="text-xs opacity-70">Auto-block high usage apps.</div>
                             </button>
                             <button
-                                onClick={() => setMode('pro')}
+                                onClick={() => changeMode('pro')}
                                 className={`w-full p-3 rounded-xl text-left transition-all border ${mode === 'pro' ? 'bg-red-500/20 border-red-500 text-white' : 'bg-white/5 border-transparent text-text-muted hover:bg-white/10'}`}
                             >
                                 <div className="font-bold">Pro Mode</div>
@@ -14,16 +14,53 @@ export const startRecording = async () => {
     return await res.json();
 };
 
+// Long operations return a job handle (202) and finish in the background.
+// Long-polls the job until it settles and resolves with its result.
+export const awaitJob = async (handle, onProgress = () => {}) => {
+    let job = handle;
+    while (job.state === 'queued' || job.state === 'running') {
+        onProgress(job);
+        const res = await fetch(`${API_URL}/jobs/${job.id}?wait=10`);
+        job = await res.json();
+    }
+    const res = await fetch(`${API_URL}/jobs/${job.id}/result`);
+    const data = await res.json();
+    if (data.state !== 'done') throw new Error(data.error || 'Job failed');
+    return data.result;
+};
+
+export const runAsync = async (path, options = {}, onProgress) => {
+    const sep = path.includes('?') ? '&' : '?';
+    const res = await fetch(`${API_URL}${path}${sep}async=1`, options);
+    const data = await res.json();
+    if (res.status !== 202) {
+        if (!res.ok) throw new Error(data.error || `Request failed: ${res.status}`);
+        return data; // answered from cache
+    }
+    return awaitJob(data, onProgress);
+};
+
 export const stopRecording = async () => {
-    const res = await fetch(`${API_URL}/stop-recording`, { method: 'POST' });
-    return await res.json();
+    let data;
+    try {
+        data = await runAsync('/stop-recording', { method: 'POST' });
+    } catch (e) {
+        return { error: e.message };
+    }
+    if (!data.recording_id) return data;
+
+    // The backend returns a handle; the events are fetched separately
+    const rec = await fetch(`${API_URL}/recordings/${data.recording_id}`);
+    return { ...data, ...(await rec.json()) };
 };
 
-export const playMacro = async (macro, loop = false, interval = 0) => {
+// trigger: { points: [{ x, y, color, tolerance }], mode, timeout_ms } makes each
+// pass wait on the backend until the colors are on screen
+export const playMacro = async (macro, loop = false, interval = 0, trigger = null) => {
     const res = await fetch(`${API_URL}/play-macro`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ macro, loop, interval })
+        body: JSON.stringify({ macro, loop, interval, trigger })
     });
     return await res.json();
 };
@@ -42,6 +79,64 @@ export const checkColor = async (x, y, color) => {
     return await res.json();
 };
 
+// Many points checked against a single screen capture
+export const probePoints = async (points) => {
+    const res = await fetch(`${API_URL}/probe`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ points })
+    });
+    return await res.json();
+};
+
+export const waitForColor = async (points, { mode = 'all', timeoutMs = 10000 } = {}) => {
+    return runAsync('/probe/wait', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ points, mode, timeout_ms: timeoutMs })
+    });
+};
+
+export const getTemplates = async () => {
+    try {
+        const res = await fetch(`${API_URL}/templates`);
+        return await res.json();
+    } catch (e) {
+        return [];
+    }
+};
+
+export const captureTemplate = async (region, name) => {
+    const res = await fetch(`${API_URL}/templates`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ region, name })
+    });
+    return await res.json();
+};
+
+export const deleteTemplate = async (id) => {
+    const res = await fetch(`${API_URL}/templates/${id}`, { method: 'DELETE' });
+    return await res.json();
+};
+
+export const findTemplate = async (id, { region = null, threshold = 0.9 } = {}) => {
+    const res = await fetch(`${API_URL}/templates/${id}/find`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ region, threshold })
+    });
+    return await res.json();
+};
+
+export const waitForTemplate = async (id, { region = null, threshold = 0.9, present = true, timeoutMs = 10000 } = {}) => {
+    return runAsync(`/templates/${id}/wait`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ region, threshold, present, timeout_ms: timeoutMs })
+    });
+};
+
 export const getCursorInfo = async () => {
     try {
         const res = await fetch(`${API_URL}/get-cursor-info`);
@@ -54,7 +149,8 @@ export const getCursorInfo = async () => {
 export const getWindows = async () => {
     try {
         const res = await fetch(`${API_URL}/windows`);
-        return await res.json();
+        const data = await res.json();
+        return Array.isArray(data) ? data : []; // 501 where window control is unavailable
     } catch (e) {
         return [];
     }
@@ -68,3 +164,27 @@ export const startBackgroundClicker = async (hwnd, interval) => {
     });
     return await res.json();
 };
+
+// Live telemetry over Server-Sent Events. The backend sends a full frame first
+// and then only the changed fields, so we keep the merged state per topic here.
+export const subscribeTelemetry = (topics, onData, onConnection = () => {}) => {
+    const source = new EventSource(`${API_URL}/stream?topics=${topics.join(',')}`);
+    const state = {};
+
+    source.onopen = () => onConnection(true);
+    source.onerror = () => onConnection(false);
+
+    topics.forEach(topic => {
+        source.addEventListener(topic, (event) => {
+            const frame = JSON.parse(event.data);
+            if (frame.type === 'delta' && state[topic]) {
+                state[topic] = { ...state[topic], ...frame.data };
+            } else {
+                state[topic] = frame.data;
+            }
+            onData(topic, state[topic]);
+        });
+    });
+
+    return () => source.close();
+};
@@ -0,0 +1,149 @@
+import os
+import random
+import socket
+import struct
+import sys
+import tempfile
+import threading
+
+import pytest
+
+# Headless backends before the server module is imported
+for name in ('GM_FIREWALL_BACKEND', 'GM_WINDOW_BACKEND', 'GM_INPUT_BACKEND', 'GM_CAPTURE_BACKEND',
+             'GM_TRAFFIC_SOURCE', 'GM_THROTTLE_BACKEND', 'GM_TRIM_BACKEND'):
+    os.environ.setdefault(name, 'fake')
+
+# Keep test runs out of the real per-user data directory
+os.environ.setdefault('GM_DATA_DIR', tempfile.mkdtemp(prefix='gm-test-data-'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import automation_server  # noqa: E402
+import psutil  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    return automation_server
+
+
+class FakeDNSResponder:
+    # Local stand-in resolver. Answers every query with an empty NOERROR
+    # response after `delay` seconds (a number or a callable taking the query
+    # id), and drops a `drop_rate` fraction.
+    def __init__(self, delay=0.0, drop_rate=0.0, host='127.0.0.1', seed=None):
+        self.delay = delay
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, 0))
+        self.sock.settimeout(0.05)
+        self.port = self.sock.getsockname()[1]
+        self.running = False
+        self.queries = 0
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(1)
+
+    def _serve(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.queries += 1
+            if len(data) < 12 or self.random.random() < self.drop_rate:
+                continue
+            query_id = struct.unpack_from('>H', data)[0]
+            delay = self.delay(query_id) if callable(self.delay) else self.delay
+            reply = struct.pack('>HH', query_id, 0x8180) + data[4:]
+            threading.Timer(delay, self._reply, args=(reply, addr)).start()
+        self.sock.close()
+
+    def _reply(self, reply, addr):
+        try:
+            self.sock.sendto(reply, addr)
+        except OSError:
+            pass
+
+
+@pytest.fixture
+def dns_responder():
+    started = []
+
+    def start(**kwargs):
+        responder = FakeDNSResponder(**kwargs).start()
+        started.append(responder)
+        return responder
+
+    yield start
+    for responder in started:
+        responder.stop()
+
+
+class FakeProcess:
+    # Stands in for psutil.Process. Lowering nice is always allowed; raising
+    # it (a lower value) fails unless privileged, as for non-root on Linux.
+    def __init__(self, pid, nice=0, affinity=None, create_time=1.0, privileged=False):
+        self.pid = pid
+        self._nice = nice
+        self._affinity = list(affinity if affinity is not None else range(8))
+        self._create_time = create_time
+        self.privileged = privileged
+        self.status = 'running'
+
+    def nice(self, value=None):
+        if value is None:
+            return self._nice
+        if value < self._nice and not self.privileged:
+            raise psutil.AccessDenied(self.pid)
+        self._nice = value
+
+    def cpu_affinity(self, cores=None):
+        if cores is None:
+            return list(self._affinity)
+        self._affinity = list(cores)
+
+    def create_time(self):
+        return self._create_time
+
+    def suspend(self):
+        self.status = 'stopped'
+
+    def resume(self):
+        self.status = 'running'
+
+    def terminate(self):
+        self.status = 'terminated'
+
+
+class FakeProcessTable(dict):
+    # pid -> FakeProcess; psutil.Process() with no pid is the backend itself
+    def process(self, pid=None):
+        pid = os.getpid() if pid is None else pid
+        if pid not in self:
+            raise psutil.NoSuchProcess(pid)
+        return self[pid]
+
+    def add(self, pid, **kwargs):
+        self[pid] = FakeProcess(pid, **kwargs)
+        return self[pid]
+
+
+@pytest.fixture
+def fake_processes(server, monkeypatch):
+    table = FakeProcessTable()
+    table.add(os.getpid())
+    monkeypatch.setattr(server.psutil, 'Process', table.process)
+    return table
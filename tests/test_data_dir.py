@@ -0,0 +1,31 @@
+import os
+
+
+def test_data_dir_follows_platform_conventions(server, monkeypatch, tmp_path):
+    monkeypatch.delenv('GM_DATA_DIR', raising=False)
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'xdg'))
+    monkeypatch.setenv('APPDATA', str(tmp_path / 'roaming'))
+    expected = tmp_path / ('roaming' if os.name == 'nt' else 'xdg') / 'GameManager'
+    assert server.user_data_dir() == str(expected)
+    monkeypatch.setenv('GM_DATA_DIR', str(tmp_path / 'custom'))
+    assert server.user_data_dir() == str(tmp_path / 'custom')
+
+
+def test_state_paths_live_in_the_data_dir(server):
+    for path in (server.FIREWALL_STATE_PATH, server.DNS_CACHE_PATH, server.GAME_INDEX_PATH, server.CONFIG_PATH,
+                 server.RECORDINGS_DIR, server.TEMPLATES_DIR, server.MACROS_DIR, server.RECLAIM_STATE_PATH):
+        assert os.path.dirname(path) == server.DATA_DIR
+
+
+def test_legacy_data_is_moved_once(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'DATA_DIR', str(tmp_path / 'data'))
+    os.makedirs(server.DATA_DIR)
+    source = tmp_path / 'checkout'
+    (source / 'macros').mkdir(parents=True)
+    (source / 'macros' / 'm1.json').write_text('{}')
+    (source / 'firewall_state.json').write_text('old')
+    (tmp_path / 'data' / 'firewall_state.json').write_text('current')
+    server.migrate_legacy_data(str(source))
+    assert (tmp_path / 'data' / 'macros' / 'm1.json').exists()
+    # Data already in place wins
+    assert (tmp_path / 'data' / 'firewall_state.json').read_text() == 'current'
@@ -0,0 +1,72 @@
+import time
+
+
+def make_manager(server, tmp_path):
+    return server.DNSManager(config_path=str(tmp_path / 'dns_config.json'),
+                             cache_path=str(tmp_path / 'dns_cache.json'))
+
+
+def test_build_dns_query_round_trips_id(server):
+    packet = server.build_dns_query('example.com', 0x1234)
+    assert packet[:2] == b'\x12\x34'
+    assert b'\x07example\x03com\x00' in packet
+
+
+def test_latency_stats(server):
+    stats = server.latency_stats([10.0, 20.0, 30.0, 40.0], 5)
+    assert stats['p50'] == 30.0
+    assert stats['p95'] == 40.0
+    assert stats['jitter'] == 10.0
+    assert stats['loss'] == 0.2
+    assert server.latency_stats([], 3)['loss'] == 1.0
+
+
+def test_benchmark_measures_injected_delay(server, tmp_path, dns_responder):
+    manager = make_manager(server, tmp_path)
+    results = {}
+    for name, delay in (('fast', 0.005), ('slow', 0.05)):
+        responder = dns_responder(delay=delay)
+        results[name] = manager.benchmark(servers={name: '127.0.0.1'}, domains=['a.test', 'b.test'], samples=2,
+                                          timeout=0.5, port=responder.port)[0]
+    assert results['fast']['loss'] == 0 and results['slow']['loss'] == 0
+    assert results['fast']['samples'] == 6
+    assert results['slow']['p50'] >= 45 > results['fast']['p50']
+    assert results['slow']['cold'] is not None and results['slow']['cached'] is not None
+
+
+def test_benchmark_probes_servers_concurrently(server, tmp_path, dns_responder):
+    responder = dns_responder(delay=0.1)
+    manager = make_manager(server, tmp_path)
+    servers = {f'r{i}': '127.0.0.1' for i in range(5)}
+    started = time.perf_counter()
+    results = manager.benchmark(servers=servers, domains=['a.test'], samples=1, timeout=1.0, port=responder.port)
+    elapsed = time.perf_counter() - started
+    assert len(results) == 5
+    # Sequential probing would take 5 servers * 2 rounds * 0.1 s
+    assert elapsed < 0.6
+
+
+def test_benchmark_reports_loss(server, tmp_path, dns_responder):
+    responder = dns_responder(delay=0.001, drop_rate=0.5, seed=3)
+    manager = make_manager(server, tmp_path)
+    result = manager.benchmark(servers={'lossy': '127.0.0.1'}, domains=['a.test', 'b.test'], samples=9,
+                               timeout=0.1, port=responder.port)[0]
+    assert result['samples'] == 20
+    assert 0.2 <= result['loss'] <= 0.8
+
+
+def test_dead_resolver_counts_as_full_loss(server, tmp_path, dns_responder):
+    responder = dns_responder(drop_rate=1.0)
+    manager = make_manager(server, tmp_path)
+    result = manager.benchmark(servers={'dead': '127.0.0.1'}, domains=['a.test'], samples=1, timeout=0.05,
+                               port=responder.port)[0]
+    assert result['loss'] == 1.0
+    assert result['latency'] == 999
+
+
+def test_set_dns_route(server, monkeypatch):
+    commands = []
+    monkeypatch.setattr(server, 'run_command', lambda cmd, **kw: commands.append(cmd))
+    res = server.app.test_client().post('/dns/set', json={'ip': '1.1.1.1'})
+    assert res.status_code == 200
+    assert len(commands) == 2 and all('1.1.1.1' in c for c in commands)
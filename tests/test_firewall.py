@@ -0,0 +1,313 @@
+import json
+import os
+
+import pytest
+
+ROOT = os.path.abspath(os.sep)
+APP = os.path.join(ROOT, 'Apps', 'Updater', 'updater.exe')
+OTHER = os.path.join(ROOT, 'Apps', 'Chat', 'chat.exe')
+GAME = os.path.join(ROOT, 'Games', 'Shooter', 'shooter.exe')
+
+
+@pytest.fixture
+def firewall(server, tmp_path):
+    return server.FirewallManager(backend=server.FakeFirewallBackend(), state_path=str(tmp_path / 'fw.json'))
+
+
+def test_batch_applies_in_one_backend_call(server, firewall):
+    result = firewall.apply_batch(block=[APP, OTHER, APP])
+    assert result['ok'] and result['block'] == [APP, OTHER]
+    assert len(firewall.backend.batches) == 1
+    assert set(firewall.backend.rules.values()) == {APP, OTHER}
+
+    firewall.apply_batch(unblock=[APP, os.path.join(ROOT, 'blocked.exe')])
+    assert len(firewall.backend.batches) == 2
+    assert set(firewall.backend.rules.values()) == {OTHER}
+
+
+def test_dry_run_changes_nothing(firewall):
+    result = firewall.apply_batch(block=[APP], dry_run=True)
+    assert result['commands'] and not firewall.backend.batches
+    assert not firewall.blocked_apps
+
+
+def test_state_is_persisted(server, firewall):
+    firewall.whitelist = {OTHER}
+    firewall.apply_batch(block=[APP, OTHER])
+    reloaded = server.FirewallManager(backend=server.FakeFirewallBackend(), state_path=firewall.state_path)
+    assert reloaded.blocked_apps == {APP}
+    assert reloaded.whitelist == {OTHER}
+
+
+def test_reconcile_restores_missing_and_removes_orphans(server, firewall):
+    firewall.apply_batch(block=[APP, OTHER])
+    old = os.path.join(ROOT, 'Old', 'old.exe')
+    orphan = server.firewall_rule_name(old)
+    del firewall.backend.rules[server.firewall_rule_name(APP)]
+    firewall.backend.rules[orphan] = old
+    result = firewall.reconcile()
+    assert result['missing'] == [APP] and result['orphans'] == [orphan]
+    assert set(firewall.backend.rules.values()) == {APP, OTHER}
+    assert firewall.reconcile()['missing'] == []
+
+
+def test_clear_all_rules_removes_orphans(server, firewall):
+    firewall.apply_batch(block=[APP])
+    firewall.backend.rules[server.firewall_rule_name(OTHER)] = OTHER
+    firewall.clear_all_rules()
+    assert firewall.backend.rules == {} and firewall.blocked_apps == set()
+
+
+class FakeDetector:
+    def __init__(self, games):
+        self.games = games
+
+    def active_games(self):
+        return self.games
+
+
+def consumer(pid, exe, speed):
+    return {'pid': pid, 'exe': exe, 'speed': speed}
+
+
+def make_guard(server, firewall, mode, games=None, source=None):
+    firewall.mode = mode
+    detector = FakeDetector([{'pid': 1, 'exe': GAME}] if games is None else games)
+    return server.BandwidthGuard(firewall, detector, source or server.FakeTrafficSource(), server.FakeThrottler())
+
+
+def test_soft_mode_logs_each_state_once(server, firewall):
+    guard = make_guard(server, firewall, 'soft')
+    heavy = [consumer(10, APP, 4 * 1024 * 1024)]
+    for tick in range(10):
+        guard.evaluate(now=float(tick), consumers=heavy)
+    actions = [d['action'] for d in guard.decisions]
+    assert actions == ['would-block']
+    assert not firewall.backend.batches
+
+
+def test_hard_mode_blocks_and_releases_on_game_exit(server, firewall):
+    guard = make_guard(server, firewall, 'hard')
+    heavy = [consumer(10, APP, 4 * 1024 * 1024)]
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=heavy)
+    assert firewall.blocked_apps == {APP} and firewall.temporary == {APP}
+    guard.detector.games = []
+    guard.evaluate(now=6.0, consumers=[])
+    assert firewall.blocked_apps == set() and firewall.backend.rules == {}
+
+
+def test_hard_mode_throttles_and_releases(server, firewall):
+    guard = make_guard(server, firewall, 'hard')
+    busy = [consumer(10, APP, 512 * 1024)]
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=busy)
+    assert guard.throttler.limits == {APP: server.GUARD_PROFILES['hard']['throttle_limit']}
+    assert not firewall.backend.batches
+    for tick in range(5, 40):
+        guard.evaluate(now=float(tick), consumers=[consumer(10, APP, 1024)])
+    assert guard.throttler.limits == {}
+    assert [d['action'] for d in guard.decisions] == ['throttle', 'release']
+
+
+def test_throttles_are_lifted_on_game_exit(server, firewall):
+    guard = make_guard(server, firewall, 'hard')
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=[consumer(10, APP, 512 * 1024)])
+    guard.detector.games = []
+    guard.evaluate(now=6.0, consumers=[])
+    assert guard.throttler.limits == {}
+    assert guard.decisions[-1]['action'] == 'restore'
+
+
+def test_enforced_throttle_without_backend_is_only_observed(server, firewall):
+    guard = make_guard(server, firewall, 'hard')
+    guard.throttler = None
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=[consumer(10, APP, 512 * 1024)])
+    assert [d['action'] for d in guard.decisions] == ['would-throttle']
+    assert guard.get_status()['actions'] == {APP: 'observed_throttle'}
+
+
+def snapshot_of(server, *procs):
+    return server.ProcessSnapshot(1, 0.0, tuple(
+        server.ProcessInfo(*({'pid': pid, 'exe': exe, 'name': os.path.basename(exe)}.get(attr)
+                             for attr in server.PROCESS_ATTRS)) for pid, exe in procs))
+
+
+def test_traffic_meter_rates_from_counters(server):
+    source = server.FakeTrafficSource({10: 1000, 11: 5000, 99: 0})
+    meter = server.TrafficMeter(source)
+    snapshot = snapshot_of(server, (10, APP), (11, OTHER))
+    assert meter.rates(snapshot, now=0.0) == []
+    source.add(10, 4000)
+    source.add(99, 10 ** 6) # not in the snapshot: exited or never seen
+    rates = meter.rates(snapshot, now=2.0)
+    assert rates == [{'pid': 10, 'exe': APP, 'name': 'updater.exe', 'speed': 2000.0}]
+
+
+def test_pro_mode_blocks_from_measured_traffic(server, firewall, monkeypatch):
+    source = server.FakeTrafficSource({10: 0, 11: 0})
+    guard = make_guard(server, firewall, 'pro', source=source)
+    monkeypatch.setattr(server.process_sampler, 'snapshot', snapshot_of(server, (10, APP), (11, OTHER)))
+    for tick in range(4):
+        source.add(10, 64 * 1024)
+        source.add(11, 1024)
+        guard.evaluate(now=float(tick))
+    assert firewall.blocked_apps == {APP}
+
+
+def test_guard_without_traffic_source_stays_idle(server, firewall, monkeypatch):
+    firewall.mode = 'pro'
+    guard = server.BandwidthGuard(firewall, FakeDetector([{'pid': 1, 'exe': GAME}]))
+    monkeypatch.setattr(server.process_sampler, 'snapshot', snapshot_of(server, (10, APP)))
+    for tick in range(4):
+        guard.evaluate(now=float(tick))
+    assert guard.get_status()['rate_source'] is None
+    assert not guard.decisions and not firewall.backend.batches
+
+
+def test_guard_never_lifts_user_blocks(server, firewall):
+    firewall.apply_batch(block=[OTHER])
+    guard = make_guard(server, firewall, 'hard')
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=[consumer(10, APP, 4 * 1024 * 1024)])
+    # The user blocks the app while the guard holds it
+    firewall.apply_batch(block=[APP])
+    guard.detector.games = []
+    guard.evaluate(now=6.0, consumers=[])
+    assert firewall.blocked_apps == {APP, OTHER}
+    with open(firewall.state_path, encoding='utf-8') as f:
+        assert json.load(f)['temporary'] == []
+
+
+def test_leftover_guard_blocks_are_lifted_after_restart(server, firewall):
+    guard = make_guard(server, firewall, 'hard')
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=[consumer(10, APP, 4 * 1024 * 1024)])
+    # Crash while the game runs: a new process starts from the persisted state
+    reloaded = server.FirewallManager(backend=firewall.backend, state_path=firewall.state_path)
+    assert reloaded.temporary == {APP}
+    restarted = make_guard(server, reloaded, 'hard', games=[])
+    restarted.evaluate(now=0.0, consumers=[])
+    assert reloaded.blocked_apps == set()
+    assert reloaded.reconcile()['missing'] == []
+
+
+def test_system_binaries_are_protected(server, firewall):
+    guard = make_guard(server, firewall, 'pro')
+    system_dir = server.GUARD_PROTECTED_DIRS[0]
+    hogs = [consumer(10, os.path.join(system_dir, 'System32', 'svchost.exe'), 10 ** 7),
+            consumer(11, os.path.join(ROOT, 'Other', 'svchost.exe'), 10 ** 7),
+            consumer(12, os.path.join(system_dir, 'System32', 'wuauclt.exe'), 10 ** 7),
+            consumer(13, os.path.join(os.path.dirname(GAME), 'helper.exe'), 10 ** 7),
+            consumer(14, APP, 10 ** 7)]
+    for tick in range(5):
+        guard.evaluate(now=float(tick), consumers=hogs)
+    assert firewall.blocked_apps == {APP}
+
+
+def test_rule_names_are_unique_per_path(server):
+    a = server.firewall_rule_name(os.path.join(ROOT, 'A', 'app.exe'))
+    b = server.firewall_rule_name(os.path.join(ROOT, 'B', 'app.exe'))
+    assert a != b and a.startswith(server.FIREWALL_RULE_PREFIX + 'app.exe_')
+
+
+def test_rule_names_keep_only_safe_characters(server):
+    rule = server.firewall_rule_name(os.path.join(ROOT, 'Games', 'my "game" v2.exe'))
+    assert rule.startswith(server.FIREWALL_RULE_PREFIX + 'my__game__v2.exe_')
+    assert all(c.isalnum() or c in '_.-' for c in rule)
+
+
+def test_netsh_backend_runs_one_script_per_batch(server, monkeypatch):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        with open(cmd[2], encoding='utf-8') as f:
+            calls.append((cmd[:2], f.read().splitlines()))
+    monkeypatch.setattr(server, 'run_command', fake_run)
+    server.NetshBackend().apply([('GM_Block_a', r'C:\a.exe'), ('GM_Block_b', r'C:\b.exe')], ['GM_Block_old'])
+    assert len(calls) == 1
+    command, lines = calls[0]
+    assert command == ['netsh', '-f']
+    assert lines[0] == 'advfirewall firewall delete rule name="GM_Block_old"'
+    assert lines[1:] == ['advfirewall firewall add rule name="GM_Block_a" dir=out action=block program="C:\\a.exe"',
+                         'advfirewall firewall add rule name="GM_Block_b" dir=out action=block program="C:\\b.exe"']
+
+
+def test_netsh_list_rules_parses_localized_output(server, monkeypatch):
+    output = ('Kural Adı:                             GM_Block_game.exe_1234abcd\n'
+              'Etkin:                                 Evet\n'
+              'Program:                               C:\\Apps\\game.exe\n'
+              '\n'
+              'Kural Adı:                             Other rule\n'
+              'Program:                               C:\\Other\\other.exe\n')
+    monkeypatch.setattr(server, 'run_command', lambda cmd, **kw: type('Result', (), {'stdout': output}))
+    assert server.NetshBackend().list_rules() == {'GM_Block_game.exe_1234abcd': 'C:\\Apps\\game.exe'}
+
+
+SPACED = os.path.join(ROOT, 'Apps', 'My Game', 'my game.exe')
+
+
+class SimpleProc:
+    def __init__(self, pid, exe):
+        self.pid = pid
+        self.exe = exe
+
+
+@pytest.fixture
+def cgroups(server, tmp_path, monkeypatch):
+    # A cgroup tree and /proc stand-in in a temp dir; rmdir of a group works
+    # on cgroupfs even with its interface files present
+    root, proc_root = tmp_path / 'cgroup', tmp_path / 'proc'
+    for pid, cgroup in ((10, '/user.slice/app-a.scope'), (11, '/user.slice/app-b.scope')):
+        (root / cgroup.lstrip('/')).mkdir(parents=True)
+        (proc_root / str(pid)).mkdir(parents=True)
+        (proc_root / str(pid) / 'cgroup').write_text(f'0::{cgroup}\n')
+    scripts = []
+    monkeypatch.setattr(server, 'run_command', lambda cmd, **kw: scripts.append(kw['input']))
+    real_rmdir = os.rmdir
+
+    def rmdir(path):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        real_rmdir(path)
+    monkeypatch.setattr(server.os, 'rmdir', rmdir)
+    backend = server.IptablesCgroupBackend(cgroup_root=str(root), proc_root=str(proc_root))
+    backend.scripts = scripts
+    return backend
+
+
+def test_iptables_script_handles_names_with_spaces(server, cgroups, monkeypatch):
+    rule = server.firewall_rule_name(SPACED)
+    cgroups.apply([(rule, SPACED)], [])
+    line = cgroups.scripts[0].splitlines()[1]
+    # Every argument is a single shell-free token
+    assert line.split() == ['-A', 'OUTPUT', '-m', 'cgroup', '--path', f'gm_block/{rule}',
+                            '-m', 'comment', '--comment', rule, '-j', 'REJECT']
+    assert os.path.isdir(cgroups._group_dir(rule))
+    saved = f'-A OUTPUT -m cgroup --path gm_block/{rule} -m comment --comment "{rule}" -j REJECT\n'
+    monkeypatch.setattr(server, 'run_command', lambda cmd, **kw: type('Result', (), {'stdout': saved}))
+    assert cgroups.list_rules() == {rule: None}
+
+
+def test_unblock_moves_processes_back_and_removes_the_group(server, cgroups, monkeypatch):
+    rule = server.firewall_rule_name(SPACED)
+    cgroups.apply([(rule, SPACED)], [])
+    snapshot = [SimpleProc(10, SPACED), SimpleProc(11, SPACED), SimpleProc(12, OTHER)]
+    cgroups.track(snapshot, [SPACED])
+    assert cgroups.moved[rule] == {10: '/user.slice/app-a.scope', 11: '/user.slice/app-b.scope'}
+    # A second pass doesn't move them again
+    cgroups.track(snapshot, [SPACED])
+
+    moves = []
+    monkeypatch.setattr(cgroups, '_move', lambda pid, path: moves.append((pid, path)) or True)
+    # The kernel lists the members, including a child forked inside the group
+    with open(os.path.join(cgroups._group_dir(rule), 'cgroup.procs'), 'w') as f:
+        f.write('10\n11\n13\n')
+    cgroups.apply([], [rule])
+    root = cgroups.cgroup_root
+    assert moves == [(10, os.path.join(root, 'user.slice', 'app-a.scope')),
+                     (11, os.path.join(root, 'user.slice', 'app-b.scope')),
+                     (13, os.path.join(root, 'user.slice', 'app-a.scope'))]
+    assert not os.path.exists(cgroups._group_dir(rule)) and cgroups.moved == {}
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+LIBRARY_VDF = '''"libraryfolders"
+{
+\t"0"
+\t{
+\t\t"path"\t\t"%s"
+\t\t"apps"
+\t\t{
+\t\t\t"1001"\t\t"123"
+\t\t}
+\t}
+\t"1"
+\t{
+\t\t"path"\t\t"%s"
+\t}
+}
+'''
+
+ACF = '''"AppState"
+{
+\t"appid"\t\t"%s"
+\t"name"\t\t"%s"
+\t"installdir"\t\t"%s"
+\t"StateFlags"\t\t"%s"
+}
+'''
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def vdf_path(path):
+    return path.replace('\\', '\\\\')
+
+
+@pytest.fixture
+def library(tmp_path):
+    steam = str(tmp_path / 'Steam')
+    extra = str(tmp_path / 'SteamLibrary')
+    write(os.path.join(steam, 'steamapps', 'libraryfolders.vdf'), LIBRARY_VDF % (vdf_path(steam), vdf_path(extra)))
+    write(os.path.join(steam, 'steamapps', 'appmanifest_1001.acf'), ACF % ('1001', 'Main Game', 'MainGame', '4'))
+    write(os.path.join(steam, 'steamapps', 'appmanifest_1002.acf'), ACF % ('1002', 'Updating', 'Updating', '1030'))
+    write(os.path.join(steam, 'steamapps', 'appmanifest_1003.acf'), ACF % ('1003', 'Half Done', 'HalfDone', '2'))
+    write(os.path.join(steam, 'steamapps', 'appmanifest_228980.acf'), ACF % ('228980', 'Redist', 'Redist', '4'))
+    write(os.path.join(extra, 'steamapps', 'appmanifest_2001.acf'), ACF % ('2001', 'Other \\"Drive\\" Game', 'Other', '4'))
+    for game in ('MainGame', 'Updating', 'HalfDone', 'Redist'):
+        write(os.path.join(steam, 'steamapps', 'common', game, 'game.exe'), '')
+
+    manifests = str(tmp_path / 'Manifests')
+    epic_game = str(tmp_path / 'Epic Games' / 'Fortress')
+    write(os.path.join(epic_game, 'Binaries', 'Fortress.exe'), '')
+    write(os.path.join(manifests, 'A.item'), json.dumps({
+        'DisplayName': 'Fortress', 'AppName': 'fortress', 'InstallLocation': epic_game,
+        'LaunchExecutable': os.path.join('Binaries', 'Fortress.exe')}))
+    write(os.path.join(manifests, 'B.item'), json.dumps({
+        'DisplayName': 'Partial', 'InstallLocation': str(tmp_path / 'Partial'), 'bIsIncompleteInstall': True}))
+    write(os.path.join(manifests, 'C.item'), '{not json')
+    return {'steam': steam, 'extra': extra, 'manifests': manifests, 'epic_game': epic_game}
+
+
+def test_parse_vdf(server):
+    data = server.parse_vdf('// comment\n"A"\n{\n\t"key"\t"va\\"lue"\n\tbare 12\n\t"sub" { "x" "1" }\n\t"key" "last"\n}\n')
+    assert data == {'A': {'key': 'last', 'bare': '12', 'sub': {'x': '1'}}}
+
+
+def test_parse_vdf_unbalanced_braces(server):
+    assert server.parse_vdf('"A" { "b" "c" } }') == {'A': {'b': 'c'}}
+
+
+def test_steam_libraries_from_libraryfolders(server, library):
+    discovery = server.ManifestDiscovery([library['steam']], [])
+    assert discovery.steam_libraries() == [library['steam'], os.path.normpath(library['extra'])]
+
+
+def test_old_libraryfolders_format(server, library):
+    write(os.path.join(library['steam'], 'steamapps', 'libraryfolders.vdf'),
+          '"LibraryFolders"\n{\n\t"TimeNextStatsReport"\t"1"\n\t"1"\t"%s"\n}\n' % vdf_path(library['extra']))
+    discovery = server.ManifestDiscovery([library['steam']], [])
+    assert discovery.steam_libraries() == [library['steam'], os.path.normpath(library['extra'])]
+
+
+def test_steam_games_skip_incomplete_and_redistributables(server, library):
+    games = server.ManifestDiscovery([library['steam']], []).steam_games()
+    by_id = {g['appid']: g for g in games}
+    assert sorted(by_id) == ['1001', '1002', '2001']
+    assert by_id['1001']['install_dir'] == os.path.join(library['steam'], 'steamapps', 'common', 'MainGame')
+    assert by_id['1001']['launch_uri'] == 'steam://rungameid/1001'
+    assert by_id['2001']['name'] == 'Other "Drive" Game'
+
+
+def test_epic_games(server, library):
+    games = server.ManifestDiscovery([], [library['manifests']]).epic_games()
+    assert [g['name'] for g in games] == ['Fortress']
+    assert games[0]['path'] == os.path.join(library['epic_game'], 'Binaries', 'Fortress.exe')
+
+
+def test_missing_roots_are_ignored(server, tmp_path):
+    discovery = server.ManifestDiscovery([str(tmp_path / 'nope')], [str(tmp_path / 'nope')])
+    assert discovery.steam_games() == [] and discovery.epic_games() == []
+
+
+def test_scanner_includes_manifest_games(server, library, tmp_path):
+    scanner = server.GameLibraryScanner(index_path=str(tmp_path / 'index.json'),
+                                        config_path=str(tmp_path / 'config.json'),
+                                        discovery=server.ManifestDiscovery([library['steam']], [library['manifests']]))
+    scanner.configure(roots=[])
+    manifest = {g['name'] for g in scanner.scan() if g.get('source') == 'manifest'}
+    assert manifest == {'Main Game', 'Updating', 'Fortress'}
+    assert scanner.last_scan['manifest_games'] == 4
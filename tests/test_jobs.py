@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def jobs(server):
+    manager = server.JobManager(workers=1, max_pending=2)
+    manager.add_pool('waits', workers=1, max_pending=1)
+    yield manager
+    manager.shutdown()
+
+
+def gate_job(job, params):
+    # Holds its worker until the test opens the gate or cancels the job
+    while not params['gate'].is_set() and not job.cancelled():
+        time.sleep(0.005)
+    return params.get('value')
+
+
+def test_submit_and_poll(server, jobs):
+    jobs.register('double', lambda job, params: params['n'] * 2)
+    job, created = jobs.submit('double', {'n': 21})
+    assert created and job.done.wait(2)
+    assert job.info(with_result=True)['result'] == 42 and job.state == 'done'
+    assert jobs.get(job.id) is job and jobs.list()[0]['id'] == job.id
+
+
+def test_identical_work_is_deduplicated(server, jobs):
+    gate = threading.Event()
+    jobs.register('gate', gate_job)
+    first, _ = jobs.submit('gate', {'gate': gate, 'value': 1})
+    again, created = jobs.submit('gate', {'gate': gate, 'value': 1})
+    assert again is first and not created
+    gate.set()
+    assert first.done.wait(2)
+
+
+def test_job_that_raises_is_failed(server, jobs):
+    def broken(job, params):
+        raise RuntimeError('disk on fire')
+    jobs.register('broken', broken)
+    job, _ = jobs.submit('broken')
+    assert job.done.wait(2)
+    assert job.state == 'failed' and job.error == 'disk on fire'
+    # The failed job doesn't block a new submission of the same work
+    assert jobs.submit('broken')[0] is not job
+
+
+def test_cancel_queued_and_running_jobs(server, jobs):
+    gate = threading.Event()
+    jobs.register('gate', gate_job)
+    running, _ = jobs.submit('gate', {'gate': gate, 'value': 'a'})
+    queued, _ = jobs.submit('gate', {'gate': gate, 'value': 'b'})
+    while running.state != 'running':
+        time.sleep(0.005)
+    assert jobs.cancel(queued.id).state == 'cancelled'
+    jobs.cancel(running.id)
+    assert running.done.wait(2) and running.state == 'cancelled'
+    assert queued.started is None
+    assert jobs.cancel('missing') is None
+
+
+def test_full_pool_rejects_and_pools_are_separate(server, jobs):
+    gate = threading.Event()
+    jobs.register('gate', gate_job)
+    jobs.register('wait', gate_job, pool='waits')
+    jobs.register('quick', lambda job, params: 'ok')
+    jobs.submit('wait', {'gate': gate, 'value': 1})
+    with pytest.raises(server.JobQueueFull):
+        jobs.submit('wait', {'gate': gate, 'value': 2})
+    # A saturated waits pool doesn't hold up default work
+    quick, _ = jobs.submit('quick')
+    assert quick.done.wait(2) and quick.result == 'ok'
+    jobs.submit('gate', {'gate': gate, 'value': 1})
+    jobs.submit('gate', {'gate': gate, 'value': 2})
+    with pytest.raises(server.JobQueueFull):
+        jobs.submit('gate', {'gate': gate, 'value': 3})
+    gate.set()
+
+
+def test_wait_job_times_out(server):
+    # The fake screen stays black, so the color never shows up
+    job = server.Job('color_wait', None)
+    result = server.color_wait_job(job, {'points': [{'x': 1, 'y': 1, 'color': '#FF0000'}], 'timeout_ms': 50})
+    assert not result['matched'] and 0.04 <= result['elapsed'] < 1
+
+
+def test_job_routes(server):
+    client = server.app.test_client()
+    assert client.post('/jobs', json={'kind': 'nope'}).status_code == 400
+    res = client.post('/jobs', json={'kind': 'color_wait',
+                                     'params': {'points': [{'x': 2, 'y': 2, 'color': '#00FF00'}], 'timeout_ms': 5000}})
+    assert res.status_code == 202
+    job_id = res.get_json()['id']
+    assert client.get(f'/jobs/{job_id}/result').status_code == 202
+    assert client.delete(f'/jobs/{job_id}').status_code == 200
+    info = client.get(f'/jobs/{job_id}?wait=2').get_json()
+    assert info['state'] == 'cancelled' and info['elapsed'] < 2
+    assert client.get(f'/jobs/{job_id}/result').status_code == 500
+    assert client.delete('/jobs/missing').status_code == 404
+
+
+def test_sync_waits_are_bounded(server, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(server, 'sync_wait_slots', slots)
+    client = server.app.test_client()
+    body = {'points': [{'x': 1, 'y': 1, 'color': '#FF0000'}], 'timeout_ms': 10}
+    slots.acquire()
+    assert client.post('/probe/wait', json=body).status_code == 503
+    slots.release()
+    res = client.post('/probe/wait', json=body)
+    assert res.status_code == 200 and res.get_json()['matched'] is False
@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+GAME = os.path.join(os.sep, 'games', 'game.exe')
+
+
+def snap(server, version, *procs):
+    # procs: (pid, create_time, exe)
+    infos = [server.ProcessInfo(pid, 1, os.path.basename(exe or ''), exe, None, None, create_time)
+             for pid, create_time, exe in procs]
+    return server.ProcessSnapshot(version, float(version), infos)
+
+
+@pytest.fixture
+def detector(server):
+    calls = []
+    det = server.GameLaunchDetector(action_handler=lambda act, game_pid=None: calls.append((act['type'], game_pid)))
+    det.set_config([{'exe_path': GAME, 'actions': [{'type': 'kill_process'}, {'type': 'clean_ram'}]}])
+    det.calls = calls
+    return det
+
+
+def test_launch_runs_actions_once_per_process(server, detector):
+    assert detector.process(snap(server, 1, (10, 1.0, GAME), (11, 1.0, None))) == [10]
+    assert detector.calls == [('kill_process', 10), ('clean_ram', 10)]
+    # Still running on the next tick: nothing fires again
+    assert detector.process(snap(server, 2, (10, 1.0, GAME))) == []
+    assert len(detector.calls) == 2
+    assert detector.active_games() == [{'pid': 10, 'exe': GAME}]
+
+
+def test_exit_clears_active_game(server, detector):
+    detector.process(snap(server, 1, (10, 1.0, GAME)))
+    detector.process(snap(server, 2, (11, 1.0, os.path.join(os.sep, 'bin', 'other'))))
+    assert detector.active_games() == []
+    stats = detector.get_stats()
+    assert stats['launches'] == 1 and stats['active_games'] == 0 and stats['ticks'] == 2
+
+
+def test_reused_pid_fires_again(server, detector):
+    detector.process(snap(server, 1, (10, 1.0, GAME)))
+    # Same PID, new process instance
+    assert detector.process(snap(server, 2, (10, 2.0, GAME))) == [10]
+    assert detector.calls.count(('kill_process', 10)) == 2
+
+
+def test_path_match_ignores_case_where_the_os_does(server, detector):
+    launched = detector.process(snap(server, 1, (10, 1.0, os.path.normcase(GAME))))
+    assert launched == [10]
+
+
+def test_reload_only_when_config_changes(server, detector, tmp_path, monkeypatch):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps([]), encoding='utf-8')
+    monkeypatch.setattr(server, 'CONFIG_PATH', str(path))
+    detector.config_path = str(path)
+    assert detector.reload_if_changed() is True
+    assert detector.reload_if_changed() is False
+    assert detector.process(snap(server, 1, (10, 1.0, GAME))) == []
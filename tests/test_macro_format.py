@@ -0,0 +1,43 @@
+import pytest
+
+
+def sample(server):
+    macro = server.CompactMacro()
+    macro.append(server.CompactMacro.EV_MOVE, 10, 20, None, 0.0)
+    macro.append(server.CompactMacro.EV_MOUSE_DOWN, 10, 20, 'Button.left', 0.05)
+    macro.append(server.CompactMacro.EV_KEY_DOWN, 0, 0, "'é'", 0.1)
+    return macro
+
+
+def test_round_trip(server):
+    macro = sample(server)
+    loaded = server.CompactMacro.from_bytes(macro.to_bytes())
+    assert list(loaded.events()) == list(macro.events())
+    assert server.CompactMacro.from_json(macro.to_json()).to_bytes() == macro.to_bytes()
+
+
+def test_every_truncation_is_a_value_error(server):
+    data = sample(server).to_bytes()
+    for n in range(len(data)):
+        with pytest.raises(ValueError):
+            server.CompactMacro.from_bytes(data[:n])
+
+
+def test_bad_magic_and_string_table(server):
+    data = bytearray(sample(server).to_bytes())
+    with pytest.raises(ValueError):
+        server.CompactMacro.from_bytes(b'XXXX' + bytes(data[4:]))
+    # Declared blob length no longer matches the string lengths
+    header = server.CompactMacro.HEADER
+    fields = list(header.unpack_from(data))
+    fields[-1] -= 1
+    header.pack_into(data, 0, *fields)
+    with pytest.raises(ValueError):
+        server.CompactMacro.from_bytes(bytes(data))
+
+
+def test_play_macro_rejects_truncated_payload(server, monkeypatch):
+    monkeypatch.setattr(server, 'playing', False)
+    data = sample(server).to_bytes()[:-3]
+    res = server.app.test_client().post('/play-macro', data=data, content_type='application/octet-stream')
+    assert res.status_code == 400
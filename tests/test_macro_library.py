@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+
+def sample(server):
+    macro = server.CompactMacro()
+    macro.append(server.CompactMacro.EV_MOVE, 10, 20, None, 0.0)
+    macro.append(server.CompactMacro.EV_MOVE, 30, 40, None, 0.1)
+    macro.append(server.CompactMacro.EV_MOUSE_DOWN, 30, 40, 'Button.left', 0.2)
+    return macro
+
+
+@pytest.fixture
+def library(server, tmp_path):
+    return server.MacroLibrary(directory=str(tmp_path), cache_size=2)
+
+
+def test_add_get_and_load_round_trip(server, library):
+    macro = sample(server)
+    meta = library.add(macro, 'aim', tags=['fps'])
+    assert library.get(meta['id'])['events'] == 3
+    assert list(library.load(meta['id']).events()) == list(macro.events())
+    assert os.path.exists(os.path.join(library.directory, meta['id'] + '.gmm'))
+
+
+def test_list_filters_by_tag_newest_first(server, library):
+    first = library.add(sample(server), 'one', tags=['fps'])
+    second = library.add(sample(server), 'two', tags=['fps', 'mmo'])
+    library.add(sample(server), 'three')
+    # Pin timestamps so the order doesn't depend on clock resolution
+    first['created'], second['created'] = 1.0, 2.0
+    assert [e['id'] for e in library.list('fps')] == [second['id'], first['id']]
+    assert len(library.list()) == 3
+
+
+def test_index_persists_across_instances(server, library):
+    meta = library.add(sample(server), 'aim')
+    reopened = server.MacroLibrary(directory=library.directory)
+    assert reopened.get(meta['id'])['name'] == 'aim'
+
+
+def test_unreadable_index_starts_empty(server, tmp_path):
+    (tmp_path / 'index.json').write_text('{not json', encoding='utf-8')
+    assert server.MacroLibrary(directory=str(tmp_path)).list() == []
+
+
+def test_compiled_cache_reuses_and_evicts(server, library):
+    ids = [library.add(sample(server), name)['id'] for name in ('a', 'b', 'c')]
+    compiled = library.compiled_macro(ids[0])
+    assert library.compiled_macro(ids[0]) is compiled
+    library.compiled_macro(ids[1])
+    library.compiled_macro(ids[2])
+    # cache_size=2: the least recently used entry is dropped
+    assert list(library.compiled) == [(ids[1], None), (ids[2], None)]
+
+
+def test_delete_removes_body_index_and_cache(server, library):
+    meta = library.add(sample(server), 'aim')
+    library.compiled_macro(meta['id'])
+    library.delete(meta['id'])
+    assert library.list() == [] and not library.compiled
+    assert not os.path.exists(os.path.join(library.directory, meta['id'] + '.gmm'))
+    with pytest.raises(KeyError):
+        library.get(meta['id'])
+    with pytest.raises(KeyError):
+        library.delete(meta['id'])
+
+
+def test_ids_that_are_not_alphanumeric_are_rejected(server, library):
+    with pytest.raises(KeyError):
+        library.load(os.path.join('..', 'index'))
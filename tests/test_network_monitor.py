@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+IOCounters = namedtuple('IOCounters', 'read_bytes write_bytes')
+
+
+def snap(server, version, timestamp, *procs):
+    # procs: (pid, create_time, total_bytes)
+    infos = [server.ProcessInfo(pid, 1, f'p{pid}.exe', f'/bin/p{pid}.exe',
+                                IOCounters(total, 0), None, create_time)
+             for pid, create_time, total in procs]
+    return server.ProcessSnapshot(version, timestamp, infos)
+
+
+def test_rates_use_elapsed_time(server):
+    monitor = server.NetworkMonitor()
+    monitor._update(snap(server, 1, 10.0, (5, 1.0, 1000)))
+    monitor._update(snap(server, 2, 12.0, (5, 1.0, 5000)))
+    assert monitor.processes[5]['speed'] == 2000
+    history = monitor.get_history(5, window=60, points=60)
+    assert history['series'] == [[0.0, 2000.0]]
+
+
+def test_counter_reset_never_reports_negative_speed(server):
+    monitor = server.NetworkMonitor()
+    monitor._update(snap(server, 1, 10.0, (5, 1.0, 5000)))
+    monitor._update(snap(server, 2, 11.0, (5, 1.0, 100)))
+    assert monitor.processes[5]['speed'] == 0
+
+
+def test_reused_pid_replaces_stale_entry_at_capacity(server):
+    monitor = server.NetworkMonitor(max_tracked=2)
+    monitor._update(snap(server, 1, 10.0, (5, 1.0, 1000), (6, 1.0, 0)))
+    monitor._update(snap(server, 2, 11.0, (5, 1.0, 3000), (6, 1.0, 0)))
+    # PID 5 exits and is reused by a new process between ticks
+    monitor._update(snap(server, 3, 12.0, (5, 2.0, 50), (6, 1.0, 0)))
+    entry = monitor.processes[5]
+    assert entry['create_time'] == 2.0
+    assert entry['speed'] == 0 and entry['history'].count == 0
+    monitor._update(snap(server, 4, 13.0, (5, 2.0, 150), (6, 1.0, 0)))
+    assert monitor.processes[5]['speed'] == 100
+
+
+def test_exited_processes_free_capacity_in_the_same_tick(server):
+    monitor = server.NetworkMonitor(max_tracked=2)
+    monitor._update(snap(server, 1, 10.0, (5, 1.0, 0), (6, 1.0, 0)))
+    monitor._update(snap(server, 2, 11.0, (6, 1.0, 0), (7, 1.0, 0)))
+    assert sorted(monitor.processes) == [6, 7]
+    # At capacity, brand new PIDs wait for a free slot
+    monitor._update(snap(server, 3, 12.0, (6, 1.0, 0), (7, 1.0, 0), (8, 1.0, 0)))
+    assert sorted(monitor.processes) == [6, 7]
+
+
+def test_top_consumers_orders_by_speed(server):
+    monitor = server.NetworkMonitor()
+    monitor._update(snap(server, 1, 10.0, (5, 1.0, 0), (6, 1.0, 0), (7, 1.0, 0)))
+    monitor._update(snap(server, 2, 11.0, (5, 1.0, 10), (6, 1.0, 300), (7, 1.0, 20)))
+    assert [e['pid'] for e in monitor.get_top_consumers(2)] == [6, 7]
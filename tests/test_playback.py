@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+
+def test_wait_until_hits_deadline(server):
+    scheduler = server.PlaybackScheduler()
+    deadline = time.perf_counter_ns() + 20000000
+    now = scheduler.wait_until(deadline)
+    assert now >= deadline
+    assert now - deadline < 5000000
+
+
+def test_wait_until_returns_when_stopped(server):
+    scheduler = server.PlaybackScheduler()
+    stop_at = time.monotonic() + 0.05
+    started = time.perf_counter()
+    scheduler.wait_until(time.perf_counter_ns() + 3000000000, lambda: time.monotonic() < stop_at)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_stopping_playback_mid_gap_ends_thread(server):
+    macro = server.CompactMacro()
+    macro.append(server.CompactMacro.EV_MOVE, 1, 1, None, 0.0)
+    macro.append(server.CompactMacro.EV_MOVE, 2, 2, None, 3.0)
+    backend = server.RecordingInput()
+    server.playing = True
+    thread = threading.Thread(target=server.play_macro_thread, args=(macro,),
+                              kwargs={'backend': backend, 'scheduler': server.PlaybackScheduler()})
+    thread.start()
+    time.sleep(0.1)
+    server.playing = False
+    thread.join(0.5)
+    assert not thread.is_alive()
+    assert len(backend.calls) == 1
+
+
+@pytest.fixture
+def client(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'playing', False)
+    monkeypatch.setattr(server, 'macro_library', server.MacroLibrary(str(tmp_path / 'macros')))
+    monkeypatch.setattr(server, 'input_backend', server.RecordingInput())
+    yield server.app.test_client()
+    server.playing = False
+
+
+def short_macro(server):
+    macro = server.CompactMacro()
+    macro.append(server.CompactMacro.EV_MOVE, 1, 1, None, 0.0)
+    macro.append(server.CompactMacro.EV_MOVE, 9, 9, None, 0.01)
+    return macro
+
+
+@pytest.mark.parametrize('hz', ['fast', [60], -5, 1e9])
+def test_invalid_interpolate_hz_is_rejected(server, client, hz):
+    res = client.post('/play-macro', json={'macro': short_macro(server).to_json(), 'interpolate_hz': hz})
+    assert res.status_code == 400
+    assert server.playing is False
+
+    macro_id = server.macro_library.add(short_macro(server), 'm')['id']
+    res = client.post(f'/macros/{macro_id}/play', json={'interpolate_hz': hz})
+    assert res.status_code == 400
+    assert server.playing is False
+
+
+def test_interpolate_hz_accepts_numeric_strings(server, client):
+    res = client.post('/play-macro', json={'macro': short_macro(server).to_json(), 'interpolate_hz': '120'})
+    assert res.status_code == 200
+
+
+def test_late_options_apply_to_one_playback_only(server, client, monkeypatch):
+    started = []
+    monkeypatch.setattr(server, 'play_macro_thread', lambda *a, **kw: started.append(kw['late']))
+    res = client.post('/play-macro', json={'macro': short_macro(server).to_json(),
+                                           'late_policy': 'drop', 'late_threshold_ms': 1})
+    assert res.status_code == 200
+    assert started == [server.LateOptions('drop', 1000000)]
+    assert server.playback_scheduler.late_options() == server.LateOptions('coalesce', 4000000)
+
+    server.playing = False
+    macro_id = server.macro_library.add(short_macro(server), 'm')['id']
+    client.post(f'/macros/{macro_id}/play', json={})
+    assert started[-1] == server.LateOptions('coalesce', 4000000)
+
+
+def test_unknown_late_policy_is_rejected(server, client):
+    res = client.post('/play-macro', json={'macro': short_macro(server).to_json(), 'late_policy': 'rewind'})
+    assert res.status_code == 400 and server.playing is False
+
+
+def test_late_moves_follow_the_playback_policy(server):
+    scheduler = server.PlaybackScheduler()
+    late_ns = 10000000
+    drop = server.LateOptions('drop', 1000000)
+    assert scheduler.should_skip_move(0, late_ns, None, drop)
+    # coalesce keeps a late move unless a newer move is already due
+    assert not scheduler.should_skip_move(0, late_ns, None)
+    assert not scheduler.should_skip_move(0, late_ns, late_ns + 1)
+    assert scheduler.should_skip_move(0, late_ns, late_ns - 1)
+    assert not scheduler.should_skip_move(0, late_ns, None, server.LateOptions('play', 0))
+    scheduler.reset(drop)
+    assert scheduler.stats()['late_policy'] == 'drop' and scheduler.stats()['skipped'] == 0
+
+
+def test_stats_are_empty_before_any_event(server):
+    stats = server.PlaybackScheduler().stats()
+    assert stats['events'] == 0 and stats['skipped'] == 0
+    assert stats['p50_us'] is None and stats['p99_us'] is None and stats['max_us'] is None
+
+
+def test_stats_report_error_percentiles_in_microseconds(server):
+    scheduler = server.PlaybackScheduler()
+    for i in range(100):
+        scheduler.record(0, (i + 1) * 1000)
+    stats = scheduler.stats()
+    assert stats['events'] == 100
+    assert stats['p50_us'] == 51 and stats['p99_us'] == 100 and stats['max_us'] == 100
+
+
+def test_error_samples_wrap_at_max_samples(server):
+    scheduler = server.PlaybackScheduler(max_samples=4)
+    for error in (9000000, 1000, 2000, 3000, 4000):
+        scheduler.record(0, error)
+    stats = scheduler.stats()
+    # The oldest sample was overwritten, but the maximum is kept
+    assert stats['events'] == 5 and stats['p99_us'] == 4 and stats['max_us'] == 9000
+
+
+def test_skipped_moves_are_counted_until_reset(server):
+    scheduler = server.PlaybackScheduler()
+    drop = scheduler.late_options('drop', 1)
+    assert drop.threshold_ns == 1000000
+    for _ in range(3):
+        scheduler.should_skip_move(0, 5000000, None, drop)
+    scheduler.should_skip_move(0, 500000, None, drop)
+    assert scheduler.stats()['skipped'] == 3
+    scheduler.reset()
+    assert scheduler.stats()['skipped'] == 0 and scheduler.stats()['events'] == 0
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+
+
+@pytest.fixture
+def capture(server, monkeypatch):
+    capture = server.FakeCapture(200, 100)
+    capture.fill(10, 10, 5, 5, RED)
+    monkeypatch.setattr(server, 'capture_source', capture)
+    return capture
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def numpy_mode(request, server, monkeypatch):
+    # Both the vectorized and the pure-Python comparison
+    if request.param == 'python':
+        def unavailable(name):
+            raise server.FeatureUnavailable(name, 'disabled in this test')
+        monkeypatch.setattr(server.platform_features, 'load', unavailable)
+    else:
+        pytest.importorskip('numpy')
+    return request.param
+
+
+def test_parse_probe_points(server):
+    points = server.parse_probe_points([{'x': 1, 'y': 2, 'color': '#ff0000', 'tolerance': 4}, {'x': 3, 'y': 4}])
+    assert points == [(1, 2, RED, 4), (3, 4, None, 0)]
+    with pytest.raises(ValueError):
+        server.parse_probe_points([])
+
+
+def test_probe_points_uses_one_capture(server, capture, numpy_mode):
+    points = server.parse_probe_points([
+        {'x': 12, 'y': 12, 'color': '#ff0000'},
+        {'x': 50, 'y': 50, 'color': [0, 0, 0]},
+        {'x': 51, 'y': 52, 'color': '#100000', 'tolerance': 16},
+        {'x': 11, 'y': 11, 'color': '#00ff00'},
+    ])
+    result = server.probe_points(points)
+    assert [p['match'] for p in result] == [True, True, True, False]
+    assert capture.grabs == 1
+
+
+def test_color_watcher_waits_for_color(server, capture):
+    def painter(cap, n):
+        if n == 5:
+            cap.fill(100, 50, 3, 3, GREEN)
+    capture.painter = painter
+    watcher = server.ColorWatcher(capture=capture, max_hz=100)
+    result = watcher.wait(server.parse_probe_points([{'x': 101, 'y': 51, 'color': '#00ff00'}]), timeout=2)
+    assert result['matched'] and result['ticks'] >= 5
+
+
+def test_color_watcher_times_out(server, capture):
+    watcher = server.ColorWatcher(capture=capture, max_hz=100)
+    started = time.monotonic()
+    result = watcher.wait(server.parse_probe_points([{'x': 101, 'y': 51, 'color': '#0000ff'}]), timeout=0.2)
+    assert not result['matched']
+    assert time.monotonic() - started < 1
+
+
+def test_trigger_timeout_ends_playback(server, capture, monkeypatch):
+    monkeypatch.setattr(server, 'color_watcher', server.ColorWatcher(capture=capture, max_hz=100))
+    macro = server.CompactMacro()
+    macro.append(server.CompactMacro.EV_MOVE, 1, 1, None, 0.0)
+    backend = server.RecordingInput()
+    trigger = server.parse_trigger({'points': [{'x': 101, 'y': 51, 'color': '#0000ff'}], 'timeout_ms': 100})
+    server.playing = True
+    server.play_macro_thread(macro, backend=backend, trigger=trigger, scheduler=server.PlaybackScheduler())
+    assert server.playback_end == 'trigger_timeout'
+    assert backend.calls == []
+    assert server.status_payload()['playback_end'] == 'trigger_timeout'
+
+
+def test_waits_do_not_starve_other_jobs(server):
+    manager = server.JobManager(workers=1)
+    manager.add_pool('waits', workers=1, max_pending=2)
+    release = threading.Event()
+    manager.register('slow_wait', lambda job, params: release.wait(5), pool='waits')
+    manager.register('quick', lambda job, params: 'ok')
+    manager.submit('slow_wait', {'n': 1})
+    manager.submit('slow_wait', {'n': 2})
+    with pytest.raises(server.JobQueueFull):
+        manager.submit('slow_wait', {'n': 3})
+    job, _ = manager.submit('quick')
+    assert job.done.wait(1) and job.result == 'ok'
+    release.set()
+    manager.shutdown()
+
+
+def test_sync_waits_are_capped(server, capture, monkeypatch):
+    monkeypatch.setattr(server, 'sync_wait_slots', threading.BoundedSemaphore(1))
+    server.sync_wait_slots.acquire()
+    res = server.app.test_client().post('/probe/wait', json={'points': [{'x': 12, 'y': 12, 'color': '#ff0000'}]})
+    assert res.status_code == 503
+    server.sync_wait_slots.release()
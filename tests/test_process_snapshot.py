@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+
+def rows():
+    return [{'pid': 1, 'ppid': 0, 'name': 'init'},
+            {'pid': 42, 'ppid': 1, 'name': 'game.exe', 'exe': '/games/game.exe'}]
+
+
+@pytest.fixture
+def sampler(server):
+    return server.ProcessSampler(provider=server.FakeProcessProvider(rows()))
+
+
+def test_snapshot_is_immutable(server, sampler):
+    snapshot = sampler.refresh()
+    assert len(snapshot) == 2 and snapshot.version == 1
+    assert snapshot.get(42).name == 'game.exe'
+    assert snapshot.get(7) is None
+    with pytest.raises(AttributeError):
+        snapshot.version = 5
+    with pytest.raises(TypeError):
+        snapshot.by_pid[7] = None
+
+
+def test_missing_attributes_default_to_none(server, sampler):
+    assert sampler.refresh().get(1).exe is None
+
+
+def test_versions_increase_and_subscribers_share_one_snapshot(server, sampler):
+    seen = []
+    sampler.subscribe(seen.append)
+    sampler.subscribe(seen.append)
+    first = sampler.refresh()
+    sampler.provider.set_processes(rows()[:1])
+    second = sampler.refresh()
+    assert (first.version, second.version) == (1, 2)
+    assert seen == [first, first, second, second]
+    assert len(sampler.latest()) == 1
+
+
+def test_subscriber_errors_are_isolated(server, sampler):
+    seen = []
+    sampler.subscribe(lambda snapshot: 1 / 0)
+    sampler.subscribe(seen.append)
+    sampler.refresh()
+    assert len(seen) == 1
+
+
+def test_wait_for_next(server, sampler):
+    assert sampler.wait_for_next(timeout=0.01) is None
+    timer = threading.Timer(0.05, sampler.refresh)
+    timer.start()
+    snapshot = sampler.wait_for_next(0, timeout=1)
+    assert snapshot is not None and snapshot.version == 1
+    timer.join()
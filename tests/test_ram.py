@@ -0,0 +1,149 @@
+from collections import namedtuple
+
+import pytest
+
+MemoryInfo = namedtuple('MemoryInfo', 'rss vms')
+VirtualMemory = namedtuple('VirtualMemory', 'total available')
+MB = 1024 * 1024
+
+
+def proc(server, pid, ppid, name, rss_mb):
+    return server.ProcessInfo(pid, ppid, name, 'x', None, MemoryInfo(rss_mb * MB, 0), float(pid))
+
+
+@pytest.fixture
+def planner(server, monkeypatch, tmp_path):
+    planner = server.RamReclaimPlanner(settle=0, trimmer=server.FakeTrimmer(), state_path=str(tmp_path / 'ram.json'))
+    sizes = {}
+    monkeypatch.setattr(planner, '_private_bytes', lambda pid: sizes.get(pid))
+    planner.sizes = sizes
+    return planner
+
+
+def snapshot(server, planner):
+    rows = [proc(server, 1, 0, 'explorer.exe', 100),
+            proc(server, 10, 1, 'chrome.exe', 300), proc(server, 11, 10, 'chrome.exe', 300),
+            proc(server, 20, 1, 'discord.exe', 200),
+            proc(server, 30, 1, 'spotify.exe', 100)]
+    planner.sizes.update({10: 400 * MB, 11: 200 * MB, 20: 150 * MB, 30: 50 * MB})
+    return rows
+
+
+def test_units_group_process_trees(server, planner):
+    units = planner.units(snapshot(server, planner))
+    assert [(u['name'], u['pids'], u['bytes']) for u in units] == [
+        ('chrome.exe', [10, 11], 600 * MB), ('discord.exe', [20], 150 * MB), ('spotify.exe', [30], 50 * MB)]
+
+
+def test_plan_uses_fewest_units_and_gentlest_action(server, planner):
+    def freeing(plan):
+        return [(a['name'], a['action']) for a in plan['actions'] if a['action'] != 'lower_priority']
+
+    plan = planner.plan(250 * MB, snapshot(server, planner))
+    assert freeing(plan) == [('chrome.exe', 'suspend')]
+    assert plan['reachable']
+
+    plan = planner.plan(700 * MB, snapshot(server, planner))
+    assert freeing(plan) == [('chrome.exe', 'terminate'), ('discord.exe', 'suspend')]
+    plan = planner.plan(740 * MB, snapshot(server, planner))
+    assert freeing(plan) == [('chrome.exe', 'terminate'), ('discord.exe', 'terminate')]
+
+
+def test_unchosen_units_only_get_a_lower_priority(server, planner):
+    plan = planner.plan(10 * MB, snapshot(server, planner), allow_terminate=False)
+    assert [a['action'] for a in plan['actions']] == ['suspend', 'lower_priority', 'lower_priority']
+    assert planner.plan(0, snapshot(server, planner))['actions'] == []
+
+
+def test_suspend_is_not_offered_without_a_trim(server, planner):
+    planner.trimmer = None
+    plan = planner.plan(250 * MB, snapshot(server, planner))
+    assert [a['action'] for a in plan['actions']][0] == 'terminate'
+    plan = planner.plan(250 * MB, snapshot(server, planner), allow_terminate=False)
+    assert {a['action'] for a in plan['actions']} == {'lower_priority'} and not plan['reachable']
+
+
+def test_default_target_is_the_shortfall(server, planner, monkeypatch):
+    monkeypatch.setattr(server.psutil, 'virtual_memory', lambda: VirtualMemory(16000 * MB, 12000 * MB))
+    assert planner.default_target() == 0
+    monkeypatch.setattr(server.psutil, 'virtual_memory', lambda: VirtualMemory(16000 * MB, 1000 * MB))
+    assert planner.default_target() == 2200 * MB
+
+
+def test_no_shortfall_touches_nothing(server, planner, monkeypatch):
+    rows = snapshot(server, planner)
+    monkeypatch.setattr(server.process_sampler, 'latest', lambda: rows)
+    monkeypatch.setattr(server.psutil, 'virtual_memory', lambda: VirtualMemory(16000 * MB, 12000 * MB))
+    monkeypatch.setattr(planner, '_act', lambda *a: pytest.fail('acted without a shortfall'))
+    report = planner.reclaim()
+    assert report['status'] == 'nothing_needed' and report['actions'] == []
+
+
+def reclaim_all(server, planner, fake_processes, monkeypatch, **kwargs):
+    rows = snapshot(server, planner)
+    for row in rows:
+        fake_processes.add(row.pid, create_time=row.create_time)
+    monkeypatch.setattr(server.process_sampler, 'latest', lambda: rows)
+    monkeypatch.setattr(server.psutil, 'virtual_memory', lambda: VirtualMemory(16000 * MB, 1000 * MB))
+    return planner.reclaim(250 * MB, allow_terminate=False, **kwargs)
+
+
+def test_suspend_trims_and_restore_undoes_everything(server, planner, fake_processes, monkeypatch):
+    report = reclaim_all(server, planner, fake_processes, monkeypatch)
+    assert report['status'] == 'done'
+    assert sorted(planner.trimmer.trimmed) == [10, 11]
+    assert fake_processes[10].status == 'stopped' and fake_processes[11].status == 'stopped'
+    assert fake_processes[20].nice() == server.PRIORITY_LEVELS['below_normal']
+    assert fake_processes[1].nice() == 0 # not a target
+
+    # Raising a priority back needs rights on Linux
+    for pid in (20, 30):
+        fake_processes[pid].privileged = True
+    assert planner.restore_all('test') == {'resumed': 2, 'restored': 2}
+    assert fake_processes[10].status == 'running'
+    assert fake_processes[20].nice() == server.PRIORITY_LEVELS['normal']
+    assert planner.get_status()['suspended'] == 0
+
+
+def test_held_changes_survive_a_restart(server, planner, fake_processes, monkeypatch):
+    reclaim_all(server, planner, fake_processes, monkeypatch)
+    reloaded = server.RamReclaimPlanner(trimmer=server.FakeTrimmer(), state_path=planner.state_path)
+    assert set(reloaded.suspended) == {10, 11} and set(reloaded.lowered) == {20, 30}
+    # A reused PID is not resumed
+    fake_processes.add(11, create_time=99.0).status = 'stopped'
+    assert reloaded.restore_all('restart')['resumed'] == 1
+    assert fake_processes[10].status == 'running' and fake_processes[11].status == 'stopped'
+    assert server.RamReclaimPlanner(state_path=planner.state_path).suspended == {}
+
+
+def test_changes_for_a_game_are_undone_when_it_exits(server, planner, fake_processes, monkeypatch):
+    reclaim_all(server, planner, fake_processes, monkeypatch, game_pid=500)
+    planner.on_games([{'pid': 500, 'exe': 'game.exe'}])
+    assert fake_processes[10].status == 'stopped'
+    planner.on_games([])
+    assert fake_processes[10].status == 'running'
+    assert planner.game_pids == set()
+
+
+def test_reclaim_reports_when_there_is_nothing_to_do(server, planner, monkeypatch):
+    monkeypatch.setattr(server.process_sampler, 'latest', lambda: [proc(server, 1, 0, 'explorer.exe', 100)])
+    report = planner.reclaim(100 * MB)
+    assert report['status'] == 'no_candidates' and report['reclaimed_bytes'] == 0
+    assert planner.reclaim(0)['status'] == 'nothing_needed'
+
+
+def test_dry_run_touches_nothing(server, planner, monkeypatch):
+    rows = snapshot(server, planner)
+    monkeypatch.setattr(server.process_sampler, 'latest', lambda: rows)
+    monkeypatch.setattr(planner, '_act', lambda *a: pytest.fail('acted during a dry run'))
+    report = planner.reclaim(250 * MB, dry_run=True)
+    assert report['status'] == 'planned' and report['actions']
+
+
+def test_clean_ram_route_runs_as_a_job(server, monkeypatch):
+    monkeypatch.setattr(server, 'clean_ram_logic', lambda *a: {'status': 'nothing_needed', 'actions': []})
+    client = server.app.test_client()
+    res = client.post('/boost/clean-ram', json={'target_bytes': 1})
+    assert res.status_code == 202
+    job = server.job_manager.get(res.get_json()['id'])
+    assert job.done.wait(5) and job.result['status'] == 'nothing_needed'
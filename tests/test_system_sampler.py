@@ -0,0 +1,112 @@
+from collections import namedtuple
+
+import pytest
+
+VirtualMemory = namedtuple('VirtualMemory', 'total available percent')
+SwapMemory = namedtuple('SwapMemory', 'percent')
+DiskIO = namedtuple('DiskIO', 'read_bytes write_bytes')
+NetIO = namedtuple('NetIO', 'bytes_sent bytes_recv')
+
+ROLLUPS = ((1, 10), (5, 4), (20, 3))
+
+
+class FakeSystem:
+    # psutil readings and the sampler's clock, both set by the test
+    def __init__(self):
+        self.now = 0.0
+        self.cpu = [0.0, 0.0]
+        self.disk_read = 0
+
+    def counters(self):
+        return self.now, (self.disk_read, 0), (0, 0)
+
+
+@pytest.fixture
+def system(server, monkeypatch):
+    fake = FakeSystem()
+    monkeypatch.setattr(server.psutil, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(server.psutil, 'cpu_percent', lambda interval=None, percpu=False: list(fake.cpu))
+    monkeypatch.setattr(server.psutil, 'virtual_memory', lambda: VirtualMemory(1000, 400, 60.0))
+    monkeypatch.setattr(server.psutil, 'swap_memory', lambda: SwapMemory(0.0))
+    return fake
+
+
+@pytest.fixture
+def sampler(server, system):
+    sampler = server.SystemSampler(rollups=ROLLUPS)
+    sampler._counters = system.counters
+    return sampler
+
+
+def feed(system, sampler, seconds, step=1.0):
+    # One sample per step with cpu_percent equal to the clock
+    for t in seconds:
+        system.now = t * step
+        system.cpu = [t * step] * 2
+        sampler.sample()
+
+
+def cpu(result):
+    return result['series']['cpu_percent']
+
+
+def test_raw_window_includes_its_start(sampler, system):
+    feed(system, sampler, range(12))
+    result = sampler.query(window=5, resolution=1)
+    assert result['resolution'] == 1
+    assert cpu(result) == [[t - 11.0, t, t, t] for t in range(6, 12)]
+
+
+def test_ring_keeps_only_its_capacity(sampler, system):
+    feed(system, sampler, range(12))
+    rows = cpu(sampler.query(window=10, resolution=1))
+    assert [row[1] for row in rows] == list(range(2, 12))
+
+
+def test_buckets_close_on_their_boundary(sampler, system):
+    feed(system, sampler, range(12))
+    # [0, 5) and [5, 10) are closed and stamped at their end; [10, 15) is still open
+    assert cpu(sampler.query(window=20, resolution=5)) == [[5 - 11.0, 0, 2, 4], [10 - 11.0, 5, 7, 9]]
+    feed(system, sampler, [14])
+    assert len(cpu(sampler.query(window=20, resolution=5))) == 2
+    feed(system, sampler, [15])
+    # Averages only the samples that arrived: 10, 11 and 14
+    assert cpu(sampler.query(window=20, resolution=5))[-1] == [15 - 15.0, 10, pytest.approx(35 / 3), 14]
+
+
+def test_coarse_level_is_built_from_closed_buckets(sampler, system):
+    feed(system, sampler, range(41))
+    result = sampler.query(window=60, resolution=20)
+    assert result['resolution'] == 20
+    # [0, 20) closes once [20, 25) has closed below it
+    assert cpu(result) == [[20 - 40.0, 0, 9.5, 19]]
+
+
+def test_query_picks_a_level_that_covers_the_window(sampler, system):
+    feed(system, sampler, range(12))
+    assert sampler.query(window=10)['resolution'] == 1
+    assert sampler.query(window=15)['resolution'] == 5
+    assert sampler.query(window=30)['resolution'] == 20
+    # Nothing keeps that much; the coarsest level answers
+    assert sampler.query(window=10000)['resolution'] == 20
+    assert sampler.query(window=5, resolution=60)['resolution'] == 20
+
+
+def test_points_merge_keeps_min_and_max_exact(sampler, system):
+    feed(system, sampler, range(12))
+    rows = cpu(sampler.query(window=10, resolution=1, points=2))
+    assert rows == [[6 - 11.0, 2, 4.0, 6], [0.0, 7, 9.0, 11]]
+
+
+def test_rates_use_the_real_elapsed_time(sampler, system):
+    for t in (0.0, 2.0, 2.5):
+        system.now = t
+        system.disk_read = int(t * 1000)
+        latest = sampler.sample()
+    assert latest['disk_read_bps'] == pytest.approx(1000)
+    system.now, system.disk_read = 4.5, 6500
+    assert sampler.sample()['disk_read_bps'] == pytest.approx(2000)
+
+
+def test_query_before_the_first_sample(sampler):
+    assert sampler.query(window=5) == {'window': 5, 'resolution': 1, 'series': {}}
@@ -0,0 +1,104 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+WIDTH, HEIGHT = 480, 270
+
+
+def noise(seed, height, width, block=4):
+    # Blocky noise, about as fine as UI detail, so the coarse pyramid levels
+    # still have texture to match on
+    rng = np.random.default_rng(seed)
+    tiles = rng.integers(0, 255, (height // block + 1, width // block + 1, 3), dtype=np.uint8)
+    return tiles.repeat(block, 0).repeat(block, 1)[:height, :width]
+
+
+def paste(capture, rgb, x, y):
+    screen = np.frombuffer(capture.screen, dtype=np.uint8).reshape(capture.height, capture.width, 3)
+    screen[y:y + rgb.shape[0], x:x + rgb.shape[1]] = rgb
+
+
+@pytest.fixture
+def scene(server, tmp_path):
+    capture = server.FakeCapture(WIDTH, HEIGHT)
+    paste(capture, noise(1, HEIGHT, WIDTH), 0, 0)
+    button = noise(2, 32, 48)
+    library = server.TemplateLibrary(str(tmp_path / 'templates'))
+    template_id = library.add(button.tobytes(), 48, 32, 'button')['id']
+    matcher = server.TemplateMatcher(library, capture=capture)
+    return capture, button, matcher, template_id
+
+
+def test_ncc_peaks_where_the_template_was_cut(server):
+    image = noise(3, 80, 120).astype(np.float64) @ np.array(server.LUMA)
+    cut = image[21:45, 37:77]
+    tz = cut - cut.mean()
+    scores = server.ncc_map(np, image, (tz, float(np.sqrt((tz * tz).sum()))))
+    assert scores.shape == (80 - 24 + 1, 120 - 40 + 1)
+    y, x = np.unravel_index(int(scores.argmax()), scores.shape)
+    assert (x, y) == (37, 21) and scores[y, x] == pytest.approx(1.0)
+    assert server.ncc_map(np, image[:10, :10], (tz, 1.0)) is None
+
+
+def test_full_search_then_tracking(server, scene):
+    capture, button, matcher, template_id = scene
+    paste(capture, button, 301, 177)
+    first = matcher.find(template_id)
+    assert first['found'] and (first['x'], first['y']) == (301, 177) and not first['tracked']
+    assert first['score'] > 0.99 and first['center'] == [325, 193]
+
+    # A small move stays inside the tracking box
+    paste(capture, noise(1, HEIGHT, WIDTH), 0, 0)
+    paste(capture, button, 306, 173)
+    second = matcher.find(template_id)
+    assert second['tracked'] and (second['x'], second['y']) == (306, 173)
+    assert matcher.stats['tracked_hits'] == 1 and matcher.stats['full_searches'] == 1
+
+
+def test_full_search_is_exact_off_the_coarse_grid(server, scene):
+    capture, button, matcher, template_id = scene
+    background = noise(1, HEIGHT, WIDTH)
+    for dx in range(4):
+        for dy in range(4):
+            paste(capture, background, 0, 0)
+            paste(capture, button, 10 + dx, 10 + dy)
+            hit = matcher.find(template_id, track=False)
+            assert (hit['x'], hit['y']) == (10 + dx, 10 + dy) and hit['score'] > 0.99
+
+
+def test_region_limits_the_search(server, scene):
+    capture, button, matcher, template_id = scene
+    paste(capture, button, 40, 200)
+    assert not matcher.find(template_id, region=(200, 0, 280, 270), threshold=0.9)['found']
+    hit = matcher.find(template_id, region=(20, 150, 120, 110))
+    assert hit['found'] and (hit['x'], hit['y']) == (40, 200)
+    with pytest.raises(ValueError):
+        matcher.find(template_id, region=(WIDTH + 10, 0, 50, 50))
+
+
+def test_tracked_hits_are_capped_and_forgotten(server, scene):
+    capture, button, matcher, template_id = scene
+    paste(capture, button, 100, 100)
+    matcher.max_tracked = 2
+    regions = [(90, 90, 80, 60), (80, 80, 100, 80), (70, 70, 120, 100)]
+    for region in regions:
+        assert matcher.find(template_id, region=region)['found']
+    assert [key[1] for key in matcher.last_hits] == regions[1:]
+    matcher.forget(template_id)
+    assert not matcher.last_hits
+
+
+def test_flat_template_is_rejected(server, tmp_path):
+    library = server.TemplateLibrary(str(tmp_path))
+    with pytest.raises(ValueError):
+        library.add(bytes(16 * 16 * 3), 16, 16)
+
+
+def test_deleting_a_template_drops_its_tracked_hits(server, scene, monkeypatch):
+    capture, button, matcher, template_id = scene
+    monkeypatch.setattr(server, 'template_library', matcher.library)
+    monkeypatch.setattr(server, 'template_matcher', matcher)
+    paste(capture, button, 10, 10)
+    assert matcher.find(template_id)['found'] and matcher.last_hits
+    assert server.app.test_client().delete(f'/templates/{template_id}').status_code == 200
+    assert not matcher.last_hits
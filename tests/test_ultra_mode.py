@@ -0,0 +1,84 @@
+import pytest
+
+
+def info(server, pid, ppid, name, create_time=1.0):
+    return server.ProcessInfo(pid, ppid, name, None, None, None, create_time)
+
+
+@pytest.fixture
+def ultra(server, monkeypatch):
+    sampler = server.ProcessSampler(provider=server.FakeProcessProvider())
+    monkeypatch.setattr(server, 'process_sampler', sampler)
+    return server.UltraModeManager(background_cores=2)
+
+
+def table_snapshot(server, sampler):
+    sampler.provider.set_processes([
+        info(server, 1, 0, 'init'),
+        info(server, 100, 1, 'game.exe'), info(server, 101, 100, 'crashpad.exe'),
+        info(server, 200, 1, 'chrome.exe'), info(server, 300, 1, 'editor.exe')])
+    return sampler.refresh()
+
+
+def test_partition_cores(server, ultra, fake_processes):
+    assert ultra.partition_cores() == ([2, 3, 4, 5, 6, 7], [0, 1])
+    ultra.background_cores = None
+    assert ultra.partition_cores() == ([2, 3, 4, 5, 6, 7], [0, 1])
+    ultra.background_cores = 99
+    assert ultra.partition_cores() == ([7], [0, 1, 2, 3, 4, 5, 6])
+    fake_processes.process().cpu_affinity([3])
+    assert ultra.partition_cores() == (None, None)
+
+
+def test_affinity_applies_when_priority_is_denied(server, ultra, fake_processes):
+    # Unprivileged: raising the game's priority fails, pinning must still happen
+    for pid in (100, 101, 200, 300):
+        fake_processes.add(pid, nice=0)
+    table_snapshot(server, server.process_sampler)
+    assert ultra.enable(100)
+    game, child, chrome, editor = (fake_processes[pid] for pid in (100, 101, 200, 300))
+    assert game.nice() == 0
+    assert game.cpu_affinity() == child.cpu_affinity() == [2, 3, 4, 5, 6, 7]
+    assert chrome.nice() == server.ULTRA_BACKGROUND_NICE and chrome.cpu_affinity() == [0, 1]
+    assert editor.cpu_affinity() == list(range(8))
+    assert ultra.get_status()['game_processes'] == 2
+
+
+def test_privileged_priority_and_restore(server, ultra, fake_processes):
+    for pid in (100, 101, 200, 300):
+        fake_processes.add(pid, nice=0, privileged=True)
+    table_snapshot(server, server.process_sampler)
+    ultra.enable(100)
+    assert fake_processes[100].nice() == server.ULTRA_GAME_NICE
+    assert ultra.disable()
+    for pid in (100, 101, 200):
+        assert fake_processes[pid].nice() == 0
+        assert fake_processes[pid].cpu_affinity() == list(range(8))
+
+
+def test_restore_skips_reused_pids_and_late_starters_are_caught(server, ultra, fake_processes):
+    for pid in (100, 101, 200, 300):
+        fake_processes.add(pid, nice=0, privileged=True)
+    sampler = server.process_sampler
+    table_snapshot(server, sampler)
+    ultra.enable(100)
+    # A background app started mid-session is picked up from the next snapshot
+    fake_processes.add(400, nice=0)
+    rows = list(sampler.latest()) + [info(server, 400, 1, 'discord.exe')]
+    sampler.provider.set_processes(rows)
+    sampler.refresh()
+    assert fake_processes[400].cpu_affinity() == [0, 1]
+    # PID 200 now belongs to a different process
+    fake_processes.add(200, nice=7, create_time=99.0)
+    ultra.disable()
+    assert fake_processes[200].nice() == 7
+    assert fake_processes[400].cpu_affinity() == list(range(8))
+
+
+def test_set_process_priority(server, fake_processes):
+    proc = fake_processes.add(500, nice=0)
+    assert server.set_process_priority(500, 'idle')
+    assert proc.nice() == server.PRIORITY_LEVELS['idle']
+    assert not server.set_process_priority(proc, 'high')
+    assert server.set_process_priority(proc, proc.nice())
+    assert not server.set_process_priority(999, 'idle')